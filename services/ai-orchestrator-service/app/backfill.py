@@ -0,0 +1,63 @@
+"""Backfill ``customers.whatsapp_no`` from the WhatsApp connector.
+
+The connector's customer list is read in keyset pages of ``BACKFILL_PAGE_SIZE``
+(``?after_id=&limit=``) over one pooled HTTP session, and each page is applied
+with a single bulk UPDATE (see ``crud.customer.set_whatsapp_numbers``) and its own
+commit, so memory stays bounded by a page and progress is durable page by page.
+Runs as a tracked job (see app/jobs.py) started by
+``POST /api/v1/ai/backfill-whatsapp/{user_id}``.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import requests
+
+from .config import BACKFILL_HTTP_TIMEOUT_SECONDS, BACKFILL_PAGE_SIZE, WHATSAPP_CONNECTOR_URL
+from .crud import customer as customer_crud
+from .db.session import SessionLocal
+from .jobs import Job
+
+logger = logging.getLogger(__name__)
+
+
+def connector_pages(user_id: int, page_size: int = BACKFILL_PAGE_SIZE) -> Iterator[List[dict]]:
+    """Yield the user's connector customers one page at a time, in id order."""
+    url = f"{WHATSAPP_CONNECTOR_URL}/api/v1/whatsapp/users/{user_id}/customers"
+    after_id: Optional[int] = None
+    with requests.Session() as http:
+        while True:
+            params = {"limit": page_size}
+            if after_id is not None:
+                params["after_id"] = after_id
+            r = http.get(url, params=params, timeout=BACKFILL_HTTP_TIMEOUT_SECONDS)
+            r.raise_for_status()
+            page = r.json() or []
+            ids = [c["id"] for c in page if c.get("id")]
+            # An older connector ignores the paging parameters and returns everything at once.
+            if not ids or (after_id is not None and max(ids) <= after_id):
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            after_id = max(ids)
+
+
+def backfill_whatsapp(user_id: int, job: Optional[Job] = None, pages: Optional[Iterable[List[dict]]] = None) -> Dict[str, int]:
+    """Apply every page to the database; returns (and reports on ``job``) the counts."""
+    progress = job.progress if job is not None else {}
+    progress.update(pages=0, scanned=0, updated=0)
+    for page in pages if pages is not None else connector_pages(user_id):
+        numbers = {c["id"]: c["whatsapp_no"] for c in page if c.get("id") and c.get("whatsapp_no")}
+        db = SessionLocal()
+        try:
+            updated = customer_crud.set_whatsapp_numbers(db, numbers)
+            db.commit()
+        finally:
+            db.close()
+        progress["pages"] += 1
+        progress["scanned"] += len(page)
+        progress["updated"] += updated
+    logger.info(f"WhatsApp backfill for user {user_id}: {progress}")
+    return progress
@@ -0,0 +1,93 @@
+"""Thread-safe in-process cache with an entry limit (LRU) and a TTL.
+
+Used for per-customer state that used to live in unbounded module-level dicts, so
+a long-running pod's memory stays flat no matter how many customers it has seen.
+Every instance reports its size, hits, misses and evictions under its ``name``.
+"""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+from . import metrics
+
+V = TypeVar("V")
+
+CACHE_SIZE = metrics.gauge("bounded_cache_entries", "Entries held by a bounded cache", ("cache",))
+CACHE_LOOKUPS = metrics.counter("bounded_cache_lookups_total", "Bounded cache lookups", ("cache", "result"))
+CACHE_EVICTIONS = metrics.counter(
+    "bounded_cache_evictions_total", "Entries dropped by LRU or TTL", ("cache", "reason"),
+)
+
+_MISSING = object()
+
+
+class BoundedCache(Generic[V]):
+    def __init__(self, name: str, max_entries: int, ttl_seconds: Optional[float] = None):
+        self.name = name
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self._lock = Lock()
+
+    def _expires_at(self) -> float:
+        return time.monotonic() + self.ttl_seconds if self.ttl_seconds else float("inf")
+
+    def get(self, key: Hashable, default: Optional[V] = None) -> Optional[V]:
+        with self._lock:
+            value = self._get_locked(key)
+        CACHE_LOOKUPS.inc(cache=self.name, result="miss" if value is _MISSING else "hit")
+        return default if value is _MISSING else value
+
+    def _get_locked(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            CACHE_EVICTIONS.inc(cache=self.name, reason="ttl")
+            CACHE_SIZE.set(len(self._entries), cache=self.name)
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        with self._lock:
+            self._entries[key] = (self._expires_at(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                CACHE_EVICTIONS.inc(cache=self.name, reason="lru")
+            CACHE_SIZE.set(len(self._entries), cache=self.name)
+
+    def pop(self, key: Hashable, default: Optional[V] = None) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            CACHE_SIZE.set(len(self._entries), cache=self.name)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            CACHE_SIZE.set(0, cache=self.name)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._get_locked(key) is not _MISSING
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "hits": CACHE_LOOKUPS.value(cache=self.name, result="hit"),
+            "misses": CACHE_LOOKUPS.value(cache=self.name, result="miss"),
+            "lru_evictions": CACHE_EVICTIONS.value(cache=self.name, reason="lru"),
+            "ttl_evictions": CACHE_EVICTIONS.value(cache=self.name, reason="ttl"),
+        }
@@ -0,0 +1,320 @@
+"""Per-tenant in-memory product catalog cache.
+
+Every inbound message needs the tenant's catalog for product matching. Instead of
+loading the whole product table through the ORM on each message, the catalog is
+loaded once per tenant and kept hot by the product_events consumer
+(see ``messaging._handle_product_*``), which applies creates/updates/deletes in place.
+
+Tenants are evicted least-recently-used once the approximate memory footprint of
+all resident catalogs exceeds ``CATALOG_CACHE_MAX_BYTES``. Entries older than
+``CATALOG_CACHE_TTL_SECONDS`` are reloaded to bound staleness when several
+replicas share the product_events queue.
+"""
+from __future__ import annotations
+
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import RLock
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .config import CATALOG_CACHE_MAX_BYTES, CATALOG_CACHE_TTL_SECONDS, PRODUCT_MATCHER
+from .crud.product import get_products_by_user_id
+from .matching import MentionDetector, create_matcher
+
+# Rough fixed cost of one cached product (object header, boxed numbers, index postings).
+_PRODUCT_OVERHEAD_BYTES = 512
+
+
+@dataclass(frozen=True)
+class CachedProduct:
+    """Detached, immutable copy of a products row.
+
+    Exposes the same attributes as ``models.product.Product`` so matching and
+    prompt building work unchanged on cached entries.
+    """
+
+    id: int
+    owner_id: Optional[int]
+    name: Optional[str]
+    sku: Optional[str]
+    price: Optional[float]
+    description: Optional[str] = None
+    image: Optional[str] = None
+    stock_qty: Optional[int] = None
+    available_qty: Optional[int] = None
+
+    @classmethod
+    def from_row(cls, row) -> "CachedProduct":
+        return cls(
+            id=row.id,
+            owner_id=row.owner_id,
+            name=row.name,
+            sku=row.sku,
+            price=row.price,
+            description=row.description,
+            image=row.image,
+            stock_qty=row.stock_qty,
+            available_qty=row.available_qty,
+        )
+
+    def approx_size(self) -> int:
+        size = _PRODUCT_OVERHEAD_BYTES
+        for value in (self.name, self.sku, self.description, self.image):
+            if value:
+                size += sys.getsizeof(value)
+        return size
+
+
+def _match_fields(product: CachedProduct) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    return product.name, product.sku, product.description
+
+
+class TenantCatalog:
+    """Products of a single tenant, in load/insertion order, plus their matcher.
+
+    Mutations come from the consumer thread while workers read, so every access
+    goes through ``self.lock``.
+    """
+
+    def __init__(self, user_id: int, products: List[CachedProduct], matcher: Optional[Callable] = None):
+        self.user_id = user_id
+        self.loaded_at = time.monotonic()
+        # Bumped when a product is added or removed or its name, SKU or description changes,
+        # so a (load, revision) pair names one state of everything the matchers read.
+        # Price and stock updates leave it alone.
+        self.revision = 0
+        # Builds the matcher from the products; PRODUCT_MATCHER unless given (offline replay).
+        self._matcher_factory = matcher or (lambda products: create_matcher(PRODUCT_MATCHER, products))
+        self.lock = RLock()
+        self.products: Dict[int, CachedProduct] = {}
+        self.size_bytes = 0
+        self._matcher = None
+        self._mentions: Optional[MentionDetector] = None
+        for p in products:
+            self.upsert(p)
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def upsert(self, product: CachedProduct) -> None:
+        with self.lock:
+            previous = self.products.get(product.id)
+            if previous is not None:
+                self.size_bytes -= previous.approx_size()
+            self.products[product.id] = product
+            self.size_bytes += product.approx_size()
+            if previous is None or _match_fields(previous) != _match_fields(product):
+                self.revision += 1
+            if self._matcher is not None:
+                self._matcher.add(product)
+            if self._mentions is not None:
+                self._mentions.add(product)
+
+    def remove(self, product_id: int) -> Optional[CachedProduct]:
+        with self.lock:
+            previous = self.products.pop(product_id, None)
+            if previous is not None:
+                self.size_bytes -= previous.approx_size()
+                self.revision += 1
+            if self._matcher is not None:
+                self._matcher.remove(product_id)
+            if self._mentions is not None:
+                self._mentions.remove(product_id)
+            return previous
+
+    def get(self, product_id: int) -> Optional[CachedProduct]:
+        with self.lock:
+            return self.products.get(product_id)
+
+    def list(self) -> List[CachedProduct]:
+        with self.lock:
+            return list(self.products.values())
+
+    def _get_matcher(self):
+        # Built on first use, then maintained incrementally by upsert/remove.
+        if self._matcher is None:
+            self._matcher = self._matcher_factory(self.products.values())
+        return self._matcher
+
+    def _get_mentions(self) -> MentionDetector:
+        if self._mentions is None:
+            self._mentions = MentionDetector(self.products.values())
+        return self._mentions
+
+    def best_match(self, user_text: str) -> Tuple[Optional[CachedProduct], float]:
+        with self.lock:
+            # Fast path: exact SKU (0.95) or full name (0.8) mentions in one automaton pass.
+            product, score = self._get_mentions().best_mention(user_text)
+            if product is not None:
+                return product, score
+            return self._get_matcher().best_match(user_text)
+
+    def top_k(self, user_text: str, k: int) -> List[CachedProduct]:
+        with self.lock:
+            return self._get_matcher().top_k(user_text, k)
+
+
+_catalogs: "OrderedDict[int, TenantCatalog]" = OrderedDict()
+# product_id -> owner_id for every resident product, so deletes can find their tenant.
+_owners: Dict[int, int] = {}
+# Bumped on every product event per tenant; lets a concurrent load detect it raced an event.
+_generations: Dict[int, int] = {}
+# Bumped when a delete arrives for a product whose tenant is unknown (not resident).
+_global_generation = 0
+_total_bytes = 0
+_lock = RLock()
+
+_stats: Dict[str, int] = {
+    "hits": 0,
+    "misses": 0,
+    "reloads": 0,
+    "evictions": 0,
+    "updates": 0,
+}
+# Tenants that were resident before (evicted, invalidated or expired); a load for them is a reload.
+_seen_tenants: set = set()
+
+
+def _drop(user_id: int) -> Optional[TenantCatalog]:
+    global _total_bytes
+    catalog = _catalogs.pop(user_id, None)
+    if catalog is not None:
+        _total_bytes -= catalog.size_bytes
+        for pid in catalog.products:
+            _owners.pop(pid, None)
+    return catalog
+
+
+def _evict_over_budget(keep: int) -> None:
+    while _total_bytes > CATALOG_CACHE_MAX_BYTES:
+        # Never evict the catalog that is being served right now.
+        victim = next((uid for uid in _catalogs if uid != keep), None)
+        if victim is None:
+            break
+        _drop(victim)
+        _stats["evictions"] += 1
+
+
+def _install(catalog: TenantCatalog) -> None:
+    global _total_bytes
+    _drop(catalog.user_id)
+    _catalogs[catalog.user_id] = catalog
+    _total_bytes += catalog.size_bytes
+    for pid in catalog.products:
+        _owners[pid] = catalog.user_id
+    _evict_over_budget(keep=catalog.user_id)
+
+
+def _is_expired(catalog: TenantCatalog) -> bool:
+    return CATALOG_CACHE_TTL_SECONDS > 0 and time.monotonic() - catalog.loaded_at > CATALOG_CACHE_TTL_SECONDS
+
+
+def get_catalog(db: Session, user_id: int) -> TenantCatalog:
+    """Return the tenant's catalog, loading it from the database on a miss."""
+    with _lock:
+        catalog = _catalogs.get(user_id)
+        if catalog is not None and not _is_expired(catalog):
+            _catalogs.move_to_end(user_id)
+            _stats["hits"] += 1
+            return catalog
+        _stats["misses"] += 1
+        if catalog is not None or user_id in _seen_tenants:
+            _stats["reloads"] += 1
+        generation = (_generations.get(user_id, 0), _global_generation)
+
+    # Load outside the lock so one slow tenant load does not stall other tenants.
+    rows = get_products_by_user_id(db, user_id)
+    catalog = TenantCatalog(user_id, [CachedProduct.from_row(r) for r in rows])
+
+    with _lock:
+        if (_generations.get(user_id, 0), _global_generation) == generation:
+            _install(catalog)
+            _seen_tenants.add(user_id)
+        # else: a product event landed mid-load; serve this snapshot once and reload next time.
+    return catalog
+
+
+def get_products(db: Session, user_id: int) -> List[CachedProduct]:
+    """Cached replacement for ``crud.product.get_products_by_user_id``."""
+    return get_catalog(db, user_id).list()
+
+
+def upsert_product(row) -> None:
+    """Apply a created/updated products row to the resident catalog of its owner.
+
+    Tenants that are not resident are left alone; their next load reads the database.
+    """
+    global _total_bytes
+    if row is None:
+        return
+    product = CachedProduct.from_row(row)
+    with _lock:
+        _stats["updates"] += 1
+        previous_owner = _owners.get(product.id)
+        if previous_owner is not None and previous_owner != product.owner_id:
+            _generations[previous_owner] = _generations.get(previous_owner, 0) + 1
+            old = _catalogs.get(previous_owner)
+            if old is not None:
+                before = old.size_bytes
+                old.remove(product.id)
+                _total_bytes += old.size_bytes - before
+            _owners.pop(product.id, None)
+
+        if product.owner_id is None:
+            return
+        _generations[product.owner_id] = _generations.get(product.owner_id, 0) + 1
+        catalog = _catalogs.get(product.owner_id)
+        if catalog is None:
+            return
+        before = catalog.size_bytes
+        catalog.upsert(product)
+        _total_bytes += catalog.size_bytes - before
+        _owners[product.id] = product.owner_id
+        _evict_over_budget(keep=product.owner_id)
+
+
+def remove_product(product_id: int) -> None:
+    """Drop a deleted product from whichever resident catalog holds it."""
+    global _total_bytes, _global_generation
+    with _lock:
+        _stats["updates"] += 1
+        owner = _owners.pop(product_id, None)
+        if owner is None:
+            # Unknown owner: make sure no in-flight load for any tenant installs a stale copy.
+            _global_generation += 1
+            return
+        _generations[owner] = _generations.get(owner, 0) + 1
+        catalog = _catalogs.get(owner)
+        if catalog is not None:
+            before = catalog.size_bytes
+            catalog.remove(product_id)
+            _total_bytes += catalog.size_bytes - before
+
+
+def invalidate(user_id: Optional[int] = None) -> None:
+    """Forget one tenant's catalog, or every catalog when ``user_id`` is None."""
+    global _global_generation
+    with _lock:
+        if user_id is None:
+            for uid in list(_catalogs):
+                _drop(uid)
+            # Also reject in-flight loads of tenants that are not resident yet.
+            _global_generation += 1
+        else:
+            _drop(user_id)
+            _generations[user_id] = _generations.get(user_id, 0) + 1
+
+
+def stats() -> Dict[str, int]:
+    """Counters and size gauges for diagnostics."""
+    with _lock:
+        out = dict(_stats)
+        out["tenants"] = len(_catalogs)
+        out["products"] = len(_owners)
+        out["bytes"] = _total_bytes
+        out["max_bytes"] = CATALOG_CACHE_MAX_BYTES
+        return out
@@ -0,0 +1,163 @@
+"""Bulk application of user and product events.
+
+A bulk import in the stock service emits thousands of product events; applying
+each with its own session, lookups and commit made the consumer fall behind. The
+consumer now drains user/product events in micro-batches (see
+``messaging._make_consumer_callback``) and ``apply_events`` writes a batch with a
+handful of ``INSERT ... ON CONFLICT`` / ``DELETE`` statements in one transaction.
+
+Events are first folded per id in arrival order, so each product ends up with
+exactly one effective operation and per-product ordering is preserved:
+
+- ``insert``: created, and not already stored (ON CONFLICT DO NOTHING, as before)
+- ``upsert``: updated; every field but the SKU is overwritten (inserted if missing)
+- ``delete``: deleted (an update after a delete in the same batch is ignored)
+- ``replace``: deleted then created again in the same batch
+
+Users are folded the same way; an update without a username only creates a
+missing user, as the single-event handler does. Product owners missing from the
+table get the same "Unknown" placeholder as the single-event handlers create.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from . import catalog_cache, metrics, response_cache
+from .db.upsert import insert_for
+from .models.product import Product
+from .models.user import User
+
+logger = logging.getLogger(__name__)
+
+CATALOG_EVENT_TYPES = {"user_created", "user_updated", "product_created", "product_updated", "product_deleted"}
+
+BATCH_SIZE = metrics.histogram(
+    "catalog_event_batch_size", "User/product events applied per transaction", buckets=(1, 5, 10, 50, 100, 500, 1000),
+)
+BATCH_RESULTS = metrics.counter("catalog_event_batches_total", "Micro-batches of user/product events", ("outcome",))
+
+_PRODUCT_FIELDS = ("owner_id", "name", "sku", "price", "description", "image", "available_qty", "stock_qty")
+
+
+@dataclass
+class CatalogChanges:
+    """Net effect of a batch, for refreshing the in-process caches after commit."""
+    upserted: Set[int] = field(default_factory=set)
+    deleted: Set[int] = field(default_factory=set)
+    # Products whose facts may have changed, so cached LLM replies must go
+    changed: Set[int] = field(default_factory=set)
+
+
+def _product_row(data: dict) -> dict:
+    row = {"id": data["id"]}
+    row.update({name: data.get(name) for name in _PRODUCT_FIELDS})
+    return row
+
+
+def fold_events(events: List[dict]) -> Tuple[Dict[int, Tuple[str, Optional[dict]]], Dict[int, Tuple[str, str]]]:
+    """Reduce events to one operation per product id and per user id, honouring arrival order."""
+    products: Dict[int, Tuple[str, Optional[dict]]] = {}
+    users: Dict[int, Tuple[str, str]] = {}
+    for event in events:
+        event_type = event.get("event_type")
+        if event_type in ("user_created", "user_updated"):
+            data = event.get("user")
+            if not data:
+                logger.warning(f"No user data in {event_type} event")
+                continue
+            previous = users.get(data["id"])
+            if event_type == "user_updated" and data.get("username"):
+                users[data["id"]] = ("upsert", data["username"])
+            elif event_type == "user_updated":
+                # No username: create the user if it is missing, never overwrite a stored name.
+                if previous is None:
+                    users[data["id"]] = ("insert", "unknown")
+            elif previous is None:
+                users[data["id"]] = ("insert", data["username"])
+        elif event_type in ("product_created", "product_updated"):
+            data = event.get("product")
+            if not data:
+                logger.warning(f"No product data in {event_type} event")
+                continue
+            row = _product_row(data)
+            op, previous = products.get(row["id"], (None, None))
+            if event_type == "product_created":
+                if op is None:
+                    products[row["id"]] = ("insert", row)
+                elif op == "delete":
+                    products[row["id"]] = ("replace", row)
+                # created for a product already inserted/updated: nothing to do, as before
+            else:
+                if op == "delete":
+                    continue
+                if previous is not None:
+                    row["sku"] = previous["sku"]  # updates never change the SKU
+                products[row["id"]] = ("replace" if op == "replace" else "upsert", row)
+        elif event_type == "product_deleted":
+            product_id = event.get("product_id")
+            if not product_id:
+                logger.warning("No product_id in product_deleted event")
+                continue
+            products[product_id] = ("delete", None)
+    return products, users
+
+
+def apply_events(db: Session, events: List[dict]) -> CatalogChanges:
+    """Write a batch of user/product events in one transaction (commits)."""
+    products, users = fold_events(events)
+    changes = CatalogChanges()
+
+    user_inserts = [{"id": uid, "name": name} for uid, (op, name) in users.items() if op == "insert"]
+    user_upserts = [{"id": uid, "name": name} for uid, (op, name) in users.items() if op == "upsert"]
+    if user_upserts:
+        stmt = insert_for(db, User.__table__)
+        db.execute(stmt.on_conflict_do_update(index_elements=["id"], set_={"name": stmt.excluded.name}), user_upserts)
+    # Placeholder owners go in after real user rows so they never shadow a real name.
+    owners = {row["owner_id"] for op, row in products.values() if row and row.get("owner_id")}
+    user_inserts += [{"id": oid, "name": "Unknown"} for oid in owners if oid not in users]
+    if user_inserts:
+        db.execute(insert_for(db, User.__table__).on_conflict_do_nothing(index_elements=["id"]), user_inserts)
+
+    to_delete = [pid for pid, (op, _) in products.items() if op in ("delete", "replace")]
+    if to_delete:
+        db.execute(delete(Product).where(Product.id.in_(to_delete)))
+    inserts = [row for op, row in products.values() if op in ("insert", "replace")]
+    if inserts:
+        db.execute(insert_for(db, Product.__table__).on_conflict_do_nothing(index_elements=["id"]), inserts)
+    upserts = [row for op, row in products.values() if op == "upsert"]
+    if upserts:
+        stmt = insert_for(db, Product.__table__)
+        updated_columns = [name for name in _PRODUCT_FIELDS if name != "sku"]
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["id"], set_={name: stmt.excluded[name] for name in updated_columns},
+            ),
+            upserts,
+        )
+    db.commit()
+
+    for pid, (op, _) in products.items():
+        if op == "delete":
+            changes.deleted.add(pid)
+        else:
+            changes.upserted.add(pid)
+        if op != "insert":
+            changes.changed.add(pid)
+    BATCH_SIZE.observe(len(events))
+    return changes
+
+
+def refresh_caches(db: Session, changes: CatalogChanges) -> None:
+    """Mirror a committed batch into the catalog and response caches."""
+    if changes.upserted:
+        for row in db.execute(select(Product).where(Product.id.in_(changes.upserted))).scalars():
+            catalog_cache.upsert_product(row)
+    for pid in changes.deleted:
+        catalog_cache.remove_product(pid)
+    for pid in changes.changed:
+        response_cache.bump_product_version(pid)
@@ -0,0 +1,101 @@
+"""Push side of the conversation change feed.
+
+Answered messages are appended to ``conversation_changes`` in the reply
+transaction (see ``crud.conversation_change``); ``seq`` is the cursor. Dashboards
+either poll ``GET /api/v1/ai/conversations/changes?since=<seq>`` or hold open the
+Server-Sent Events stream below.
+
+``publish_ai_response`` calls ``notify`` after every reply, which wakes the
+tenant's open streams on this replica; each stream then reads everything past its
+cursor from the database. Streams also re-check every ``CHANGE_FEED_POLL_SECONDS``
+so replies produced by other replicas show up too, and that doubles as a
+keep-alive.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from . import metrics
+from .config import CHANGE_FEED_PAGE_SIZE, CHANGE_FEED_POLL_SECONDS
+from .crud import conversation_change as changes_crud
+from .db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+FEED_SUBSCRIBERS = metrics.gauge("change_feed_subscribers", "Open conversation change streams")
+FEED_EVENTS = metrics.counter("change_feed_events_total", "Changes pushed over conversation change streams")
+
+_subscribers: Dict[int, Tuple[asyncio.AbstractEventLoop, asyncio.Event, Optional[int]]] = {}
+_lock = threading.Lock()
+
+
+def subscribe(user_id: Optional[int]) -> asyncio.Event:
+    """Register a stream on the running loop; its event is set when a reply may be waiting."""
+    wake = asyncio.Event()
+    with _lock:
+        _subscribers[id(wake)] = (asyncio.get_running_loop(), wake, user_id)
+        FEED_SUBSCRIBERS.set(len(_subscribers))
+    return wake
+
+
+def unsubscribe(wake: asyncio.Event) -> None:
+    with _lock:
+        _subscribers.pop(id(wake), None)
+        FEED_SUBSCRIBERS.set(len(_subscribers))
+
+
+def notify(user_id: Optional[int] = None) -> None:
+    """Wake streams for ``user_id`` (and unfiltered ones); safe to call from any thread."""
+    with _lock:
+        targets = [(loop, wake) for loop, wake, sub_user in _subscribers.values()
+                   if sub_user is None or user_id is None or sub_user == user_id]
+    for loop, wake in targets:
+        try:
+            loop.call_soon_threadsafe(wake.set)
+        except RuntimeError:
+            pass  # loop already closed; the stream is going away
+
+
+def _load(since: int, user_id: Optional[int]):
+    db = SessionLocal()
+    try:
+        return changes_crud.get_changes(db, since=since, user_id=user_id, limit=CHANGE_FEED_PAGE_SIZE)
+    finally:
+        db.close()
+
+
+def _latest(user_id: Optional[int]) -> int:
+    db = SessionLocal()
+    try:
+        return changes_crud.latest_seq(db, user_id=user_id)
+    finally:
+        db.close()
+
+
+async def stream(user_id: Optional[int], since: Optional[int], is_disconnected) -> AsyncIterator[str]:
+    """SSE frames for every change after ``since`` (default: only new ones), until the client leaves."""
+    wake = subscribe(user_id)
+    try:
+        cursor = since if since is not None else await run_in_threadpool(_latest, user_id)
+        yield f"retry: {int(CHANGE_FEED_POLL_SECONDS * 1000)}\n\n"
+        while not await is_disconnected():
+            # Clear before reading so a reply committed during the read still wakes us.
+            wake.clear()
+            changes, cursor = await run_in_threadpool(_load, cursor, user_id)
+            for change in changes:
+                yield f"id: {change['seq']}\nevent: message_answered\ndata: {json.dumps(change)}\n\n"
+            FEED_EVENTS.inc(len(changes))
+            if len(changes) == CHANGE_FEED_PAGE_SIZE:
+                continue  # more waiting
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=CHANGE_FEED_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+    finally:
+        unsubscribe(wake)
@@ -0,0 +1,114 @@
+"""Circuit breaker for LLM providers.
+
+A breaker watches the last ``window`` calls of one provider. When enough of them
+failed, or were slower than the latency threshold, it opens and the gateway skips
+that provider straight away instead of paying its failure latency on every
+message. After ``open_seconds`` it lets a single probe call through (half-open):
+success closes the breaker, failure opens it again.
+"""
+from __future__ import annotations
+
+import time
+from collections import deque
+from threading import Lock
+from typing import Deque, Dict, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 5,
+        error_rate: float = 0.5,
+        slow_call_seconds: float = 8.0,
+        slow_call_rate: float = 0.8,
+        open_seconds: float = 30.0,
+    ):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        # (ok, latency) for the most recent calls
+        self._calls: Deque[Tuple[bool, float]] = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._transitions = 0
+        self._rejected = 0
+        self._lock = Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._set_state(HALF_OPEN)
+        return self._state
+
+    def _set_state(self, state: str) -> None:
+        if state != self._state:
+            self._state = state
+            self._transitions += 1
+            if state == OPEN:
+                self._opened_at = time.monotonic()
+            if state != HALF_OPEN:
+                self._probe_in_flight = False
+            if state == CLOSED:
+                self._calls.clear()
+
+    def allow(self) -> bool:
+        """Whether a call may go to this provider now; claims the probe slot when half-open."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._rejected += 1
+            return False
+
+    def record(self, ok: bool, latency: float) -> None:
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._set_state(CLOSED if ok and latency < self.slow_call_seconds else OPEN)
+                return
+            self._calls.append((ok, latency))
+            if self._state == CLOSED and len(self._calls) >= self.min_calls:
+                total = len(self._calls)
+                errors = sum(1 for good, _ in self._calls if not good)
+                slow = sum(1 for good, lat in self._calls if good and lat >= self.slow_call_seconds)
+                if errors / total >= self.error_rate or slow / total >= self.slow_call_rate:
+                    self._set_state(OPEN)
+
+    def release_probe(self) -> None:
+        """Give the half-open probe slot back when a granted call never happened (e.g. cancelled)."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            state = self._current_state()
+            total = len(self._calls)
+            errors = sum(1 for good, _ in self._calls if not good)
+            slow = sum(1 for good, lat in self._calls if good and lat >= self.slow_call_seconds)
+            return {
+                "state": state,
+                "window_calls": total,
+                "error_rate": errors / total if total else 0.0,
+                "slow_call_rate": slow / total if total else 0.0,
+                "transitions": self._transitions,
+                "rejected": self._rejected,
+                "open_for_seconds": max(0.0, self.open_seconds - (time.monotonic() - self._opened_at)) if state == OPEN else 0.0,
+            }
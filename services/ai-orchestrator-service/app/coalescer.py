@@ -0,0 +1,92 @@
+"""Per-customer coalescing of bursts of new_message events.
+
+WhatsApp users often split one question over several messages ("hi", "do you
+have", "red shoes", "size 42?"). ``MessageCoalescer`` holds each customer's
+messages until they have been quiet for ``window`` seconds, then hands the whole
+burst to ``flush`` at once so it is answered with a single LLM call and reply.
+
+The coalescer is driven entirely from the pika connection thread: timers are
+``connection.call_later`` / ``connection.remove_timeout`` and buffered deliveries
+stay unacked until their burst has been handled, so nothing is lost if the
+process dies mid-window (the broker redelivers them).
+"""
+from __future__ import annotations
+
+import time
+from typing import Callable, Dict, Generic, Hashable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class _Burst(Generic[T]):
+    __slots__ = ("items", "started_at", "timer")
+
+    def __init__(self, started_at: float):
+        self.items: List[T] = []
+        self.started_at = started_at
+        self.timer = None
+
+
+class MessageCoalescer(Generic[T]):
+    """Debounces items per key; a burst is flushed after ``window`` seconds of silence.
+
+    ``max_wait`` bounds how long the first message of a burst can be held and
+    ``max_items`` how many messages one burst may merge.
+    """
+
+    def __init__(
+        self,
+        window: float,
+        flush: Callable[[Hashable, List[T]], None],
+        call_later: Callable[[float, Callable[[], None]], object],
+        remove_timeout: Callable[[object], None],
+        max_wait: Optional[float] = None,
+        max_items: int = 10,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.window = window
+        self.max_wait = max_wait if max_wait is not None else 3 * window
+        self.max_items = max(1, max_items)
+        self._flush = flush
+        self._call_later = call_later
+        self._remove_timeout = remove_timeout
+        self._clock = clock
+        self._bursts: Dict[Hashable, _Burst[T]] = {}
+
+    def add(self, key: Hashable, item: T) -> None:
+        now = self._clock()
+        burst = self._bursts.get(key)
+        if burst is None:
+            burst = self._bursts[key] = _Burst(now)
+        elif burst.timer is not None:
+            self._remove_timeout(burst.timer)
+            burst.timer = None
+        burst.items.append(item)
+
+        remaining = self.max_wait - (now - burst.started_at)
+        if len(burst.items) >= self.max_items or remaining <= 0:
+            self.flush(key)
+            return
+        burst.timer = self._call_later(min(self.window, remaining), lambda: self._expire(key, burst))
+
+    def _expire(self, key: Hashable, burst: "_Burst[T]") -> None:
+        # Ignore a timer that fired for a burst already flushed and replaced.
+        if self._bursts.get(key) is burst:
+            burst.timer = None
+            self.flush(key)
+
+    def flush(self, key: Hashable) -> None:
+        burst = self._bursts.pop(key, None)
+        if burst is None:
+            return
+        if burst.timer is not None:
+            self._remove_timeout(burst.timer)
+        self._flush(key, burst.items)
+
+    def flush_all(self) -> None:
+        for key in list(self._bursts):
+            self.flush(key)
+
+    def pending(self) -> int:
+        """Messages currently held back."""
+        return sum(len(b.items) for b in self._bursts.values())
@@ -3,6 +3,136 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _tenant_map(name: str, cast=str) -> dict:
+    """Parse per-tenant overrides written as "user_id:value,user_id:value"."""
+    out = {}
+    for item in os.getenv(name, "").split(","):
+        key, sep, value = item.partition(":")
+        if sep and key.strip().isdigit() and value.strip():
+            out[int(key.strip())] = cast(value.strip())
+    return out
+
 DATABASE_URL = os.getenv("DATABASE_URL")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+
+# Per-tenant product catalog cache (see app/catalog_cache.py)
+CATALOG_CACHE_MAX_BYTES = int(os.getenv("CATALOG_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "300"))
+
+# Product matcher used by process_message: "heuristic" (token index), "bm25" or "fuzzy" (n-grams)
+PRODUCT_MATCHER = os.getenv("PRODUCT_MATCHER", "heuristic")
+
+# Consumer concurrency: 0 handles new_message inline on the connection thread (legacy);
+# N > 0 runs them on N workers, weighted-fair across tenants and in order per customer.
+# Prefetch 0 = max(1000, 4 x workers) unacked deliveries (unlimited inline): the pool can only
+# reorder deliveries it already holds, so a shallow prefetch leaves tenants in broker FIFO order.
+CONSUMER_WORKERS = int(os.getenv("CONSUMER_WORKERS", "0"))
+CONSUMER_PREFETCH = int(os.getenv("CONSUMER_PREFETCH", "0"))
+
+# LLM gateway (see app/llm_gateway.py)
+LLM_GROQ_TIMEOUT_SECONDS = float(os.getenv("LLM_GROQ_TIMEOUT_SECONDS", "10"))
+LLM_GEMINI_TIMEOUT_SECONDS = float(os.getenv("LLM_GEMINI_TIMEOUT_SECONDS", "15"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+# Fixed hedge delay in ms; unset means "Groq's observed p95 latency"
+LLM_HEDGE_DELAY_MS = float(os.getenv("LLM_HEDGE_DELAY_MS")) if os.getenv("LLM_HEDGE_DELAY_MS") else None
+
+# Per-provider circuit breakers (see app/circuit_breaker.py)
+CB_WINDOW = int(os.getenv("CB_WINDOW", "20"))
+CB_MIN_CALLS = int(os.getenv("CB_MIN_CALLS", "5"))
+CB_ERROR_RATE = float(os.getenv("CB_ERROR_RATE", "0.5"))
+CB_SLOW_CALL_SECONDS = float(os.getenv("CB_SLOW_CALL_SECONDS", "8"))
+CB_SLOW_CALL_RATE = float(os.getenv("CB_SLOW_CALL_RATE", "0.8"))
+CB_OPEN_SECONDS = float(os.getenv("CB_OPEN_SECONDS", "30"))
+
+# Template answers for plain price/stock questions (see app/fast_path.py); off until FAST_PATH_RATE > 0
+FAST_PATH_RATE = float(os.getenv("FAST_PATH_RATE", "0"))
+FAST_PATH_TENANT_RATES = _tenant_map("FAST_PATH_TENANT_RATES", float)
+FAST_PATH_MIN_SCORE = float(os.getenv("FAST_PATH_MIN_SCORE", "0.8"))
+FAST_PATH_LOCALE = os.getenv("FAST_PATH_LOCALE", "en")
+FAST_PATH_TENANT_LOCALES = _tenant_map("FAST_PATH_TENANT_LOCALES")
+
+# Cached LLM replies about a chosen product (see app/response_cache.py)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+# Optional Redis-compatible backend shared by all replicas, e.g. redis://redis:6379/0
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL")
+
+# Coalescing of new_message bursts per customer (see app/coalescer.py); 0 disables it.
+# A burst is answered once it has been quiet for the window, or after COALESCE_MAX_WAIT_MS
+# (default 3 x window) / COALESCE_MAX_MESSAGES messages.
+COALESCE_WINDOW_MS = float(os.getenv("COALESCE_WINDOW_MS", "0"))
+COALESCE_MAX_WAIT_MS = float(os.getenv("COALESCE_MAX_WAIT_MS", "0"))
+COALESCE_MAX_MESSAGES = int(os.getenv("COALESCE_MAX_MESSAGES", "10"))
+
+# Bounded per-customer caches (see app/bounded_cache.py) and write-behind conversation state
+CONVERSATION_MEMORY_MAX_ENTRIES = int(os.getenv("CONVERSATION_MEMORY_MAX_ENTRIES", "50000"))
+CONVERSATION_MEMORY_TTL_SECONDS = float(os.getenv("CONVERSATION_MEMORY_TTL_SECONDS", "21600"))
+CONVERSATION_STATE_FLUSH_SECONDS = float(os.getenv("CONVERSATION_STATE_FLUSH_SECONDS", "2"))
+CONVERSATION_STATE_FLUSH_MAX_PENDING = int(os.getenv("CONVERSATION_STATE_FLUSH_MAX_PENDING", "500"))
+PHONE_CACHE_MAX_ENTRIES = int(os.getenv("PHONE_CACHE_MAX_ENTRIES", "50000"))
+PHONE_CACHE_TTL_SECONDS = float(os.getenv("PHONE_CACHE_TTL_SECONDS", "86400"))
+
+# Conversation change feed / SSE stream (see app/change_feed.py)
+CHANGE_FEED_POLL_SECONDS = float(os.getenv("CHANGE_FEED_POLL_SECONDS", "15"))
+CHANGE_FEED_PAGE_SIZE = int(os.getenv("CHANGE_FEED_PAGE_SIZE", "200"))
+
+# Recovery sweeper for unanswered messages (see app/sweeper.py); opt-in, interval 0 disables the in-service loop
+SWEEPER_INTERVAL_SECONDS = float(os.getenv("SWEEPER_INTERVAL_SECONDS", "0"))
+SWEEPER_STALE_SECONDS = float(os.getenv("SWEEPER_STALE_SECONDS", "300"))
+SWEEPER_LEASE_SECONDS = float(os.getenv("SWEEPER_LEASE_SECONDS", "600"))
+SWEEPER_BATCH_SIZE = int(os.getenv("SWEEPER_BATCH_SIZE", "50"))
+SWEEPER_CONCURRENCY = int(os.getenv("SWEEPER_CONCURRENCY", "4"))
+SWEEPER_MAX_ATTEMPTS = int(os.getenv("SWEEPER_MAX_ATTEMPTS", "3"))
+
+# Recently stored message ids, checked before inserting a possibly redelivered message (see app/idempotency.py)
+IDEMPOTENCY_CACHE_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_CACHE_MAX_ENTRIES", "100000"))
+IDEMPOTENCY_CACHE_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_CACHE_TTL_SECONDS", "86400"))
+
+# User/product events are applied in micro-batches of up to EVENT_BATCH_SIZE, held at most
+# EVENT_BATCH_WINDOW_MS (see app/catalog_sync.py); 1 applies each event on its own.
+EVENT_BATCH_SIZE = int(os.getenv("EVENT_BATCH_SIZE", "200"))
+EVENT_BATCH_WINDOW_MS = float(os.getenv("EVENT_BATCH_WINDOW_MS", "100"))
+
+# WhatsApp number backfill job (see app/backfill.py); customers are fetched from the connector page by page
+WHATSAPP_CONNECTOR_URL = os.getenv("WHATSAPP_CONNECTOR_URL", "http://whatsapp-connector-service:8002")
+BACKFILL_PAGE_SIZE = int(os.getenv("BACKFILL_PAGE_SIZE", "1000"))
+BACKFILL_HTTP_TIMEOUT_SECONDS = float(os.getenv("BACKFILL_HTTP_TIMEOUT_SECONDS", "30"))
+
+# Per-stage message latency (GET /metrics); turn tenant labels off to bound series count on large fleets
+METRICS_TENANT_LABELS = os.getenv("METRICS_TENANT_LABELS", "true").lower() in ("1", "true", "yes")
+
+# Opt-in anonymized traffic corpus for offline matcher replay (see app/traffic_recorder.py); empty dir disables
+TRAFFIC_RECORD_DIR = os.getenv("TRAFFIC_RECORD_DIR", "")
+TRAFFIC_RECORD_SAMPLE_RATE = float(os.getenv("TRAFFIC_RECORD_SAMPLE_RATE", "1.0"))
+TRAFFIC_RECORD_MAX_MB = float(os.getenv("TRAFFIC_RECORD_MAX_MB", "512"))
+
+# Rule-based pre-classifier for greetings/thanks/acks/unsupported messages (see app/intents.py).
+# INTENT_TENANT_REPLIES is JSON: {"<user_id>": {"greeting": "Hi from Shop!", "ack": null}}; null disables an intent.
+INTENTS_ENABLED = os.getenv("INTENTS_ENABLED", "false").lower() in ("1", "true", "yes")
+INTENT_TENANT_REPLIES = os.getenv("INTENT_TENANT_REPLIES", "")
+
+# Per-tenant LLM admission (see app/llm_scheduler.py): token buckets, then weighted-fair slots.
+# Rates are LLM calls per minute (0 = unlimited, the default); per-tenant quotas as "user_id:value,...".
+# LLM_TENANT_WEIGHTS also weights tenants in the new_message worker pool (see app/consumer_pool.py).
+LLM_TENANT_RATE_PER_MINUTE = float(os.getenv("LLM_TENANT_RATE_PER_MINUTE", "0"))
+LLM_TENANT_BURST = float(os.getenv("LLM_TENANT_BURST", "20"))
+LLM_TENANT_RATES = _tenant_map("LLM_TENANT_RATES", float)
+LLM_TENANT_WEIGHTS = _tenant_map("LLM_TENANT_WEIGHTS", float)
+LLM_MAX_CONCURRENT_CALLS = int(os.getenv("LLM_MAX_CONCURRENT_CALLS", "16"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "10"))
+
+# Load shedding (see app/load_shedder.py): above the latency SLO or new_message backlog, LLM replies
+# are replaced by template answers until p95 drops below the recovery latency and the backlog drains.
+LOAD_SHED_ENABLED = os.getenv("LOAD_SHED_ENABLED", "false").lower() in ("1", "true", "yes")
+LOAD_SHED_LATENCY_SLO_MS = float(os.getenv("LOAD_SHED_LATENCY_SLO_MS", "8000"))
+LOAD_SHED_RECOVER_LATENCY_MS = float(os.getenv("LOAD_SHED_RECOVER_LATENCY_MS", "4000"))
+LOAD_SHED_QUEUE_HIGH = int(os.getenv("LOAD_SHED_QUEUE_HIGH", "200"))
+LOAD_SHED_QUEUE_LOW = int(os.getenv("LOAD_SHED_QUEUE_LOW", "20"))
+LOAD_SHED_QUEUE_SAMPLE_SECONDS = float(os.getenv("LOAD_SHED_QUEUE_SAMPLE_SECONDS", "5"))
+LOAD_SHED_WINDOW_SECONDS = float(os.getenv("LOAD_SHED_WINDOW_SECONDS", "60"))
+LOAD_SHED_MIN_SAMPLES = int(os.getenv("LOAD_SHED_MIN_SAMPLES", "10"))
+LOAD_SHED_PROBE_INTERVAL_SECONDS = float(os.getenv("LOAD_SHED_PROBE_INTERVAL_SECONDS", "5"))
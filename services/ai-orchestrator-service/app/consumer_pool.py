@@ -0,0 +1,172 @@
+"""Worker pool for new_message events.
+
+``pika.BlockingConnection`` is not thread-safe, so the consumer thread keeps owning
+the connection while LLM-bound message handling runs on worker threads:
+
+- ``FairWorkerPool`` runs tasks on N worker threads. Tasks wait in per-tenant
+  queues and are taken in weighted-fair order (see app/fair_queue.py), so one
+  tenant's campaign burst among the prefetched deliveries cannot hold back other
+  tenants' messages. A key's tasks (one customer's messages) still run one at a
+  time, in submission order, while different customers proceed in parallel.
+- ``ThreadSafeChannel`` is handed to workers in place of the real channel; acks and
+  publishes are marshalled back onto the connection thread with
+  ``connection.add_callback_threadsafe``.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, Hashable, Optional, Set, Tuple
+
+from .fair_queue import VirtualClock
+
+logger = logging.getLogger(__name__)
+
+# How long a worker waits for the connection thread to run a publish for it.
+PUBLISH_TIMEOUT_SECONDS = 30.0
+
+
+class ThreadSafeChannel:
+    """Subset of the pika channel API callable from any thread."""
+
+    def __init__(self, connection, channel):
+        self._connection = connection
+        self._channel = channel
+        # Created on the connection thread; calls made from it run directly.
+        self._owner = threading.current_thread()
+
+    def _call(self, fn: Callable, *args, **kwargs):
+        """Run ``fn`` on the connection thread and wait for its result."""
+        if threading.current_thread() is self._owner:
+            return fn(*args, **kwargs)
+        done: Future = Future()
+
+        def run():
+            try:
+                done.set_result(fn(*args, **kwargs))
+            except Exception as e:  # surfaced to the calling worker
+                done.set_exception(e)
+
+        self._connection.add_callback_threadsafe(run)
+        return done.result(timeout=PUBLISH_TIMEOUT_SECONDS)
+
+    def exchange_declare(self, *args, **kwargs):
+        return self._call(self._channel.exchange_declare, *args, **kwargs)
+
+    def basic_publish(self, *args, **kwargs):
+        return self._call(self._channel.basic_publish, *args, **kwargs)
+
+    def basic_ack(self, delivery_tag: int) -> None:
+        # Fire-and-forget: callbacks run in submission order, so an ack never overtakes
+        # the publish queued before it by the same worker.
+        self._connection.add_callback_threadsafe(lambda: self._channel.basic_ack(delivery_tag=delivery_tag))
+
+    def basic_nack(self, delivery_tag: int, requeue: bool = False) -> None:
+        self._connection.add_callback_threadsafe(
+            lambda: self._channel.basic_nack(delivery_tag=delivery_tag, requeue=requeue)
+        )
+
+
+class _Task:
+    __slots__ = ("start_tag", "finish_tag", "key", "fn", "args", "kwargs", "future")
+
+    def __init__(self, start_tag, finish_tag, key, fn, args, kwargs):
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future: Future = Future()
+
+
+class FairWorkerPool:
+    """N worker threads taking tasks across tenants by finish tag; same-key tasks run in order."""
+
+    def __init__(self, workers: int, weights: Optional[Dict[Hashable, float]] = None, name: str = "msg-worker"):
+        self._clock = VirtualClock(weights)
+        self._cond = threading.Condition()
+        self._queues: Dict[Hashable, Deque[_Task]] = {}
+        self._running_keys: Set[Hashable] = set()
+        self._pending = 0
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True) for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def size(self) -> int:
+        return len(self._threads)
+
+    def submit(self, tenant: Hashable, key: Optional[Hashable], fn: Callable, *args, **kwargs) -> Future:
+        with self._cond:
+            task = _Task(*self._clock.tag(tenant), key, fn, args, kwargs)
+            self._queues.setdefault(tenant, deque()).append(task)
+            self._pending += 1
+            self._cond.notify()
+        return task.future
+
+    def _next_locked(self) -> Optional[_Task]:
+        """Lowest finish tag among each tenant's first task whose key is free."""
+        best: Optional[Tuple[_Task, Hashable, int]] = None
+        for tenant, queue in self._queues.items():
+            blocked: Set[Hashable] = set()
+            for i, task in enumerate(queue):
+                if task.key is not None and (task.key in self._running_keys or task.key in blocked):
+                    blocked.add(task.key)  # later tasks of this key must not overtake it
+                    continue
+                if best is None or task.finish_tag < best[0].finish_tag:
+                    best = (task, tenant, i)
+                break
+        if best is None:
+            return None
+        task, tenant, i = best
+        queue = self._queues[tenant]
+        del queue[i]
+        if not queue:
+            del self._queues[tenant]
+            if not self._queues:
+                self._clock.forget_idle()
+        self._clock.served(task.start_tag)
+        if task.key is not None:
+            self._running_keys.add(task.key)
+        return task
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                task = self._next_locked()
+                while task is None:
+                    if self._closed and not self._queues:
+                        return
+                    self._cond.wait()
+                    task = self._next_locked()
+            try:
+                if task.future.set_running_or_notify_cancel():
+                    try:
+                        task.future.set_result(task.fn(*task.args, **task.kwargs))
+                    except BaseException as e:
+                        task.future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._running_keys.discard(task.key)
+                    self._pending -= 1
+                    # A freed key may unblock a task another idle worker is waiting for.
+                    self._cond.notify_all()
+
+    def pending(self) -> int:
+        """Tasks queued or running."""
+        with self._cond:
+            return self._pending
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
@@ -0,0 +1,152 @@
+"""Last product discussed per customer, with write-behind persistence.
+
+Reads come from a bounded in-process cache, then from writes not yet flushed, and
+only then from the ``conversation_state`` table. Writes update the cache and are
+queued; a background thread upserts everything queued in one transaction every
+``CONVERSATION_STATE_FLUSH_SECONDS`` (or sooner once
+``CONVERSATION_STATE_FLUSH_MAX_PENDING`` customers are waiting) instead of
+committing once per message. ``flush()`` also runs on shutdown.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from . import metrics
+from .bounded_cache import BoundedCache
+from .config import (
+    CONVERSATION_MEMORY_MAX_ENTRIES,
+    CONVERSATION_MEMORY_TTL_SECONDS,
+    CONVERSATION_STATE_FLUSH_MAX_PENDING,
+    CONVERSATION_STATE_FLUSH_SECONDS,
+)
+from .crud import conversation_state as conv_state_crud
+from .db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+STATE_FLUSHES = metrics.counter("conversation_state_flushes_total", "Write-behind flushes", ("outcome",))
+STATE_ROWS_WRITTEN = metrics.counter("conversation_state_rows_written_total", "Conversation state rows upserted")
+STATE_PENDING = metrics.gauge("conversation_state_pending", "Conversation state writes waiting for a flush")
+
+_memory: BoundedCache[int] = BoundedCache(
+    "conversation_memory", CONVERSATION_MEMORY_MAX_ENTRIES, CONVERSATION_MEMORY_TTL_SECONDS,
+)
+_pending: Dict[int, Optional[int]] = {}
+_pending_lock = threading.Lock()
+# Serializes flushes so rows are never written out of order.
+_flush_lock = threading.Lock()
+_wake = threading.Event()
+_stop = threading.Event()
+_flusher: Optional[threading.Thread] = None
+
+
+def get_last_product(db: Session, customer_id: int) -> Optional[int]:
+    last_id = _memory.get(customer_id)
+    if last_id is not None:
+        return last_id
+    with _pending_lock:
+        if customer_id in _pending:
+            return _pending[customer_id]
+    # Read from DB state when cache is cold
+    state = conv_state_crud.get_state(db, customer_id=customer_id)
+    last_id = state.last_product_id if state else None
+    if last_id is not None:
+        _memory.set(customer_id, last_id)
+    return last_id
+
+
+def set_last_product(customer_id: int, product_id: Optional[int]) -> None:
+    _memory.set(customer_id, product_id)
+    with _pending_lock:
+        _pending[customer_id] = product_id
+        pending = len(_pending)
+    STATE_PENDING.set(pending)
+    if pending >= CONVERSATION_STATE_FLUSH_MAX_PENDING:
+        _wake.set()
+
+
+def flush() -> int:
+    """Write every queued state in one transaction; returns the number of rows written."""
+    with _flush_lock:
+        with _pending_lock:
+            batch = dict(_pending)
+        if not batch:
+            return 0
+        written = _write(batch)
+        with _pending_lock:
+            for customer_id, product_id in batch.items():
+                # Keep anything overwritten while the flush was running.
+                if customer_id in _pending and _pending[customer_id] == product_id:
+                    del _pending[customer_id]
+            STATE_PENDING.set(len(_pending))
+        return written
+
+
+def _write(batch: Dict[int, Optional[int]]) -> int:
+    db = SessionLocal()
+    try:
+        conv_state_crud.bulk_set_last_products(db, batch)
+        db.commit()
+        STATE_FLUSHES.inc(outcome="ok")
+        STATE_ROWS_WRITTEN.inc(len(batch))
+        return len(batch)
+    except Exception as e:
+        db.rollback()
+        STATE_FLUSHES.inc(outcome="error")
+        # One bad row (e.g. a product deleted meanwhile) must not block the rest forever.
+        logger.warning(f"Batched conversation state write failed ({e}); retrying row by row")
+        written = 0
+        for customer_id, product_id in batch.items():
+            try:
+                conv_state_crud.bulk_set_last_products(db, {customer_id: product_id})
+                db.commit()
+                written += 1
+            except Exception as row_err:
+                db.rollback()
+                logger.error(f"Dropping conversation state for customer {customer_id}: {row_err}")
+        STATE_ROWS_WRITTEN.inc(written)
+        return written
+    finally:
+        db.close()
+
+
+def _run_flusher(stop: threading.Event) -> None:
+    while not stop.is_set():
+        _wake.wait(CONVERSATION_STATE_FLUSH_SECONDS)
+        _wake.clear()
+        try:
+            flush()
+        except Exception as e:
+            logger.error(f"Conversation state flush failed: {e}", exc_info=True)
+
+
+def start_flusher() -> None:
+    global _flusher
+    if _flusher is None or not _flusher.is_alive():
+        _stop.clear()
+        _flusher = threading.Thread(target=_run_flusher, args=(_stop,), name="conversation-state-flusher", daemon=True)
+        _flusher.start()
+
+
+def stop_flusher() -> None:
+    """Stop the background thread and write whatever is still queued."""
+    _stop.set()
+    _wake.set()
+    if _flusher is not None:
+        _flusher.join(timeout=CONVERSATION_STATE_FLUSH_SECONDS + 5)
+    flush()
+
+
+def stats() -> Dict[str, object]:
+    with _pending_lock:
+        pending = len(_pending)
+    return {
+        "memory": _memory.stats(),
+        "pending_writes": pending,
+        "rows_written": STATE_ROWS_WRITTEN.value(),
+        "failed_flushes": STATE_FLUSHES.value(outcome="error"),
+    }
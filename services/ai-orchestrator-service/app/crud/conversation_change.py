@@ -0,0 +1,68 @@
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from ..models.conversation_change import ConversationChange
+from ..models.customer import Customer
+from ..models.message import Message
+from ..phone_cache import get_whatsapp_no
+
+# Arbitrary constant key for pg_advisory_xact_lock, shared by every replica.
+_FEED_LOCK_KEY = 0x636F6E76
+
+
+def record_answered(db: Session, messages: Iterable[Message], user_id: Optional[int]) -> None:
+    """Append answered messages to the change feed, in the caller's transaction (no commit).
+
+    On PostgreSQL the feed append is serialized with a transaction-scoped advisory lock,
+    so ``seq`` values become visible in commit order and a reader polling ``since`` a
+    cursor never skips a change committed late with a lower ``seq``.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _FEED_LOCK_KEY})
+    for m in messages:
+        db.add(ConversationChange(message_id=m.id, customer_id=m.customer_id, user_id=user_id))
+
+
+def latest_seq(db: Session, user_id: Optional[int] = None) -> int:
+    query = select(ConversationChange.seq).order_by(ConversationChange.seq.desc()).limit(1)
+    if user_id is not None:
+        query = query.where(ConversationChange.user_id == user_id)
+    return db.execute(query).scalar() or 0
+
+
+def get_changes(db: Session, since: int = 0, user_id: Optional[int] = None, limit: int = 200) -> Tuple[List[dict], int]:
+    """Answered messages with ``seq > since``, oldest first, and the cursor to resume from."""
+    query = (
+        select(
+            ConversationChange.seq,
+            Message.id,
+            Message.customer_id,
+            Message.user_message,
+            Message.response_message,
+            Customer.whatsapp_no,
+        )
+        .join(Message, Message.id == ConversationChange.message_id)
+        .join(Customer, Customer.id == ConversationChange.customer_id)
+        .where(ConversationChange.seq > since)
+        .order_by(ConversationChange.seq)
+        .limit(limit)
+    )
+    if user_id is not None:
+        query = query.where(ConversationChange.user_id == user_id)
+    changes: List[dict] = []
+    for row in db.execute(query):
+        changes.append({
+            "seq": row.seq,
+            # Same conversation key as get_conversations
+            "whatsapp_no": row.whatsapp_no or get_whatsapp_no(row.customer_id) or f"customer:{row.customer_id}",
+            "message": {
+                "id": row.id,
+                "customer_id": row.customer_id,
+                "user_message": row.user_message,
+                "response_message": row.response_message,
+            },
+        })
+    cursor = changes[-1]["seq"] if changes else since
+    return changes, cursor
@@ -1,4 +1,7 @@
+from typing import Dict, Optional
+
 from sqlalchemy.orm import Session
+from ..db.upsert import insert_for
 from ..models.conversation_state import ConversationState
 
 
@@ -16,3 +19,19 @@ def set_last_product(db: Session, customer_id: int, product_id: int | None) -> C
     db.commit()
     db.refresh(state)
     return state
+
+
+def bulk_set_last_products(db: Session, last_products: Dict[int, Optional[int]]) -> None:
+    """Upsert ``customer_id -> last_product_id`` for many customers in one statement (no commit)."""
+    if not last_products:
+        return
+    table = ConversationState.__table__
+    stmt = insert_for(db, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.customer_id],
+        set_={"last_product_id": stmt.excluded.last_product_id},
+    )
+    db.execute(stmt, [
+        {"customer_id": customer_id, "last_product_id": product_id}
+        for customer_id, product_id in last_products.items()
+    ])
@@ -1,3 +1,6 @@
+from typing import Dict
+
+from sqlalchemy import Integer, String, bindparam, column, update, values
 from sqlalchemy.orm import Session
 from app.models.customer import Customer
 from app.schemas.customer import CustomerCreate
@@ -8,9 +11,33 @@ def get_customer(db: Session, customer_id: int):
 def get_customers(db: Session, skip: int = 0, limit: int = 100):
     return db.query(Customer).offset(skip).limit(limit).all()
 
-def create_customer(db: Session, customer: CustomerCreate, customer_id: int):
+def create_customer(db: Session, customer: CustomerCreate, customer_id: int, commit: bool = True):
     db_customer = Customer(id=customer_id, **customer.dict())
     db.add(db_customer)
-    db.commit()
-    db.refresh(db_customer)
+    if commit:
+        db.commit()
+        db.refresh(db_customer)
     return db_customer
+
+def set_whatsapp_numbers(db: Session, numbers: Dict[int, str]) -> int:
+    """Bulk-set ``whatsapp_no`` for the given customer ids where it differs; returns rows changed (no commit)."""
+    if not numbers:
+        return 0
+    table = Customer.__table__
+    if db.get_bind().dialect.name == "postgresql":
+        incoming = values(
+            column("id", Integer), column("whatsapp_no", String), name="incoming",
+        ).data(list(numbers.items()))
+        stmt = (
+            update(table)
+            .where(table.c.id == incoming.c.id, table.c.whatsapp_no.is_distinct_from(incoming.c.whatsapp_no))
+            .values(whatsapp_no=incoming.c.whatsapp_no)
+        )
+        return db.execute(stmt).rowcount
+    # SQLite has no column list on a VALUES alias; one executemany does the same job.
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"), table.c.whatsapp_no.is_distinct_from(bindparam("b_no")))
+        .values(whatsapp_no=bindparam("b_no"))
+    )
+    return db.execute(stmt, [{"b_id": cid, "b_no": no} for cid, no in numbers.items()]).rowcount
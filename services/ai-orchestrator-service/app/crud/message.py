@@ -1,24 +1,77 @@
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import exists, func, or_, select, update
+from sqlalchemy.orm import Session
 from ..models.message import Message
 from ..schemas.message import MessageBase
 from ..models.customer import Customer
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from ..phone_cache import get_whatsapp_no
+from datetime import datetime, timedelta, timezone
 
-def create_message(db: Session, message: MessageBase, customer_id: int, message_id: int) -> Message:
+
+def utcnow() -> datetime:
+    """Naive UTC timestamp, as stored in the DateTime columns."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def create_message(db: Session, message: MessageBase, customer_id: int, message_id: int, commit: bool = True) -> Message:
+    """Add a message; with ``commit=False`` it is written by the caller's next commit."""
     db_message = Message(
         id=message_id,
         customer_id=customer_id,
-        user_message=message.user_message
+        user_message=message.user_message,
+        is_send_response=False,
+        created_at=utcnow(),
+        attempts=0,
     )
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
+    if commit:
+        db.commit()
+        db.refresh(db_message)
     return db_message
 
 def get_unprocessed_messages(db: Session) -> List[Message]:
     return db.query(Message).filter(Message.is_send_response == False).all()
 
+def claim_stale_unprocessed(
+    db: Session, stale_seconds: float, lease_seconds: float, max_attempts: int, limit: int,
+) -> List[int]:
+    """Claim up to ``limit`` unanswered messages older than ``stale_seconds`` and commit the claim.
+
+    Rows without ``created_at`` predate the sweeper migration and are never claimed:
+    their age is unknown and they may be months old. Rows are picked with ``FOR UPDATE SKIP LOCKED`` so concurrent sweepers never pick
+    the same ones; the committed ``claimed_at`` lease then keeps them out of other
+    sweeps for ``lease_seconds`` while they are being reprocessed.
+    """
+    now = utcnow()
+    stale_before = now - timedelta(seconds=stale_seconds)
+    lease_expired_before = now - timedelta(seconds=lease_seconds)
+    ids = db.execute(
+        select(Message.id)
+        .where(
+            Message.is_send_response == False,
+            Message.created_at < stale_before,
+            or_(Message.claimed_at.is_(None), Message.claimed_at < lease_expired_before),
+            Message.attempts < max_attempts,
+        )
+        .order_by(Message.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    if ids:
+        db.execute(
+            update(Message)
+            .where(Message.id.in_(ids))
+            .values(claimed_at=now, attempts=Message.attempts + 1)
+        )
+    db.commit()
+    return list(ids)
+
+def unprocessed_backlog(db: Session) -> Tuple[int, Optional[datetime]]:
+    """Number of unanswered messages and the oldest one's created_at."""
+    count, oldest = db.execute(
+        select(func.count(Message.id), func.min(Message.created_at)).where(Message.is_send_response == False)
+    ).one()
+    return count, oldest
+
 def get_message(db: Session, message_id: int) -> Message | None:
     return db.query(Message).filter(Message.id == message_id).first()
 
@@ -31,23 +84,80 @@ def update_message_response(db: Session, message_id: int, response_message: str)
         db.refresh(db_message)
     return db_message
 
+def set_message_response(db_message: Message, response_message: str) -> Message:
+    """Record the reply on a message the session already holds (no re-query, no commit)."""
+    db_message.response_message = response_message
+    db_message.is_send_response = True
+    return db_message
+
 def get_conversations(db: Session, user_id: int | None = None) -> List[dict]:
-    query = db.query(Customer).options(joinedload(Customer.messages))
+    conversations, _ = get_conversations_page(db, user_id=user_id)
+    return conversations
+
+def get_conversations_page(
+    db: Session,
+    user_id: int | None = None,
+    limit: int | None = None,
+    cursor: int | None = None,
+    messages_limit: int | None = None,
+) -> Tuple[List[dict], Optional[int]]:
+    """One page of conversations (customers with at least one answered message), by customer id.
+
+    Keyset pagination: pass the returned cursor back to get the next page; it is None
+    on the last page. ``messages_limit`` keeps only each conversation's latest answered
+    messages. Filtering, ``first_message`` and the per-conversation limit run in SQL
+    (indexes on ``customers.user_id`` and ``messages(customer_id, id)``).
+    """
+    answered = Message.response_message.isnot(None)
+    first_message = (
+        select(Message.user_message)
+        .where(Message.customer_id == Customer.id, Message.user_message.isnot(None), Message.user_message != "")
+        .order_by(Message.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    page = (
+        select(Customer.id, Customer.whatsapp_no, first_message.label("first_message"))
+        .where(exists().where(Message.customer_id == Customer.id, answered))
+        .order_by(Customer.id)
+    )
     if user_id is not None:
-        query = query.filter(Customer.user_id == user_id)
-    customers = query.all()
+        page = page.where(Customer.user_id == user_id)
+    if cursor is not None:
+        page = page.where(Customer.id > cursor)
+    if limit is not None:
+        page = page.limit(limit)
+    customers = db.execute(page).all()
+    if not customers:
+        return [], None
+
+    customer_ids = [c.id for c in customers]
+    msgs = select(
+        Message.id, Message.customer_id, Message.user_message, Message.response_message,
+    ).where(Message.customer_id.in_(customer_ids), answered)
+    if messages_limit is not None:
+        ranked = msgs.add_columns(
+            func.row_number().over(partition_by=Message.customer_id, order_by=Message.id.desc()).label("rn")
+        ).subquery()
+        msgs = select(
+            ranked.c.id, ranked.c.customer_id, ranked.c.user_message, ranked.c.response_message,
+        ).where(ranked.c.rn <= messages_limit).order_by(ranked.c.customer_id, ranked.c.id)
+    else:
+        msgs = msgs.order_by(Message.customer_id, Message.id)
+    by_customer: Dict[int, List[dict]] = {cid: [] for cid in customer_ids}
+    for m in db.execute(msgs):
+        by_customer[m.customer_id].append({
+            "id": m.id,
+            "customer_id": m.customer_id,
+            "user_message": m.user_message,
+            "response_message": m.response_message,
+        })
 
     result: List[dict] = []
     for customer in customers:
-        # Only include if there are messages with AI responses
-        msgs = [m for m in customer.messages if m.response_message is not None]
-        if not msgs:
-            continue
-
-        first_user_msg = next((m.user_message for m in customer.messages if m.user_message), None)
         # TEMP: Use a stable identifier if phone is unknown; UI expects a string key
         # Prefer persisted phone; then try cache; then fallback stable id
-        persisted_no = getattr(customer, "whatsapp_no", None)
+        persisted_no = customer.whatsapp_no
         cache_no = None
         if not persisted_no:
             try:
@@ -58,16 +168,9 @@ def get_conversations(db: Session, user_id: int | None = None) -> List[dict]:
         result.append(
             {
                 "whatsapp_no": persisted_no or cache_no or f"customer:{customer.id}",
-                "first_message": first_user_msg,
-                "messages": [
-                    {
-                        "id": m.id,
-                        "customer_id": m.customer_id,
-                        "user_message": m.user_message,
-                        "response_message": m.response_message,
-                    }
-                    for m in msgs
-                ],
+                "first_message": customer.first_message,
+                "messages": by_customer[customer.id],
             }
         )
-    return result
+    next_cursor = customer_ids[-1] if limit is not None and len(customers) == limit else None
+    return result, next_cursor
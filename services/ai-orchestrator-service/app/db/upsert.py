@@ -0,0 +1,18 @@
+"""Dialect-aware ``INSERT ... ON CONFLICT`` for bulk upserts.
+
+PostgreSQL (production) and SQLite (tests) both support ``ON CONFLICT DO UPDATE``;
+their SQLAlchemy constructs just live in different dialect modules.
+"""
+from sqlalchemy.orm import Session
+
+
+def insert_for(db: Session, table):
+    """An ``insert(table)`` that supports ``on_conflict_do_update`` for the session's database."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Bulk upsert is not supported on {dialect}")
+    return insert(table)
@@ -0,0 +1,45 @@
+"""Virtual-time tags for weighted-fair queueing across tenants.
+
+Shared by the new_message worker pool (``consumer_pool.FairWorkerPool``) and the
+LLM slots (``llm_scheduler.FairScheduler``). Each tenant's next item starts at
+``max(virtual time, the tenant's last finish)`` and finishes ``1 / weight`` later;
+items are served in finish-tag order and the virtual time advances to the start
+tag of the item served. A backlogged tenant therefore gets its weighted share, and
+a tenant that was idle is served next instead of behind the backlog, without
+banking credit for the time it was idle.
+
+Not thread-safe: callers hold their own lock around every call.
+"""
+from __future__ import annotations
+
+from typing import Dict, Hashable, Optional, Tuple
+
+
+class VirtualClock:
+    def __init__(self, weights: Optional[Dict[Hashable, float]] = None, default_weight: float = 1.0):
+        self.weights = weights or {}
+        self.default_weight = default_weight
+        self.now = 0.0
+        self._last_finish: Dict[Hashable, float] = {}
+
+    def _quantum(self, tenant: Hashable) -> float:
+        return 1.0 / max(1e-6, self.weights.get(tenant, self.default_weight))
+
+    def tag(self, tenant: Hashable) -> Tuple[float, float]:
+        """(start, finish) tags for the tenant's next item."""
+        start = max(self.now, self._last_finish.get(tenant, 0.0))
+        finish = start + self._quantum(tenant)
+        self._last_finish[tenant] = finish
+        return start, finish
+
+    def served(self, start: float) -> None:
+        self.now = max(self.now, start)
+
+    def cancel(self, tenant: Hashable) -> None:
+        """Give back the share of an item that left the queue without being served."""
+        if tenant in self._last_finish:
+            self._last_finish[tenant] -= self._quantum(tenant)
+
+    def forget_idle(self) -> None:
+        """Drop tenants whose tags are all in the past; they would start at ``now`` anyway."""
+        self._last_finish = {t: f for t, f in self._last_finish.items() if f > self.now}
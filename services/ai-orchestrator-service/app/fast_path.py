@@ -0,0 +1,81 @@
+"""Deterministic replies for plain price/stock questions about a confidently chosen product.
+
+When ``process_message`` already knows the product and the customer only asks for
+its price or availability, an LLM would just rephrase facts we hold. This answers
+from ``reply_templates`` instead, in milliseconds. The share of eligible messages
+answered this way is configurable per tenant (``FAST_PATH_RATE`` /
+``FAST_PATH_TENANT_RATES``) so it can be rolled out gradually; the rest still go to
+the LLM. Selection is deterministic per message id, so retries behave the same.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+from . import metrics
+from .config import (
+    FAST_PATH_LOCALE,
+    FAST_PATH_MIN_SCORE,
+    FAST_PATH_RATE,
+    FAST_PATH_TENANT_LOCALES,
+    FAST_PATH_TENANT_RATES,
+    METRICS_TENANT_LABELS,
+)
+from .reply_templates import detect_fact_intent, render_fact_reply
+
+FAST_PATH_ELIGIBLE = metrics.counter(
+    "fast_path_eligible_total", "Messages that could be answered from templates", ("tenant", "intent"),
+)
+FAST_PATH_REPLIES = metrics.counter(
+    "fast_path_replies_total", "Messages answered from templates without an LLM call", ("tenant", "intent"),
+)
+
+
+def tenant_rate(user_id: int) -> float:
+    return FAST_PATH_TENANT_RATES.get(user_id, FAST_PATH_RATE)
+
+
+def tenant_locale(user_id: int) -> str:
+    return FAST_PATH_TENANT_LOCALES.get(user_id, FAST_PATH_LOCALE)
+
+
+def _selected(message_id: int, rate: float) -> bool:
+    if rate >= 1.0:
+        return True
+    if rate <= 0.0:
+        return False
+    # Knuth multiplicative hash spreads sequential ids evenly over [0, 1).
+    return ((message_id * 2654435761) % 2**32) / 2**32 < rate
+
+
+def try_answer(message, product, score: float, user_id: int, user_text: Optional[str] = None) -> Optional[str]:
+    """Template reply for a plain price/stock question, or None to use the LLM.
+
+    ``user_text`` overrides ``message.user_message`` (e.g. a coalesced burst).
+    """
+    if product is None or score < FAST_PATH_MIN_SCORE:
+        return None
+    intent = detect_fact_intent(user_text if user_text is not None else message.user_message or "")
+    if intent is None:
+        return None
+    reply = render_fact_reply(intent, product, tenant_locale(user_id))
+    if reply is None:
+        return None
+    tenant = user_id if METRICS_TENANT_LABELS else "all"
+    FAST_PATH_ELIGIBLE.inc(tenant=tenant, intent=intent)
+    if not _selected(int(message.id or 0), tenant_rate(user_id)):
+        return None
+    FAST_PATH_REPLIES.inc(tenant=tenant, intent=intent)
+    return reply
+
+
+def stats() -> dict:
+    """Eligible vs answered counts and the answered share, for diagnostics."""
+    eligible = sum(v for _, v in FAST_PATH_ELIGIBLE.samples())
+    answered = sum(v for _, v in FAST_PATH_REPLIES.samples())
+    return {
+        "eligible": eligible,
+        "answered": answered,
+        "answered_rate": answered / eligible if eligible else 0.0,
+        "default_rate": FAST_PATH_RATE,
+        "tenant_rates": {str(k): v for k, v in FAST_PATH_TENANT_RATES.items()},
+    }
@@ -51,3 +51,13 @@ def generate_response(prompt: str) -> str:
         return getattr(response, 'text', str(response))
     except Exception as e:
         return f"[Gemini error: {e}]"
+
+
+async def agenerate_response(prompt: str, timeout: float) -> str:
+    """
+    Async Gemini call with a per-request timeout. Raises on any failure.
+    """
+    if not model:
+        raise RuntimeError("missing dependency or API key")
+    response = await model.generate_content_async(prompt, request_options={"timeout": timeout})
+    return getattr(response, 'text', str(response))
@@ -1,5 +1,8 @@
-from groq import Groq
-from .config import GROQ_API_KEY
+import httpx
+from groq import AsyncGroq, Groq
+from .config import GROQ_API_KEY, LLM_MAX_CONNECTIONS
+
+MODEL = "llama-3.1-8b-instant"
 
 # Lazily initialize the Groq client only if the API key is available.
 client = None
@@ -24,39 +27,43 @@ def generate_response(prompt: str) -> str:
                     "content": prompt,
                 }
             ],
-            model="llama-3.1-8b-instant",
+            model=MODEL,
         )
         return chat_completion.choices[0].message.content
     except Exception as e:
         return f"[Groq unavailable: {e}]"
-from groq import Groq
-from .config import GROQ_API_KEY
 
-# Lazily initialize the Groq client only if the API key is available.
-client = None
-if GROQ_API_KEY:
-    try:
-        client = Groq(api_key=GROQ_API_KEY)
-    except Exception:
-        # Leave client as None; generate_response will handle gracefully.
-        client = None
 
-def generate_response(prompt: str) -> str:
+# Async client for the LLM gateway; created on first use inside the gateway's event loop
+# so its pooled httpx connections are bound to that loop and reused across messages.
+_async_client = None
+
+def _get_async_client() -> AsyncGroq:
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncGroq(
+            api_key=GROQ_API_KEY,
+            max_retries=0,  # the gateway decides about fallback and hedging
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
+            ),
+        )
+    return _async_client
+
+async def agenerate_response(prompt: str, timeout: float) -> str:
     """
-    Uses Groq to generate a response from a prompt.
+    Async Groq call with a per-request timeout. Raises on any failure.
     """
-    try:
-        if client is None:
-            return "[Groq unavailable: Missing or invalid GROQ_API_KEY]"
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model="llama-3.1-8b-instant",
-        )
-        return chat_completion.choices[0].message.content
-    except Exception as e:
-        return f"[Groq unavailable: {e}]"
+    if not GROQ_API_KEY:
+        raise RuntimeError("Missing or invalid GROQ_API_KEY")
+    chat_completion = await _get_async_client().chat.completions.create(
+        messages=[
+            {
+                "role": "user",
+                "content": prompt,
+            }
+        ],
+        model=MODEL,
+        timeout=timeout,
+    )
+    return chat_completion.choices[0].message.content
@@ -0,0 +1,91 @@
+"""Idempotent storage of incoming messages, keyed by message id.
+
+RabbitMQ redelivers a new_message event whenever its ack was lost (pod restart,
+connection drop), so the same message id can arrive more than once. The
+``messages`` primary key is the source of truth: inserting a known id fails and
+the existing row is used instead. A bounded in-process set of recently stored ids
+sits in front of it, so the common duplicates (redelivery to the same pod) are
+recognised without a failed insert and rollback.
+
+Callers get the stored rows back: an already answered duplicate is republished
+from ``response_message`` rather than sent to the LLM again, and an unanswered one
+(the pod died mid-call) is simply processed.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import metrics
+from .bounded_cache import BoundedCache
+from .config import IDEMPOTENCY_CACHE_MAX_ENTRIES, IDEMPOTENCY_CACHE_TTL_SECONDS
+from .models.message import Message
+
+logger = logging.getLogger(__name__)
+
+DUPLICATES = metrics.counter(
+    "duplicate_messages_total", "Redelivered new_message events recognised as duplicates", ("detected_by",),
+)
+DUPLICATE_ACTIONS = metrics.counter(
+    "duplicate_message_actions_total", "What happened to duplicate new_message events", ("action",),
+)
+
+_stored_ids: BoundedCache[bool] = BoundedCache(
+    "stored_message_ids", IDEMPOTENCY_CACHE_MAX_ENTRIES, IDEMPOTENCY_CACHE_TTL_SECONDS,
+)
+
+StoreFn = Callable[[Session, dict], Tuple[Message, int]]
+
+
+def _store_all(db: Session, message_datas: List[dict], store: StoreFn, trust_cache: bool) -> List[Tuple[Message, int, bool]]:
+    stored: List[Tuple[Message, int, bool]] = []
+    for data in message_datas:
+        if not trust_cache or data["id"] in _stored_ids:
+            existing = db.get(Message, data["id"])
+            if existing is not None:
+                DUPLICATES.inc(detected_by="cache" if trust_cache else "constraint")
+                stored.append((existing, data["user_id"], True))
+                continue
+        message, user_id = store(db, data)
+        stored.append((message, user_id, False))
+    db.commit()
+    return stored
+
+
+def store_messages(db: Session, message_datas: List[dict], store: StoreFn) -> List[Tuple[Message, int, bool]]:
+    """Store each message once; returns ``(message, user_id, was_duplicate)`` in event order.
+
+    ``store`` adds one new message to the session without committing. The whole
+    batch is committed here.
+    """
+    # The same id twice in one batch (e.g. a redelivery coalesced with the original)
+    unique: Dict[int, dict] = {}
+    for data in message_datas:
+        if data["id"] in unique:
+            DUPLICATES.inc(detected_by="batch")
+        unique[data["id"]] = data
+    batch = list(unique.values())
+    try:
+        stored = _store_all(db, batch, store, trust_cache=True)
+    except IntegrityError:
+        # An id stored before this process started (or evicted from the cache).
+        db.rollback()
+        stored = _store_all(db, batch, store, trust_cache=False)
+    for message, _, _ in stored:
+        _stored_ids.set(message.id, True)
+    return stored
+
+
+def record_duplicate_action(action: str) -> None:
+    DUPLICATE_ACTIONS.inc(action=action)
+
+
+def stats() -> Dict[str, object]:
+    return {
+        "duplicates": {key[0]: value for key, value in DUPLICATES.samples()},
+        "actions": {key[0]: value for key, value in DUPLICATE_ACTIONS.samples()},
+        "known_ids": _stored_ids.stats(),
+    }
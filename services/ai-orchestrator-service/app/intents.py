@@ -0,0 +1,156 @@
+"""Rule-based pre-classifier for messages that need no product lookup or LLM.
+
+"hi", "thanks", "ok 👍", "bye" and stickers (the connector sends
+``[Unsupported message type: sticker]``) used to go through catalog loading,
+matching and an LLM call. ``canned_reply`` runs first in ``process_message`` and
+answers them from a fixed, localized reply instead, in microseconds.
+
+Only messages made up entirely of such phrases are matched, after lowercasing and
+dropping punctuation and emoji; "hi, do you have red shoes?" still goes to the
+pipeline. In a coalesced burst every line has to be trivial, and the last one sets
+the intent. Replies follow the tenant's fast-path locale and can be overridden,
+or disabled with ``null``, per tenant via ``INTENT_TENANT_REPLIES``.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import re
+import unicodedata
+from typing import Dict, Optional
+
+from . import metrics
+from .config import INTENT_TENANT_REPLIES, INTENTS_ENABLED, METRICS_TENANT_LABELS
+from .fast_path import tenant_locale
+
+logger = logging.getLogger(__name__)
+
+INTENT_MESSAGES = metrics.counter(
+    "intent_messages_total", "Messages by pre-classified intent ('other' goes to the pipeline)", ("intent",),
+)
+INTENT_BYPASSES = metrics.counter(
+    "intent_bypass_total", "Messages answered with a canned reply, skipping matching and the LLM", ("tenant", "intent"),
+)
+
+_UNSUPPORTED_RE = re.compile(r"^\[Unsupported message type: [^\]]*\]$")
+
+# Matched against the whole normalized line.
+_INTENT_PATTERNS = [
+    ("greeting", re.compile(
+        r"^(?:hi+|hello+|hey+|helo|hai|hola|yo|good (?:morning|afternoon|evening|day)|gm|ayubowan|vanakkam"
+        r"|ආයුබෝවන්|வணக்கம்)(?: (?:there|all|team|sir|madam|miss|dear|friend|bro|machan))?$"
+    )),
+    ("thanks", re.compile(
+        r"^(?:(?:thanks?|thank u|thank you|thx|tnx|thanx|ty|many thanks|cheers|stuthi|isthuthi|nandri|ස්තූතියි|நன்றி)"
+        r"(?: (?:a lot|so much|very much|again))?(?: (?:sir|madam|dear|team|bro|machan))?)$"
+    )),
+    ("ack", re.compile(r"^(?:ok+|okay|okey|oki|k+|sure|alright|fine|cool|noted|got it|great|nice|hmm+|ela|hari|සරි|சரி)$")),
+    ("goodbye", re.compile(r"^(?:bye+|bye bye|goodbye|good bye|see you|see ya|good night|gn|ttyl)$")),
+]
+
+REPLIES: Dict[str, Dict[str, str]] = {
+    "en": {
+        "greeting": "Hello! 👋 How can we help you today? Ask us about any product, its price or availability.",
+        "thanks": "You're welcome! Let us know if you need anything else.",
+        "ack": "👍 Let us know if there is anything else we can help with.",
+        "goodbye": "Thank you for contacting us. Have a great day!",
+        "unsupported": "Sorry, we can only read text messages. Please type your question.",
+    },
+    "si": {
+        "greeting": "ආයුබෝවන්! 👋 අපට ඔබට උදව් කළ හැක්කේ කෙසේද? ඕනෑම භාණ්ඩයක මිල හෝ තොගය ගැන අසන්න.",
+        "thanks": "ඔබව සාදරයෙන් පිළිගනිමු! තවත් යමක් අවශ්‍ය නම් අපට කියන්න.",
+        "ack": "👍 තවත් උදව්වක් අවශ්‍ය නම් අපට කියන්න.",
+        "goodbye": "අප හා සම්බන්ධ වූවාට ස්තූතියි. සුබ දවසක්!",
+        "unsupported": "සමාවන්න, අපට කියවිය හැක්කේ පෙළ පණිවිඩ පමණි. කරුණාකර ඔබේ ප්‍රශ්නය ටයිප් කරන්න.",
+    },
+    "ta": {
+        "greeting": "வணக்கம்! 👋 இன்று நாங்கள் எப்படி உதவலாம்? எந்தப் பொருளின் விலை அல்லது கையிருப்பு பற்றியும் கேளுங்கள்.",
+        "thanks": "மிக்க மகிழ்ச்சி! வேறு ஏதாவது தேவைப்பட்டால் சொல்லுங்கள்.",
+        "ack": "👍 வேறு ஏதாவது உதவி தேவைப்பட்டால் சொல்லுங்கள்.",
+        "goodbye": "எங்களைத் தொடர்பு கொண்டதற்கு நன்றி. இனிய நாள்!",
+        "unsupported": "மன்னிக்கவும், எங்களால் உரைச் செய்திகளை மட்டுமே படிக்க முடியும். உங்கள் கேள்வியைத் தட்டச்சு செய்யவும்.",
+    },
+}
+
+
+def _load_tenant_replies(raw: str) -> Dict[int, Dict[str, Optional[str]]]:
+    if not raw.strip():
+        return {}
+    try:
+        return {int(user_id): dict(replies) for user_id, replies in json.loads(raw).items()}
+    except (ValueError, TypeError, AttributeError) as e:
+        logger.warning(f"Ignoring invalid INTENT_TENANT_REPLIES: {e}")
+        return {}
+
+
+_tenant_replies = _load_tenant_replies(INTENT_TENANT_REPLIES)
+
+
+def _normalize(line: str) -> str:
+    # Drop punctuation, symbols (emoji) and joiners; keep letters and combining marks of any script.
+    kept = "".join(
+        " " if unicodedata.category(ch)[0] in "PSZ" or ch in "\u200d\ufe0f" else ch
+        for ch in line.lower()
+    )
+    return " ".join(kept.split())
+
+
+def _classify_line(line: str) -> Optional[str]:
+    line = line.strip()
+    if not line:
+        return None
+    if _UNSUPPORTED_RE.match(line):
+        return "unsupported"
+    text = _normalize(line)
+    if not text:
+        return "ack"  # emoji or punctuation only, e.g. "👍" or "🙏🙏"
+    for intent, pattern in _INTENT_PATTERNS:
+        if pattern.match(text):
+            return intent
+    return None
+
+
+def classify(user_text: str) -> Optional[str]:
+    """The trivial intent of a message (or burst), or None when it needs the full pipeline."""
+    intent = None
+    for line in (user_text or "").splitlines():
+        if not line.strip():
+            continue
+        intent = _classify_line(line)
+        if intent is None:
+            return None
+    return intent
+
+
+def reply_for(intent: str, user_id: int) -> Optional[str]:
+    overrides = _tenant_replies.get(user_id, {})
+    if intent in overrides:
+        return overrides[intent] or None
+    replies = REPLIES.get(tenant_locale(user_id)) or REPLIES["en"]
+    return replies.get(intent)
+
+
+def canned_reply(user_text: str, user_id: int) -> Optional[str]:
+    """Canned reply for a trivial message, or None to run the pipeline."""
+    if not INTENTS_ENABLED:
+        return None
+    intent = classify(user_text)
+    INTENT_MESSAGES.inc(intent=intent or "other")
+    if intent is None:
+        return None
+    reply = reply_for(intent, user_id)
+    if reply is not None:
+        INTENT_BYPASSES.inc(tenant=user_id if METRICS_TENANT_LABELS else "all", intent=intent)
+    return reply
+
+
+def stats() -> Dict[str, object]:
+    """Intent distribution and the share of messages answered without matching or an LLM call."""
+    seen = {key[0]: value for key, value in INTENT_MESSAGES.samples()}
+    total = sum(seen.values())
+    bypassed = sum(v for _, v in INTENT_BYPASSES.samples())
+    return {
+        "intents": seen,
+        "bypassed": bypassed,
+        "bypass_rate": bypassed / total if total else 0.0,
+    }
@@ -0,0 +1,100 @@
+"""Tracked background jobs for long-running admin operations.
+
+A job runs on its own daemon thread and reports progress by updating
+``job.progress``; ``GET /api/v1/ai/jobs/{job_id}`` returns the current state.
+Jobs live in a bounded in-process registry, so they are per replica and
+forgotten after ``JOB_HISTORY_TTL_SECONDS``. Starting a job whose ``key`` is
+already running returns the running job instead of starting a second one.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+from . import metrics
+from .bounded_cache import BoundedCache
+
+logger = logging.getLogger(__name__)
+
+JOB_HISTORY_MAX_ENTRIES = 1000
+JOB_HISTORY_TTL_SECONDS = 86400.0
+
+JOBS = metrics.counter("background_jobs_total", "Finished background jobs", ("kind", "status"))
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    status: str = "pending"  # pending | running | succeeded | failed
+    progress: Dict[str, int] = field(default_factory=dict)
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=_now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    _done: threading.Event = field(default_factory=threading.Event, repr=False, compare=False)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job has finished; False if ``timeout`` passed first."""
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": dict(self.progress),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+_jobs: BoundedCache[Job] = BoundedCache("background_jobs", JOB_HISTORY_MAX_ENTRIES, JOB_HISTORY_TTL_SECONDS)
+_running: Dict[str, Job] = {}
+_lock = threading.Lock()
+
+
+def _run(job: Job, target: Callable[[Job], None], key: Optional[str]) -> None:
+    job.status = "running"
+    job.started_at = _now()
+    try:
+        target(job)
+        job.status = "succeeded"
+    except Exception as e:
+        logger.error(f"Job {job.id} ({job.kind}) failed: {e}", exc_info=True)
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.finished_at = _now()
+        JOBS.inc(kind=job.kind, status=job.status)
+        if key is not None:
+            with _lock:
+                _running.pop(key, None)
+        job._done.set()
+
+
+def start(kind: str, target: Callable[[Job], None], key: Optional[str] = None) -> Job:
+    """Run ``target(job)`` in the background; returns the job (or the running one for ``key``)."""
+    with _lock:
+        if key is not None and key in _running:
+            return _running[key]
+        job = Job(id=uuid.uuid4().hex, kind=kind)
+        _jobs.set(job.id, job)
+        if key is not None:
+            _running[key] = job
+    threading.Thread(target=_run, args=(job, target, key), name=f"job-{kind}", daemon=True).start()
+    return job
+
+
+def get(job_id: str) -> Optional[Job]:
+    return _jobs.get(job_id)
@@ -0,0 +1,247 @@
+"""Async LLM gateway: pooled provider clients, per-provider deadlines and hedging.
+
+Worker threads call ``generate(prompt)``; the request runs on one shared asyncio
+loop in a background thread so provider clients (and their HTTP/gRPC connection
+pools) are created once and reused for every message.
+
+Providers are tried in order (Groq, then Gemini). Each call is bounded by its own
+deadline and guarded by a circuit breaker: a provider whose breaker is open is
+skipped immediately, so an outage costs nothing per message. With hedging enabled, Gemini is also fired when Groq has not answered
+within the hedge delay and whichever successful answer arrives first wins; the
+delay is ``LLM_HEDGE_DELAY_MS`` or, when unset, Groq's observed p95 latency.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from . import gemini_client, groq_client, metrics
+from .circuit_breaker import CircuitBreaker
+from .config import (
+    CB_ERROR_RATE,
+    CB_MIN_CALLS,
+    CB_OPEN_SECONDS,
+    CB_SLOW_CALL_RATE,
+    CB_SLOW_CALL_SECONDS,
+    CB_WINDOW,
+    LLM_GEMINI_TIMEOUT_SECONDS,
+    LLM_GROQ_TIMEOUT_SECONDS,
+    LLM_HEDGE_DELAY_MS,
+    LLM_HEDGE_ENABLED,
+)
+
+logger = logging.getLogger(__name__)
+
+# Hedge delay used until the primary has enough samples for a p95 estimate.
+_DEFAULT_HEDGE_DELAY_SECONDS = 2.0
+_MIN_SAMPLES_FOR_P95 = 20
+UNAVAILABLE_PREFIX = "[LLM unavailable: "
+
+LLM_LATENCY = metrics.histogram(
+    "llm_request_seconds", "LLM provider call latency", ("provider", "outcome"),
+)
+LLM_REQUESTS = metrics.counter(
+    "llm_requests_total", "LLM provider calls", ("provider", "outcome"),
+)
+LLM_HEDGES = metrics.counter(
+    "llm_hedged_requests_total", "Requests where the secondary provider was fired as a hedge", ("winner",),
+)
+
+
+@dataclass(frozen=True)
+class Provider:
+    name: str
+    call: Callable[[str, float], Awaitable[str]]
+    timeout: float
+
+
+PROVIDERS: List[Provider] = [
+    Provider("groq", groq_client.agenerate_response, LLM_GROQ_TIMEOUT_SECONDS),
+    Provider("gemini", gemini_client.agenerate_response, LLM_GEMINI_TIMEOUT_SECONDS),
+]
+
+
+class LLMUnavailable(Exception):
+    """Every provider failed, timed out or was skipped by its breaker."""
+
+
+class ProviderSkipped(Exception):
+    """The provider's circuit breaker is open."""
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(name: str) -> CircuitBreaker:
+    with _breakers_lock:
+        cb = _breakers.get(name)
+        if cb is None:
+            cb = _breakers[name] = CircuitBreaker(
+                name,
+                window=CB_WINDOW,
+                min_calls=CB_MIN_CALLS,
+                error_rate=CB_ERROR_RATE,
+                slow_call_seconds=CB_SLOW_CALL_SECONDS,
+                slow_call_rate=CB_SLOW_CALL_RATE,
+                open_seconds=CB_OPEN_SECONDS,
+            )
+        return cb
+
+
+@dataclass
+class LLMResult:
+    text: str
+    provider: str
+    latency: float
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True)
+            thread.start()
+            _loop = loop
+        return _loop
+
+
+async def _call(provider: Provider, prompt: str) -> LLMResult:
+    cb = breaker(provider.name)
+    if not cb.allow():
+        LLM_REQUESTS.inc(provider=provider.name, outcome="skipped")
+        raise ProviderSkipped(f"circuit open for {provider.name}")
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        text = await asyncio.wait_for(provider.call(prompt, provider.timeout), timeout=provider.timeout)
+        outcome = "ok"
+        return LLMResult(text=text, provider=provider.name, latency=time.perf_counter() - start)
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        raise
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        LLM_LATENCY.observe(elapsed, provider=provider.name, outcome=outcome)
+        LLM_REQUESTS.inc(provider=provider.name, outcome=outcome)
+        if outcome == "cancelled":
+            # A hedge loser says nothing about provider health.
+            cb.release_probe()
+        else:
+            cb.record(outcome == "ok", elapsed)
+
+
+def hedge_delay(provider: str = "groq") -> float:
+    """Seconds to wait on ``provider`` before firing the next one as a hedge."""
+    if LLM_HEDGE_DELAY_MS is not None:
+        return LLM_HEDGE_DELAY_MS / 1000.0
+    if LLM_LATENCY.count(provider=provider, outcome="ok") < _MIN_SAMPLES_FOR_P95:
+        return _DEFAULT_HEDGE_DELAY_SECONDS
+    return LLM_LATENCY.quantile(0.95, provider=provider, outcome="ok") or _DEFAULT_HEDGE_DELAY_SECONDS
+
+
+async def _sequential(providers: List[Provider], prompt: str) -> LLMResult:
+    errors: List[str] = []
+    for provider in providers:
+        try:
+            return await _call(provider, prompt)
+        except Exception as e:
+            logger.warning(f"[AI] {provider.name} failed ({type(e).__name__}: {e}); trying next provider")
+            errors.append(f"{provider.name}: {e or type(e).__name__}")
+    raise LLMUnavailable("; ".join(errors))
+
+
+async def _hedged(primary: Provider, secondary: Provider, prompt: str) -> LLMResult:
+    if breaker(primary.name).state != "closed" or breaker(secondary.name).state != "closed":
+        # Hedging needs two healthy providers; otherwise just route around the sick one.
+        return await _sequential([primary, secondary], prompt)
+    first = asyncio.ensure_future(_call(primary, prompt))
+    done, _ = await asyncio.wait({first}, timeout=hedge_delay(primary.name))
+    if done:
+        try:
+            return first.result()
+        except Exception as e:
+            logger.warning(f"[AI] {primary.name} failed ({type(e).__name__}: {e}); falling back to {secondary.name}")
+            return await _sequential([secondary], prompt)
+
+    second = asyncio.ensure_future(_call(secondary, prompt))
+    pending = {first, second}
+    errors: List[str] = []
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            try:
+                result = task.result()
+            except Exception as e:
+                errors.append(str(e) or type(e).__name__)
+                continue
+            for other in pending:
+                other.cancel()
+            LLM_HEDGES.inc(winner=result.provider)
+            return result
+    raise LLMUnavailable("; ".join(errors))
+
+
+async def agenerate(prompt: str) -> LLMResult:
+    """Answer ``prompt`` with the first provider that succeeds within its deadline."""
+    if LLM_HEDGE_ENABLED and len(PROVIDERS) > 1:
+        return await _hedged(PROVIDERS[0], PROVIDERS[1], prompt)
+    return await _sequential(PROVIDERS, prompt)
+
+
+def generate_result(prompt: str) -> LLMResult:
+    """Blocking wrapper for worker threads; raises LLMUnavailable when every provider fails."""
+    total_deadline = sum(p.timeout for p in PROVIDERS) + 1.0
+    future = asyncio.run_coroutine_threadsafe(agenerate(prompt), _get_loop())
+    return future.result(timeout=total_deadline)
+
+
+def generate_with_provider(prompt: str) -> Tuple[str, str]:
+    """Like ``generate``, plus the name of the provider that answered (``unavailable`` if none did)."""
+    try:
+        result = generate_result(prompt)
+        return result.text, result.provider
+    except Exception as e:
+        return f"{UNAVAILABLE_PREFIX}{e}]", "unavailable"
+
+
+def generate(prompt: str) -> str:
+    """Blocking text-only wrapper, keeping the old clients' bracketed error replies."""
+    return generate_with_provider(prompt)[0]
+
+
+def is_unavailable(reply: str) -> bool:
+    """Whether ``reply`` is the placeholder ``generate`` returns when every provider failed."""
+    return reply.startswith(UNAVAILABLE_PREFIX)
+
+
+def stats() -> Dict[str, Dict[str, object]]:
+    """Per-provider latency summary and the current hedge delay, for diagnostics."""
+    out: Dict[str, Dict[str, object]] = {}
+    for provider in PROVIDERS:
+        out[provider.name] = {
+            "ok": LLM_LATENCY.summary(provider=provider.name, outcome="ok"),
+            "errors": LLM_REQUESTS.value(provider=provider.name, outcome="error"),
+            "timeouts": LLM_REQUESTS.value(provider=provider.name, outcome="timeout"),
+            "skipped": LLM_REQUESTS.value(provider=provider.name, outcome="skipped"),
+            "timeout_seconds": provider.timeout,
+        }
+    out["hedging"] = {"enabled": LLM_HEDGE_ENABLED, "delay_seconds": hedge_delay(PROVIDERS[0].name)}
+    return out
+
+
+def breaker_states() -> Dict[str, Dict[str, object]]:
+    """Circuit breaker state per provider, for diagnostics."""
+    return {provider.name: breaker(provider.name).snapshot() for provider in PROVIDERS}
@@ -0,0 +1,200 @@
+"""Per-tenant admission to the LLM gateway: token buckets plus weighted-fair slots.
+
+Every tenant shares one new_message queue, so a merchant's broadcast campaign
+could take every LLM call (and our Groq rate limit) for minutes. Before calling
+the gateway, ``process_message`` asks for a slot:
+
+1. The tenant's token bucket (``LLM_TENANT_RATE_PER_MINUTE`` with burst
+   ``LLM_TENANT_BURST``, or a ``LLM_TENANT_RATES`` override) must hold a token.
+   Otherwise the tenant is over quota and the message is answered from a template
+   straight away, without occupying a worker.
+2. At most ``LLM_MAX_CONCURRENT_CALLS`` calls run at once. Waiting calls are
+   granted in weighted-fair order (``LLM_TENANT_WEIGHTS``, default 1; see
+   app/fair_queue.py), so a backlogged tenant cannot push a quiet tenant to the
+   back of the line. A call not granted within ``LLM_QUEUE_TIMEOUT_SECONDS`` is
+   degraded as well, and the tenant is not charged for it.
+
+Calls only wait for a slot when more threads call the LLM than there are slots
+(``CONSUMER_WORKERS`` plus the sweeper's threads above ``LLM_MAX_CONCURRENT_CALLS``).
+The main fairness point for the shared new_message queue is earlier: the worker
+pool takes prefetched deliveries per tenant in the same weighted-fair order (see
+``consumer_pool.FairWorkerPool``).
+
+Queue depth, waiting time and admission outcomes are exported per tenant.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+from . import metrics
+from .fair_queue import VirtualClock
+from .config import (
+    LLM_MAX_CONCURRENT_CALLS,
+    LLM_QUEUE_TIMEOUT_SECONDS,
+    LLM_TENANT_BURST,
+    LLM_TENANT_RATE_PER_MINUTE,
+    LLM_TENANT_RATES,
+    LLM_TENANT_WEIGHTS,
+    METRICS_TENANT_LABELS,
+)
+
+QUEUE_DEPTH = metrics.gauge("llm_queue_depth", "LLM calls waiting for a slot", ("tenant",))
+QUEUE_WAIT = metrics.histogram("llm_queue_wait_seconds", "Time LLM calls waited for a slot", ("tenant",))
+ADMISSIONS = metrics.counter(
+    "llm_admissions_total", "LLM admission decisions (admitted, over_quota, timeout)", ("tenant", "outcome"),
+)
+SLOTS_IN_USE = metrics.gauge("llm_slots_in_use", "LLM calls running")
+
+
+def _label(tenant: int):
+    return tenant if METRICS_TENANT_LABELS else "all"
+
+
+class TokenBucket:
+    """``rate`` tokens per second, holding at most ``burst``; starts full."""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+
+    def try_take(self) -> bool:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        return False
+
+
+class _Ticket:
+    __slots__ = ("tenant", "start_tag", "finish_tag", "granted", "event")
+
+    def __init__(self, tenant: int, start_tag: float, finish_tag: float):
+        self.tenant = tenant
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.granted = False
+        self.event = threading.Event()
+
+
+class FairScheduler:
+    """``slots`` concurrent holders, granted across tenants in weighted-fair order (see fair_queue)."""
+
+    def __init__(self, slots: int, weights: Optional[Dict[int, float]] = None, default_weight: float = 1.0):
+        self.slots = max(1, slots)
+        self._clock = VirtualClock(weights, default_weight)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._queues: Dict[int, Deque[_Ticket]] = {}
+
+    def _dispatch_locked(self) -> None:
+        while self._in_use < self.slots and self._queues:
+            tenant = min(self._queues, key=lambda t: self._queues[t][0].finish_tag)
+            queue = self._queues[tenant]
+            ticket = queue.popleft()
+            if not queue:
+                del self._queues[tenant]
+            self._clock.served(ticket.start_tag)
+            self._in_use += 1
+            ticket.granted = True
+            ticket.event.set()
+        if not self._queues:
+            self._clock.forget_idle()
+
+    def acquire(self, tenant: int, timeout: Optional[float] = None) -> bool:
+        """Block until a slot is granted (True) or ``timeout`` passes (False)."""
+        with self._lock:
+            ticket = _Ticket(tenant, *self._clock.tag(tenant))
+            self._queues.setdefault(tenant, deque()).append(ticket)
+            self._dispatch_locked()
+        if ticket.granted or ticket.event.wait(timeout):
+            return True
+        with self._lock:
+            if ticket.granted:  # granted while the wait timed out
+                return True
+            queue = self._queues.get(tenant)
+            if queue is not None:
+                queue.remove(ticket)
+                if not queue:
+                    del self._queues[tenant]
+            # The tenant never got this slot; do not charge its share for it.
+            self._clock.cancel(tenant)
+            return False
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_use -= 1
+            self._dispatch_locked()
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "in_use": self._in_use,
+                "waiting": {str(t): len(q) for t, q in self._queues.items()},
+            }
+
+
+_scheduler = FairScheduler(LLM_MAX_CONCURRENT_CALLS, LLM_TENANT_WEIGHTS)
+_buckets: Dict[int, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def _bucket(tenant: int) -> Optional[TokenBucket]:
+    per_minute = LLM_TENANT_RATES.get(tenant, LLM_TENANT_RATE_PER_MINUTE)
+    if per_minute <= 0:
+        return None
+    with _buckets_lock:
+        bucket = _buckets.get(tenant)
+        if bucket is None:
+            bucket = _buckets[tenant] = TokenBucket(per_minute / 60.0, LLM_TENANT_BURST)
+        return bucket
+
+
+def admit(tenant: int, timeout: float = LLM_QUEUE_TIMEOUT_SECONDS) -> bool:
+    """Take a token and a slot for ``tenant``; False means degrade (over quota or waited too long)."""
+    label = _label(tenant)
+    bucket = _bucket(tenant)
+    if bucket is not None:
+        with _buckets_lock:
+            allowed = bucket.try_take()
+        if not allowed:
+            ADMISSIONS.inc(tenant=label, outcome="over_quota")
+            return False
+    QUEUE_DEPTH.inc(tenant=label)
+    start = time.perf_counter()
+    try:
+        granted = _scheduler.acquire(tenant, timeout)
+    finally:
+        QUEUE_DEPTH.dec(tenant=label)
+        QUEUE_WAIT.observe(time.perf_counter() - start, tenant=label)
+    ADMISSIONS.inc(tenant=label, outcome="admitted" if granted else "timeout")
+    if granted:
+        SLOTS_IN_USE.inc()
+    return granted
+
+
+def release() -> None:
+    """Free the slot taken by a successful ``admit``."""
+    SLOTS_IN_USE.dec()
+    _scheduler.release()
+
+
+def stats() -> Dict[str, object]:
+    """Slot usage, waiting calls per tenant and admission outcomes, for diagnostics."""
+    outcomes: Dict[str, float] = {}
+    for (_, outcome), value in ADMISSIONS.samples():
+        outcomes[outcome] = outcomes.get(outcome, 0.0) + value
+    return {
+        **_scheduler.snapshot(),
+        "admissions": outcomes,
+        "default_rate_per_minute": LLM_TENANT_RATE_PER_MINUTE,
+        "burst": LLM_TENANT_BURST,
+    }
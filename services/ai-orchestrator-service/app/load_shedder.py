@@ -0,0 +1,176 @@
+"""Adaptive load shedding: template replies while the LLM is too slow to wait for.
+
+When Groq slows down or a traffic spike outruns it, new_message events pile up and
+every customer waits. ``process_message`` asks ``allow_llm()`` before queueing for
+the LLM and, while shedding, answers from ``render_degraded_reply`` instead: the
+facts of the product it already chose, or a pointer to ask about a product by name.
+
+The controller watches the p95 of LLM call latency over the last
+``LOAD_SHED_WINDOW_SECONDS`` and the new_message backlog (``messaging.new_message_backlog``:
+events ready in the broker queue plus those held by the worker pool), with
+hysteresis so it does not flap:
+
+- normal -> shedding when p95 exceeds ``LOAD_SHED_LATENCY_SLO_MS`` (once the window
+  holds ``LOAD_SHED_MIN_SAMPLES`` calls) or the backlog reaches ``LOAD_SHED_QUEUE_HIGH``;
+- shedding -> normal when the backlog is at or below ``LOAD_SHED_QUEUE_LOW`` and p95
+  is below ``LOAD_SHED_RECOVER_LATENCY_MS``. After a backlog-only trip, too few
+  latency samples do not hold recovery back.
+
+While shedding, one call per ``LOAD_SHED_PROBE_INTERVAL_SECONDS`` still goes to the
+LLM as a probe, so the window refills with fresh latencies and recovery is noticed.
+Every transition is logged and counted. Off unless ``LOAD_SHED_ENABLED``.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from . import metrics
+from .config import (
+    LOAD_SHED_ENABLED,
+    LOAD_SHED_LATENCY_SLO_MS,
+    LOAD_SHED_MIN_SAMPLES,
+    LOAD_SHED_PROBE_INTERVAL_SECONDS,
+    LOAD_SHED_QUEUE_HIGH,
+    LOAD_SHED_QUEUE_LOW,
+    LOAD_SHED_RECOVER_LATENCY_MS,
+    LOAD_SHED_WINDOW_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+SHEDDING = metrics.gauge("load_shed_active", "1 while LLM replies are replaced by template answers")
+TRANSITIONS = metrics.counter("load_shed_transitions_total", "Load-shedding mode changes", ("mode",))
+SHED_MESSAGES = metrics.counter("load_shed_messages_total", "Messages answered from templates while shedding")
+
+_MAX_SAMPLES = 2000
+
+
+class LoadShedder:
+    """Two-mode controller over a rolling latency window and a queue depth."""
+
+    def __init__(
+        self,
+        latency_slo: float,
+        recover_latency: float,
+        queue_high: int,
+        queue_low: int,
+        window: float,
+        min_samples: int = 10,
+        probe_interval: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.latency_slo = latency_slo
+        self.recover_latency = min(recover_latency, latency_slo)
+        self.queue_high = queue_high
+        self.queue_low = min(queue_low, queue_high)
+        self.window = window
+        self.min_samples = max(1, min_samples)
+        self.probe_interval = probe_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=_MAX_SAMPLES)
+        self._shedding = False
+        self._latency_tripped = False
+        self._since = clock()
+        self._last_probe = float("-inf")
+
+    @property
+    def shedding(self) -> bool:
+        return self._shedding
+
+    def observe(self, seconds: float) -> None:
+        """Record the duration of one LLM call (failed calls included)."""
+        with self._lock:
+            self._samples.append((self._clock(), seconds))
+
+    def _p95_locked(self, now: float) -> Tuple[Optional[float], int]:
+        while self._samples and self._samples[0][0] < now - self.window:
+            self._samples.popleft()
+        if len(self._samples) < self.min_samples:
+            return None, len(self._samples)
+        latencies = sorted(s for _, s in self._samples)
+        return latencies[int(0.95 * (len(latencies) - 1))], len(latencies)
+
+    def _switch_locked(self, shedding: bool, now: float, p95: Optional[float], depth: int) -> None:
+        self._shedding = shedding
+        self._latency_tripped = shedding and p95 is not None and p95 > self.latency_slo
+        self._since = now
+        mode = "shedding" if shedding else "normal"
+        SHEDDING.set(1 if shedding else 0)
+        TRANSITIONS.inc(mode=mode)
+        p95_text = "n/a" if p95 is None else f"{p95 * 1000:.0f}ms"
+        log = logger.warning if shedding else logger.info
+        log(f"Load shedding {'on' if shedding else 'off'}: LLM p95={p95_text}, new_message backlog={depth}")
+
+    def allow_llm(self, queue_depth: int) -> bool:
+        """Update the mode; False means answer this message from templates."""
+        with self._lock:
+            now = self._clock()
+            p95, _ = self._p95_locked(now)
+            if not self._shedding:
+                if (p95 is not None and p95 > self.latency_slo) or queue_depth >= self.queue_high:
+                    self._switch_locked(True, now, p95, queue_depth)
+            elif queue_depth <= self.queue_low and (
+                p95 < self.recover_latency if p95 is not None else not self._latency_tripped
+            ):
+                self._switch_locked(False, now, p95, queue_depth)
+            if not self._shedding:
+                return True
+            if now - self._last_probe >= self.probe_interval:
+                self._last_probe = now
+                return True
+            return False
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            now = self._clock()
+            p95, samples = self._p95_locked(now)
+            return {
+                "mode": "shedding" if self._shedding else "normal",
+                "seconds_in_mode": round(now - self._since, 1),
+                "p95_ms": None if p95 is None else round(p95 * 1000, 1),
+                "samples": samples,
+            }
+
+
+_controller = LoadShedder(
+    LOAD_SHED_LATENCY_SLO_MS / 1000.0,
+    LOAD_SHED_RECOVER_LATENCY_MS / 1000.0,
+    LOAD_SHED_QUEUE_HIGH,
+    LOAD_SHED_QUEUE_LOW,
+    LOAD_SHED_WINDOW_SECONDS,
+    LOAD_SHED_MIN_SAMPLES,
+    LOAD_SHED_PROBE_INTERVAL_SECONDS,
+)
+
+
+def allow_llm(queue_depth: int) -> bool:
+    """False when this message should be answered from templates instead of the LLM.
+
+    ``queue_depth`` is the new_message backlog, see ``messaging.new_message_backlog``.
+    """
+    if not LOAD_SHED_ENABLED:
+        return True
+    allowed = _controller.allow_llm(queue_depth)
+    if not allowed:
+        SHED_MESSAGES.inc()
+    return allowed
+
+
+def observe(seconds: float) -> None:
+    if LOAD_SHED_ENABLED:
+        _controller.observe(seconds)
+
+
+def stats() -> Dict[str, object]:
+    """Current mode, rolling LLM p95 and transition counts, for diagnostics."""
+    return {
+        "enabled": LOAD_SHED_ENABLED,
+        **_controller.snapshot(),
+        "transitions": {key[0]: value for key, value in TRANSITIONS.samples()},
+        "shed_messages": SHED_MESSAGES.value(),
+    }
@@ -1,22 +1,40 @@
 import logging
-from fastapi import FastAPI, Depends, Query
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from sqlalchemy.orm import Session
 from . import message_processor
 from .db.session import get_db, engine
 from .db.base import Base
-from .models import user, customer, message, product, conversation_state
+from .models import user, customer, message, product, conversation_state, conversation_change
 from .schemas.message import Conversation
-from .crud.message import get_conversations, get_unprocessed_messages
+from .crud.message import get_conversations_page
+from .crud import conversation_change as changes_crud
 from pydantic import BaseModel
-from typing import List
+from datetime import datetime
+from typing import Dict, List, Optional
 import threading
 from . import messaging
+from . import catalog_cache
+from . import change_feed
+from . import fast_path
+from . import idempotency
+from . import intents
+from . import conversation_memory
+from . import llm_gateway
+from . import llm_scheduler
+from . import load_shedder
+from . import phone_cache
+from . import response_cache
+from . import sweeper
+from . import traffic_recorder
+from . import backfill
+from . import jobs
+from . import metrics
 from .db.session import SessionLocal
 from sqlalchemy import inspect, text
 import os
-import requests
 
 def init_db():
     Base.metadata.create_all(bind=engine)
@@ -31,6 +49,31 @@ def init_db():
             logger.info("Added whatsapp_no column to customers table")
     except Exception as e:
         logger.warning(f"DB migration check failed or not needed: {e}")
+    # Lightweight migration: recovery sweeper columns on messages. Existing rows keep
+    # created_at NULL, which keeps them out of the sweeper (never retry old history).
+    try:
+        cols = [c.get("name") for c in inspect(engine).get_columns("messages")]
+        added = [
+            (name, ddl) for name, ddl in (
+                ("created_at", "TIMESTAMP"),
+                ("claimed_at", "TIMESTAMP"),
+                ("attempts", "INTEGER NOT NULL DEFAULT 0"),
+            ) if name not in cols
+        ]
+        if added:
+            with engine.connect() as conn:
+                for name, ddl in added:
+                    conn.execute(text(f"ALTER TABLE messages ADD COLUMN {name} {ddl}"))
+                conn.commit()
+            logger.info(f"Added {', '.join(n for n, _ in added)} to messages table")
+    except Exception as e:
+        logger.warning(f"DB migration check failed or not needed: {e}")
+    # create_all skips indexes on tables that already exist; add the ones introduced later.
+    for index in (*message.Message.__table__.indexes, *customer.Customer.__table__.indexes):
+        try:
+            index.create(bind=engine, checkfirst=True)
+        except Exception as e:
+            logger.warning(f"Could not create index {index.name}: {e}")
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -56,23 +99,102 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 @app.on_event("startup")
 async def startup_event():
     init_db()
+    conversation_memory.start_flusher()
+    traffic_recorder.start()
+    sweeper.start_background()
     consumer_thread = threading.Thread(target=messaging.start_consumer, daemon=True)
     consumer_thread.start()
 
+@app.on_event("shutdown")
+def shutdown_event():
+    conversation_memory.stop_flusher()
+    traffic_recorder.stop()
+
 @app.get("/api/v1/ai/conversations", response_model=List[Conversation])
-async def get_conversations_endpoint(
+def get_conversations_endpoint(
+    response: Response,
     db: Session = Depends(get_db),
     user_id: int | None = Query(default=None, description="Filter by owner user_id"),
+    limit: int | None = Query(default=None, ge=1, le=500, description="Conversations per page (default: all)"),
+    cursor: int | None = Query(default=None, description="X-Next-Cursor value from the previous page"),
+    messages_limit: int | None = Query(default=None, ge=1, le=1000, description="Latest answered messages per conversation"),
 ):
     """
-    Fetch all conversations with their messages.
+    Fetch conversations with their answered messages, ordered by customer.
+
+    When more pages exist, the cursor for the next one is returned in the
+    X-Next-Cursor header; the body stays a plain list.
     """
-    return get_conversations(db, user_id=user_id)
+    conversations, next_cursor = get_conversations_page(
+        db, user_id=user_id, limit=limit, cursor=cursor, messages_limit=messages_limit,
+    )
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return conversations
+
+@app.get("/api/v1/ai/conversations/changes")
+def get_conversation_changes(
+    db: Session = Depends(get_db),
+    since: int = Query(default=0, ge=0, description="Cursor from the previous call; 0 for everything"),
+    user_id: int | None = Query(default=None, description="Filter by owner user_id"),
+    limit: int = Query(default=200, ge=1, le=1000),
+):
+    """
+    Messages answered after the ``since`` cursor, oldest first, plus the cursor to
+    pass next time. Lets dashboards refresh without re-fetching every conversation.
+    """
+    changes, cursor = changes_crud.get_changes(db, since=since, user_id=user_id, limit=limit)
+    return {"changes": changes, "cursor": cursor}
+
+@app.get("/api/v1/ai/conversations/stream")
+async def stream_conversation_changes(
+    request: Request,
+    user_id: int | None = Query(default=None, description="Filter by owner user_id"),
+    since: int | None = Query(default=None, ge=0, description="Replay changes after this cursor first"),
+    last_event_id: str | None = Header(default=None),
+):
+    """
+    Server-Sent Events stream of newly answered messages (event ``message_answered``,
+    ``id`` = cursor). Reconnecting clients resume from ``Last-Event-ID``.
+    """
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    return StreamingResponse(
+        change_feed.stream(user_id, since, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/v1/ai/diagnostics")
+def diagnostics():
+    """
+    In-process cache and routing internals for operators.
+    """
+    return {
+        "catalog_cache": catalog_cache.stats(),
+        "llm": llm_gateway.stats(),
+        "circuit_breakers": llm_gateway.breaker_states(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "load_shedding": load_shedder.stats(),
+        "fast_path": fast_path.stats(),
+        "intents": intents.stats(),
+        "response_cache": response_cache.stats(),
+        "conversation_memory": conversation_memory.stats(),
+        "phone_cache": phone_cache.stats(),
+        "unanswered_backlog": sweeper.update_backlog_metrics(),
+        "idempotency": idempotency.stats(),
+    }
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """All in-process metrics (stage latency, LLM calls, caches, ...) in the Prometheus text format."""
+    return Response(content=metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
 
 @app.get("/health")
 def health_check():
@@ -81,31 +203,44 @@ def health_check():
     """
     return {"status": "ok"}
 
-class BackfillResult(BaseModel):
-    updated: int
-
-@app.post("/api/v1/ai/backfill-whatsapp/{user_id}", response_model=BackfillResult)
-def backfill_whatsapp_numbers(user_id: int, db: Session = Depends(get_db)):
-    """Backfill customers.whatsapp_no by querying WhatsApp connector for this user."""
-    # Build base URL from env or default to traefik
-    base = os.getenv("WHATSAPP_CONNECTOR_URL", "http://whatsapp-connector-service:8002")
-    url = f"{base}/api/v1/whatsapp/users/{user_id}/customers"
-    r = requests.get(url, timeout=10)
-    r.raise_for_status()
-    customers = r.json() or []
-
-    updated = 0
-    # Map orchestrator customer.id == whatsapp customer.id by design
-    from .crud import customer as customer_crud
-    for c in customers:
-        cid = c.get("id")
-        wno = c.get("whatsapp_no")
-        if not cid:
-            continue
-        cust = customer_crud.get_customer(db, customer_id=cid)
-        if cust and wno and getattr(cust, "whatsapp_no", None) != wno:
-            cust.whatsapp_no = wno
-            db.commit()
-            db.refresh(cust)
-            updated += 1
-    return {"updated": updated}
+class JobStatus(BaseModel):
+    id: str
+    kind: str
+    status: str
+    progress: Dict[str, int]
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class BackfillStatus(JobStatus):
+    # Customers updated so far; the whole response body before the backfill became a job.
+    updated: int = 0
+
+@app.post("/api/v1/ai/backfill-whatsapp/{user_id}", response_model=BackfillStatus, status_code=202)
+def backfill_whatsapp_numbers(
+    user_id: int,
+    response: Response,
+    wait: float = Query(default=0, ge=0, le=600, description="Seconds to wait for the job to finish before answering"),
+):
+    """
+    Start (or return the running) job that backfills customers.whatsapp_no from the WhatsApp connector.
+
+    Answers 202 right away; poll ``GET /api/v1/ai/jobs/{job_id}``. With ``wait``, a job that
+    finishes in time answers 200 with its final counts (502 if it failed), like the old
+    synchronous endpoint.
+    """
+    job = jobs.start("backfill_whatsapp", lambda job: backfill.backfill_whatsapp(user_id, job), key=f"backfill_whatsapp:{user_id}")
+    if wait and job.wait(wait):
+        if job.status == "failed":
+            raise HTTPException(status_code=502, detail=f"WhatsApp backfill failed: {job.error}")
+        response.status_code = 200
+    return {**job.to_dict(), "updated": job.progress.get("updated", 0)}
+
+@app.get("/api/v1/ai/jobs/{job_id}", response_model=JobStatus)
+def get_job(job_id: str):
+    """Progress of a background job started on this replica."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
@@ -0,0 +1,37 @@
+"""Product matching: scoring a customer message against a tenant's catalog.
+
+Every matcher keeps per-tenant state and exposes ``add``, ``remove``,
+``best_match(text) -> (product, confidence)`` and ``top_k(text, k)``. The one used
+by ``process_message`` is chosen with the ``PRODUCT_MATCHER`` setting; exact name
+and SKU mentions are caught first by ``MentionDetector``, whatever the matcher.
+"""
+import logging
+
+from .aho_corasick import MentionDetector  # noqa: F401
+from .bm25 import BM25Index  # noqa: F401
+from .token_index import TokenIndex, score_product_match  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+MATCHERS = {
+    "heuristic": TokenIndex,
+    "bm25": BM25Index,
+}
+
+# The n-gram matcher needs NumPy; without it "fuzzy" falls back to the default.
+try:
+    from .fuzzy import FuzzyIndex  # noqa: F401
+    MATCHERS["fuzzy"] = FuzzyIndex
+except ImportError:
+    FuzzyIndex = None  # type: ignore
+
+DEFAULT_MATCHER = "heuristic"
+
+
+def create_matcher(name: str, products=()):
+    """Build the named matcher over ``products``; unknown names fall back to the default."""
+    cls = MATCHERS.get((name or "").strip().lower())
+    if cls is None:
+        logger.warning(f"Unknown PRODUCT_MATCHER '{name}', using '{DEFAULT_MATCHER}'")
+        cls = MATCHERS[DEFAULT_MATCHER]
+    return cls(products)
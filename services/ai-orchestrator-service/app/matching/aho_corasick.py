@@ -0,0 +1,234 @@
+"""Exact product-name and SKU mention detection with an Aho–Corasick automaton.
+
+The heuristic's strongest signals are ``sku in text`` (0.95) and ``name in text``
+(0.8). Checking them product by product costs O(products × message length); the
+automaton over every lowercased name and SKU of a tenant finds all of them in a
+single pass over the message. Matches are returned before any heavier matcher runs.
+
+The automaton is built breadth-first once per catalog load. After that, product
+events update it incrementally: each new trie node gets its failure link from its
+parent's, and the existing nodes whose longest known suffix is now the new node are
+found through the reverse failure tree (only below the new node's parent) and
+relinked, along with the output links that inherit from them. A stock or price
+update, which re-adds the same name and SKU, creates no nodes and costs no
+relinking. Deletes only clear outputs, and the trie is rebuilt from scratch once
+dead patterns outnumber live ones.
+"""
+from __future__ import annotations
+
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+
+SKU_SCORE = 0.95
+NAME_SCORE = 0.8
+
+
+def _patterns(product) -> List[Tuple[str, float]]:
+    out = []
+    sku = (getattr(product, "sku", None) or "").lower()
+    if sku:
+        out.append((sku, SKU_SCORE))
+    name = (getattr(product, "name", None) or "").lower()
+    if name:
+        out.append((name, NAME_SCORE))
+    return out
+
+
+class MentionDetector:
+    """Per-tenant automaton mapping exact name/SKU mentions to products."""
+
+    def __init__(self, products=()):
+        self._products: Dict[int, object] = {}
+        self._seq: Dict[int, int] = {}
+        self._next_seq = 0
+        self._reset()
+        for p in products:
+            self.add(p)
+        self._link_all()
+
+    def _reset(self) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Reverse failure tree: node -> nodes whose failure link points at it.
+        self._fail_children: List[Set[int]] = [set()]
+        # Nearest terminal node on the failure chain, or -1.
+        self._out_link: List[int] = [-1]
+        # Nodes some pattern ends at (outputs may have been cleared since; searches skip empty ones).
+        self._terminal: List[bool] = [False]
+        # node -> {product_id: score} for patterns ending at that node
+        self._out: List[Dict[int, float]] = [{}]
+        self._nodes_of: Dict[int, List[int]] = {}
+        self._live_patterns = 0
+        self._dead_patterns = 0
+        # False while bulk loading; links are then computed once by _link_all.
+        self._linked = False
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def _insert(self, pattern: str) -> int:
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = self._new_node(node, ch)
+            node = nxt
+        return node
+
+    def _new_node(self, parent: int, ch: str) -> int:
+        node = len(self._goto)
+        self._goto[parent][ch] = node
+        self._goto.append({})
+        self._fail.append(0)
+        self._fail_children.append(set())
+        self._out_link.append(-1)
+        self._terminal.append(False)
+        self._out.append({})
+        if self._linked:
+            self._link_new(node, parent, ch)
+        return node
+
+    def _mark_terminal(self, node: int) -> None:
+        if self._terminal[node]:
+            return
+        self._terminal[node] = True
+        if self._linked:
+            self._relink_outputs(node)
+
+    def add(self, product) -> None:
+        pid = getattr(product, "id")
+        if pid in self._products:
+            self._clear_outputs(pid)
+        else:
+            self._seq[pid] = self._next_seq
+            self._next_seq += 1
+        self._products[pid] = product
+        nodes = []
+        for pattern, score in _patterns(product):
+            node = self._insert(pattern)
+            self._mark_terminal(node)
+            self._out[node][pid] = max(score, self._out[node].get(pid, 0.0))
+            nodes.append(node)
+            self._live_patterns += 1
+        self._nodes_of[pid] = nodes
+
+    def remove(self, product_id: int) -> None:
+        if product_id not in self._products:
+            return
+        self._clear_outputs(product_id)
+        del self._products[product_id]
+        del self._seq[product_id]
+        if self._dead_patterns > max(self._live_patterns, 64):
+            self._rebuild()
+
+    def _clear_outputs(self, pid: int) -> None:
+        for node in self._nodes_of.pop(pid, ()):
+            if self._out[node].pop(pid, None) is not None:
+                self._live_patterns -= 1
+                self._dead_patterns += 1
+
+    def _rebuild(self) -> None:
+        products = list(self._products.values())
+        seq = dict(self._seq)
+        self._reset()
+        for p in products:
+            pid = getattr(p, "id")
+            nodes = []
+            for pattern, score in _patterns(p):
+                node = self._insert(pattern)
+                self._terminal[node] = True
+                self._out[node][pid] = max(score, self._out[node].get(pid, 0.0))
+                nodes.append(node)
+                self._live_patterns += 1
+            self._nodes_of[pid] = nodes
+        self._seq = seq
+        self._link_all()
+
+    def _set_fail(self, node: int, fail: int) -> None:
+        self._fail_children[self._fail[node]].discard(node)
+        self._fail[node] = fail
+        self._fail_children[fail].add(node)
+        self._out_link[node] = fail if self._terminal[fail] else self._out_link[fail]
+        if not self._terminal[node]:
+            self._relink_outputs(node)
+
+    def _relink_outputs(self, node: int) -> None:
+        """Refresh the output links below ``node`` in the failure tree, down to the next terminals."""
+        stack = [node]
+        while stack:
+            x = stack.pop()
+            link = x if self._terminal[x] else self._out_link[x]
+            for child in self._fail_children[x]:
+                self._out_link[child] = link
+                if not self._terminal[child]:
+                    stack.append(child)
+
+    def _link_new(self, node: int, parent: int, ch: str) -> None:
+        """Link a node just added below ``parent`` and redirect the nodes it is now the longest suffix of."""
+        fail = 0
+        if parent:
+            f = self._fail[parent]
+            while f and ch not in self._goto[f]:
+                f = self._fail[f]
+            fail = self._goto[f].get(ch, 0)
+        self._set_fail(node, fail)
+        # Old nodes ending in ``parent + ch``: ``ch``-children of nodes that have ``parent`` as a suffix.
+        # Below a node that already has a ``ch``-child, the suffixes found there are longer; stop.
+        stack = [u for u in self._fail_children[parent] if u != node]
+        while stack:
+            u = stack.pop()
+            v = self._goto[u].get(ch)
+            if v is not None:
+                self._set_fail(v, node)
+            else:
+                stack.extend(self._fail_children[u])
+
+    def _link_all(self) -> None:
+        """Compute every failure and output link breadth-first."""
+        self._fail_children = [set() for _ in self._goto]
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            self._fail_children[0].add(child)
+            self._out_link[child] = -1
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                fail = target if target != child else 0
+                self._fail[child] = fail
+                self._fail_children[fail].add(child)
+                self._out_link[child] = fail if self._terminal[fail] else self._out_link[fail]
+                queue.append(child)
+        self._linked = True
+
+    def find_mentions(self, user_text: str) -> Dict[int, float]:
+        """product_id -> 0.95 (SKU mentioned) or 0.8 (name mentioned)."""
+        if not user_text or not self._products:
+            return {}
+        found: Dict[int, float] = {}
+        goto, fail, out, out_link, terminal = self._goto, self._fail, self._out, self._out_link, self._terminal
+        node = 0
+        for ch in user_text.lower():
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            hit = node if terminal[node] else out_link[node]
+            while hit > 0:
+                for pid, score in out[hit].items():
+                    if score > found.get(pid, 0.0):
+                        found[pid] = score
+                hit = out_link[hit]
+        return found
+
+    def best_mention(self, user_text: str) -> Tuple[Optional[object], float]:
+        """Highest-scoring mentioned product, earliest in catalog order on ties."""
+        found = self.find_mentions(user_text)
+        if not found:
+            return None, 0.0
+        pid = min(found, key=lambda p: (-found[p], self._seq[p]))
+        return self._products[pid], found[pid]
@@ -0,0 +1,199 @@
+"""BM25 ranking over product name, SKU and description.
+
+Unlike the fixed-constant heuristic, BM25 weighs each message token by how rare it
+is in the tenant's catalog, so "waterproof" outranks "shoe" when every product is
+a shoe. Document statistics (document frequencies, weighted lengths, postings) are
+kept per tenant and updated incrementally; scoring only touches the postings of
+the message's terms, and the top k is selected with a heap instead of a full sort.
+"""
+from __future__ import annotations
+
+import heapq
+import math
+import re
+import string
+from typing import Dict, List, Optional, Tuple
+
+# Field weights for a simplified BM25F: a term in the name counts three times as
+# much as the same term in the description.
+NAME_WEIGHT = 3.0
+SKU_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+
+K1 = 1.2
+B = 0.75
+
+# Confidence given to an exact SKU mention and the cap for ranked matches, on the
+# same 0..1 scale ``process_message`` thresholds (0.7) are written against.
+SKU_CONFIDENCE = 0.95
+MAX_RANKED_CONFIDENCE = 0.8
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Question and filler words carry no product identity but appear in descriptions.
+STOPWORDS = frozenset(
+    """a an and any are about at be can do does for have how i in is it me much my
+    need of on or please price cost stock available availability quantity details
+    the there this that to want what when where which with you your""".split()
+)
+
+
+def _stem(token: str) -> str:
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 4 and token.endswith("sses"):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return [_stem(t) for t in _TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+def _normalize_sku(sku: Optional[str]) -> str:
+    return (sku or "").strip().lower()
+
+
+class BM25Index:
+    """Per-tenant BM25 index with the same interface as ``TokenIndex``."""
+
+    def __init__(self, products=()):
+        self._products: Dict[int, object] = {}
+        self._seq: Dict[int, int] = {}
+        self._next_seq = 0
+        # term -> {product_id: field-weighted term frequency}
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._doc_terms: Dict[int, Dict[str, float]] = {}
+        self._doc_len: Dict[int, float] = {}
+        self._name_terms: Dict[int, List[str]] = {}
+        self._total_len = 0.0
+        self._skus: Dict[str, int] = {}
+        for p in products:
+            self.add(p)
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def add(self, product) -> None:
+        pid = getattr(product, "id")
+        if pid in self._products:
+            self._unindex(pid)
+        else:
+            self._seq[pid] = self._next_seq
+            self._next_seq += 1
+        self._products[pid] = product
+
+        terms: Dict[str, float] = {}
+        name_terms = tokenize(getattr(product, "name", None))
+        for field_terms, weight in (
+            (name_terms, NAME_WEIGHT),
+            (tokenize(getattr(product, "sku", None)), SKU_WEIGHT),
+            (tokenize(getattr(product, "description", None)), DESCRIPTION_WEIGHT),
+        ):
+            for t in field_terms:
+                terms[t] = terms.get(t, 0.0) + weight
+        for t, tf in terms.items():
+            self._postings.setdefault(t, {})[pid] = tf
+        length = sum(terms.values())
+        self._doc_terms[pid] = terms
+        self._doc_len[pid] = length
+        self._name_terms[pid] = list(dict.fromkeys(name_terms))
+        self._total_len += length
+
+        sku = _normalize_sku(getattr(product, "sku", None))
+        if sku:
+            self._skus[sku] = pid
+
+    def remove(self, product_id: int) -> None:
+        if product_id not in self._products:
+            return
+        self._unindex(product_id)
+        del self._products[product_id]
+        del self._seq[product_id]
+
+    def _unindex(self, pid: int) -> None:
+        for t in self._doc_terms.pop(pid):
+            posting = self._postings.get(t)
+            if posting is not None:
+                posting.pop(pid, None)
+                if not posting:
+                    del self._postings[t]
+        self._total_len -= self._doc_len.pop(pid)
+        self._name_terms.pop(pid, None)
+        product = self._products[pid]
+        sku = _normalize_sku(getattr(product, "sku", None))
+        if sku and self._skus.get(sku) == pid:
+            del self._skus[sku]
+
+    def _idf(self, term: str) -> float:
+        n = len(self._products)
+        df = len(self._postings.get(term, ()))
+        return math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+
+    @staticmethod
+    def _term_score(idf: float, tf: float, doc_len: float, avgdl: float) -> float:
+        norm = K1 * (1.0 - B + B * doc_len / avgdl) if avgdl else K1
+        return idf * tf * (K1 + 1.0) / (tf + norm)
+
+    def _scores(self, user_text: str) -> Dict[int, float]:
+        if not self._products:
+            return {}
+        avgdl = self._total_len / len(self._products)
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(user_text)):
+            posting = self._postings.get(term)
+            if not posting:
+                continue
+            idf = self._idf(term)
+            for pid, tf in posting.items():
+                scores[pid] = scores.get(pid, 0.0) + self._term_score(idf, tf, self._doc_len[pid], avgdl)
+        return scores
+
+    def _self_score(self, pid: int, avgdl: float) -> float:
+        """Score the product would get from a message naming every token of its name."""
+        terms = self._doc_terms[pid]
+        dl = self._doc_len[pid]
+        return sum(self._term_score(self._idf(t), terms[t], dl, avgdl) for t in self._name_terms[pid])
+
+    def _sku_mention(self, user_text: str) -> Optional[int]:
+        for word in (user_text or "").lower().split():
+            pid = self._skus.get(word.strip(string.punctuation))
+            if pid is not None:
+                return pid
+        return None
+
+    def _ranked(self, user_text: str, k: int) -> List[Tuple[float, int]]:
+        scores = self._scores(user_text)
+        top = heapq.nlargest(k, ((sc, -self._seq[pid], pid) for pid, sc in scores.items() if sc > 0))
+        return [(sc, pid) for sc, _, pid in top]
+
+    def best_match(self, user_text: str) -> Tuple[Optional[object], float]:
+        if not user_text:
+            return None, 0.0
+        pid = self._sku_mention(user_text)
+        if pid is not None:
+            return self._products[pid], SKU_CONFIDENCE
+        ranked = self._ranked(user_text, 1)
+        if not ranked:
+            return None, 0.0
+        score, pid = ranked[0]
+        avgdl = self._total_len / len(self._products)
+        ceiling = self._self_score(pid, avgdl)
+        confidence = MAX_RANKED_CONFIDENCE * min(1.0, score / ceiling) if ceiling > 0 else 0.0
+        return self._products[pid], confidence
+
+    def top_k(self, user_text: str, k: int) -> List[object]:
+        """The k best-ranked products, padded in catalog order when fewer than k score."""
+        if k <= 0:
+            return []
+        out = [self._products[pid] for _, pid in self._ranked(user_text, k)]
+        if len(out) < k:
+            taken = {getattr(p, "id") for p in out}
+            for pid, p in self._products.items():
+                if pid not in taken:
+                    out.append(p)
+                    if len(out) == k:
+                        break
+        return out
@@ -0,0 +1,238 @@
+"""Typo-tolerant product matching with hashed character n-grams.
+
+Each product name is turned into the set of its character trigrams (with word
+boundary padding), hashed into a fixed feature space. A tenant's catalog is kept as
+a sparse matrix in NumPy arrays, column-sorted by feature, whose rows are weighted by
+1/|grams|. One sparse matrix-vector product against the message's binary trigram
+vector yields, for every product at once, the fraction of its name trigrams found in
+the message; because the vector is binary, only the columns of the message's own
+trigrams are touched. "Addidas sneakrs" still shares most trigrams with "Adidas Sneakers".
+
+Updates land in a small pending set scored in Python and are folded into the
+arrays once enough of them accumulate, so product events stay cheap.
+"""
+from __future__ import annotations
+
+import re
+import string
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+NGRAM = 3
+FEATURE_BITS = 18
+FEATURE_DIM = 1 << FEATURE_BITS
+
+# Containment at or above this maps to the top ranked confidence (0.8, the same as an
+# exact name mention in the heuristic); below it confidence falls off linearly.
+FULL_CONTAINMENT = 0.75
+SKU_CONFIDENCE = 0.95
+MAX_RANKED_CONFIDENCE = 0.8
+
+# Fold pending rows into the arrays past this many, or when a quarter of rows are dead.
+_COMPACT_PENDING = 256
+_COMPACT_DEAD_RATIO = 0.25
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+
+def _normalize(text: Optional[str]) -> str:
+    return _NON_ALNUM_RE.sub(" ", (text or "").lower()).strip()
+
+
+def ngram_features(text: Optional[str]) -> np.ndarray:
+    """Sorted unique hashed trigram ids of ``text``."""
+    norm = _normalize(text)
+    if not norm:
+        return np.empty(0, dtype=np.int32)
+    padded = f" {norm} "
+    grams = {padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)}
+    return np.unique(np.fromiter(
+        (zlib.crc32(g.encode("utf-8")) & (FEATURE_DIM - 1) for g in grams),
+        dtype=np.int32,
+        count=len(grams),
+    ))
+
+
+def _confidence(containment: float) -> float:
+    return MAX_RANKED_CONFIDENCE * min(1.0, containment / FULL_CONTAINMENT)
+
+
+class FuzzyIndex:
+    """Per-tenant n-gram matrix with the same interface as ``TokenIndex``."""
+
+    def __init__(self, products=()):
+        self._products: Dict[int, object] = {}
+        self._seq: Dict[int, int] = {}
+        self._next_seq = 0
+        self._skus: Dict[str, int] = {}
+        # Compacted matrix: one row per product. Row-major (_rows/_indices) is kept for
+        # compaction, feature-major (_col_*) for queries.
+        self._row_pids = np.empty(0, dtype=np.int64)
+        self._alive = np.empty(0, dtype=bool)
+        self._indices = np.empty(0, dtype=np.int32)
+        self._rows = np.empty(0, dtype=np.int32)
+        self._col_feats = np.empty(0, dtype=np.int32)
+        self._col_rows = np.empty(0, dtype=np.int32)
+        self._col_data = np.empty(0, dtype=np.float32)
+        self._row_of: Dict[int, int] = {}
+        self._dead = 0
+        self._pending: Dict[int, np.ndarray] = {}
+        batch = {}
+        for p in products:
+            self._register(p)
+            feats = ngram_features(getattr(p, "name", None))
+            if feats.size:
+                batch[getattr(p, "id")] = feats
+        self._pending = batch
+        self._compact()
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def _register(self, product) -> int:
+        pid = getattr(product, "id")
+        if pid not in self._products:
+            self._seq[pid] = self._next_seq
+            self._next_seq += 1
+        else:
+            self._drop_features(pid)
+            old_sku = (getattr(self._products[pid], "sku", None) or "").strip().lower()
+            if old_sku and self._skus.get(old_sku) == pid:
+                del self._skus[old_sku]
+        self._products[pid] = product
+        sku = (getattr(product, "sku", None) or "").strip().lower()
+        if sku:
+            self._skus[sku] = pid
+        return pid
+
+    def _drop_features(self, pid: int) -> None:
+        self._pending.pop(pid, None)
+        row = self._row_of.pop(pid, None)
+        if row is not None:
+            self._alive[row] = False
+            self._dead += 1
+
+    def add(self, product) -> None:
+        pid = self._register(product)
+        feats = ngram_features(getattr(product, "name", None))
+        if feats.size:
+            self._pending[pid] = feats
+        if len(self._pending) > _COMPACT_PENDING:
+            self._compact()
+
+    def remove(self, product_id: int) -> None:
+        product = self._products.pop(product_id, None)
+        if product is None:
+            return
+        self._drop_features(product_id)
+        del self._seq[product_id]
+        sku = (getattr(product, "sku", None) or "").strip().lower()
+        if sku and self._skus.get(sku) == product_id:
+            del self._skus[sku]
+        if self._alive.size and self._dead > _COMPACT_DEAD_RATIO * self._alive.size:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rebuild the matrix from live rows plus pending ones."""
+        keep = np.flatnonzero(self._alive)
+        rows: List[Tuple[int, np.ndarray]] = []
+        if keep.size:
+            starts = np.searchsorted(self._rows, keep, side="left")
+            ends = np.searchsorted(self._rows, keep, side="right")
+            for r, s, e in zip(keep.tolist(), starts.tolist(), ends.tolist()):
+                rows.append((int(self._row_pids[r]), self._indices[s:e]))
+        rows.extend(self._pending.items())
+        rows.sort(key=lambda item: self._seq[item[0]])
+        self._pending = {}
+
+        n = len(rows)
+        lengths = np.fromiter((f.size for _, f in rows), dtype=np.int64, count=n)
+        self._row_pids = np.fromiter((pid for pid, _ in rows), dtype=np.int64, count=n)
+        self._alive = np.ones(n, dtype=bool)
+        self._indices = np.concatenate([f for _, f in rows]).astype(np.int32) if n else np.empty(0, dtype=np.int32)
+        self._rows = np.repeat(np.arange(n, dtype=np.int32), lengths)
+        data = np.repeat((1.0 / np.maximum(lengths, 1)).astype(np.float32), lengths)
+        order = np.argsort(self._indices, kind="stable")
+        self._col_feats = self._indices[order]
+        self._col_rows = self._rows[order]
+        self._col_data = data[order]
+        self._row_of = {pid: i for i, (pid, _) in enumerate(rows)}
+        self._dead = 0
+
+    def _containment(self, user_text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(product ids, containment scores) for every live product with a name."""
+        feats = ngram_features(user_text)
+        if not feats.size:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        # Gather the matrix entries of the message's trigram columns and sum them per row.
+        starts = np.searchsorted(self._col_feats, feats, side="left")
+        ends = np.searchsorted(self._col_feats, feats, side="right")
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if total:
+            offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+            scores = np.bincount(self._col_rows[offsets], weights=self._col_data[offsets], minlength=self._row_pids.size)
+        else:
+            scores = np.zeros(self._row_pids.size, dtype=np.float64)
+        pids = self._row_pids[self._alive]
+        scores = scores[self._alive]
+        if self._pending:
+            q_set = set(feats.tolist())
+            extra_pids = np.fromiter(self._pending.keys(), dtype=np.int64, count=len(self._pending))
+            extra = np.fromiter(
+                (sum(1 for f in pf.tolist() if f in q_set) / pf.size for pf in self._pending.values()),
+                dtype=np.float64,
+                count=len(self._pending),
+            )
+            pids = np.concatenate([pids, extra_pids])
+            scores = np.concatenate([scores, extra])
+        return pids, scores
+
+    def _sku_mention(self, user_text: str) -> Optional[int]:
+        for word in (user_text or "").lower().split():
+            pid = self._skus.get(word.strip(string.punctuation))
+            if pid is not None:
+                return pid
+        return None
+
+    def _ranked(self, user_text: str, k: int) -> List[Tuple[float, int]]:
+        pids, scores = self._containment(user_text)
+        positive = np.flatnonzero(scores > 0)
+        if not positive.size:
+            return []
+        if positive.size > k:
+            part = np.argpartition(-scores[positive], k - 1)[:k]
+            # Re-include everything tied with the k-th score so ties resolve by catalog order.
+            kth = scores[positive[part]].min()
+            positive = positive[scores[positive] >= kth]
+        seqs = np.fromiter((self._seq[int(p)] for p in pids[positive]), dtype=np.int64, count=positive.size)
+        order = np.lexsort((seqs, -scores[positive]))[:k]
+        return [(float(scores[positive[i]]), int(pids[positive[i]])) for i in order]
+
+    def best_match(self, user_text: str) -> Tuple[Optional[object], float]:
+        if not user_text:
+            return None, 0.0
+        pid = self._sku_mention(user_text)
+        if pid is not None:
+            return self._products[pid], SKU_CONFIDENCE
+        ranked = self._ranked(user_text, 1)
+        if not ranked:
+            return None, 0.0
+        containment, pid = ranked[0]
+        return self._products[pid], _confidence(containment)
+
+    def top_k(self, user_text: str, k: int) -> List[object]:
+        """The k products with the highest trigram containment, padded in catalog order."""
+        if k <= 0:
+            return []
+        out = [self._products[pid] for _, pid in self._ranked(user_text, k)]
+        if len(out) < k:
+            taken = {getattr(p, "id") for p in out}
+            for pid, p in self._products.items():
+                if pid not in taken:
+                    out.append(p)
+                    if len(out) == k:
+                        break
+        return out
@@ -0,0 +1,217 @@
+"""Heuristic product scorer and the inverted index that serves it.
+
+``score_product_match`` is the original substring heuristic (0..1). ``TokenIndex``
+reproduces its results without scoring every product: it maps name tokens and SKU
+prefixes/suffixes to product ids, retrieves candidates by looking up the substrings
+of each message word, scores only those, and treats everyone else as the
+heuristic's 0.3 token-overlap baseline.
+"""
+from __future__ import annotations
+
+import heapq
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+# Score every product with a name token but no hit gets from the token-overlap rule.
+BASELINE_SCORE = 0.3
+
+
+def name_tokens(name_lower: str) -> List[str]:
+    return [t for t in name_lower.replace("-", " ").split() if len(t) > 2]
+
+
+def sku_affixes(sku_lower: str) -> List[str]:
+    return [k for k in {sku_lower[:3], sku_lower[-3:]} if len(k) >= 2]
+
+
+def score_product_match(user_text: str, name: str, sku: Optional[str]) -> float:
+    """Very lightweight matching score based on simple heuristics (0..1).
+    - Exact SKU mention → 1.0
+    - Name token overlap and substring matches → up to 0.8
+    - Otherwise small partial match → up to 0.4
+    Avoid external deps and keep deterministic.
+    """
+    if not user_text:
+        return 0.0
+    txt = user_text.lower()
+    n = (name or "").lower()
+    s = (sku or "").lower()
+
+    # SKU may be business-internal; still treat presence as a strong hint if present in text
+    if s and s in txt:
+        return 0.95
+
+    score = 0.0
+    if n:
+        if n in txt:
+            score = max(score, 0.8)
+        else:
+            # token overlap
+            tokens = name_tokens(n)
+            hits = sum(1 for t in tokens if t in txt)
+            if tokens:
+                score = max(score, min(0.8, 0.3 + 0.1 * hits))
+
+    # weak partial on sku prefix/suffix
+    if s:
+        for k in [s[:3], s[-3:]]:
+            if len(k) >= 2 and k in txt:
+                score = max(score, 0.5)
+
+    return score
+
+
+def _has_space(value: str) -> bool:
+    return any(ch.isspace() for ch in value)
+
+
+class TokenIndex:
+    """Per-tenant inverted index giving the same answers as a linear heuristic scan.
+
+    Every key (name token or SKU affix) is whitespace-free, so it occurs in the
+    message iff it is a substring of one whitespace-separated word. Looking up the
+    short substrings of each word therefore costs O(message length), not O(catalog).
+    Products that cannot be retrieved that way (no name token of 3+ chars, 1-char
+    SKU, whitespace inside a SKU affix) are kept in a small always-scored set.
+    Ties are broken by insertion order, like the linear scan they replace.
+    """
+
+    def __init__(self, products=()):
+        self._products: Dict[int, object] = {}
+        self._seq: Dict[int, int] = {}
+        self._next_seq = 0
+        self._tokens: Dict[str, Set[int]] = {}
+        self._affixes: Dict[str, Set[int]] = {}
+        self._skus: Dict[str, int] = {}
+        self._always: Set[int] = set()
+        self._keys: Dict[int, Tuple[List[str], List[str], str]] = {}
+        self._max_key_len = 0
+        for p in products:
+            self.add(p)
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def add(self, product) -> None:
+        pid = getattr(product, "id")
+        if pid in self._products:
+            # In-place update keeps the product's position, like a dict update.
+            self._unindex(pid)
+        else:
+            self._seq[pid] = self._next_seq
+            self._next_seq += 1
+        self._products[pid] = product
+
+        n = (getattr(product, "name", None) or "").lower()
+        s = (getattr(product, "sku", None) or "").lower()
+        tokens = name_tokens(n)
+        affixes = sku_affixes(s) if s else []
+        for t in tokens:
+            self._tokens.setdefault(t, set()).add(pid)
+            self._max_key_len = max(self._max_key_len, len(t))
+        for k in affixes:
+            self._affixes.setdefault(k, set()).add(pid)
+        if s:
+            self._skus[s] = pid
+        if not tokens or (s and (len(s) < 2 or any(_has_space(k) for k in affixes))):
+            self._always.add(pid)
+        self._keys[pid] = (tokens, affixes, s)
+
+    def remove(self, product_id: int) -> None:
+        if product_id not in self._products:
+            return
+        self._unindex(product_id)
+        del self._products[product_id]
+        del self._seq[product_id]
+
+    def _unindex(self, pid: int) -> None:
+        tokens, affixes, s = self._keys.pop(pid)
+        for t in tokens:
+            ids = self._tokens.get(t)
+            if ids is not None:
+                ids.discard(pid)
+                if not ids:
+                    del self._tokens[t]
+        for k in affixes:
+            ids = self._affixes.get(k)
+            if ids is not None:
+                ids.discard(pid)
+                if not ids:
+                    del self._affixes[k]
+        if s and self._skus.get(s) == pid:
+            del self._skus[s]
+        self._always.discard(pid)
+
+    def lookup_sku(self, sku: str):
+        pid = self._skus.get((sku or "").lower())
+        return self._products.get(pid) if pid is not None else None
+
+    def candidates(self, user_text: str) -> Set[int]:
+        """Ids of every product whose heuristic score can exceed the baseline."""
+        found: Set[int] = set(self._always)
+        if not user_text:
+            return found
+        max_len = max(self._max_key_len, 3)
+        for word in user_text.lower().split():
+            # Exact SKU words short-circuit the substring walk for the common case.
+            pid = self._skus.get(word)
+            if pid is not None:
+                found.add(pid)
+            for i in range(len(word) - 1):
+                for j in range(i + 2, min(len(word), i + max_len) + 1):
+                    key = word[i:j]
+                    ids = self._tokens.get(key)
+                    if ids:
+                        found.update(ids)
+                    if j - i <= 3:
+                        ids = self._affixes.get(key)
+                        if ids:
+                            found.update(ids)
+        return found
+
+    def _scored(self, user_text: str) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+        for pid in self.candidates(user_text):
+            p = self._products[pid]
+            scores[pid] = score_product_match(user_text, getattr(p, "name", None), getattr(p, "sku", None))
+        return scores
+
+    def _baseline(self, scored: Dict[int, float]) -> Iterator[int]:
+        """Products not explicitly scored, in insertion order; all sit at BASELINE_SCORE."""
+        for pid in self._products:
+            if pid not in scored:
+                yield pid
+
+    def best_match(self, user_text: str) -> Tuple[Optional[object], float]:
+        if not user_text:
+            return None, 0.0
+        scored = self._scored(user_text)
+        best_pid: Optional[int] = None
+        best_score = 0.0
+        for pid, sc in scored.items():
+            if sc > best_score or (sc == best_score and best_pid is not None and self._seq[pid] < self._seq[best_pid]):
+                best_pid, best_score = pid, sc
+        if best_score <= BASELINE_SCORE:
+            first = next(self._baseline(scored), None)
+            if first is not None and (
+                best_score < BASELINE_SCORE or best_pid is None or self._seq[first] < self._seq[best_pid]
+            ):
+                best_pid, best_score = first, BASELINE_SCORE
+        if best_pid is None:
+            return None, 0.0
+        return self._products[best_pid], best_score
+
+    def top_k(self, user_text: str, k: int) -> List[object]:
+        """The k best products, ordered exactly like a stable descending sort."""
+        if k <= 0:
+            return []
+        if not user_text:
+            return list(self._products.values())[:k]
+        scored = self._scored(user_text)
+        explicit = heapq.nsmallest(k, ((-sc, self._seq[pid], pid) for pid, sc in scored.items()))
+        implicit = ((-BASELINE_SCORE, self._seq[pid], pid) for pid in self._baseline(scored))
+        out: List[object] = []
+        for _, _, pid in heapq.merge(explicit, implicit):
+            out.append(self._products[pid])
+            if len(out) == k:
+                break
+        return out
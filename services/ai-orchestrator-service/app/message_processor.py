@@ -1,69 +1,44 @@
-from . import gemini_client
-from .groq_client import generate_response as groq_generate_response
-from .db import get_db
+import logging
+from . import fast_path
+from . import intents
+from . import llm_gateway
+from . import llm_scheduler
+from . import load_shedder
+from . import metrics
+from . import traffic_recorder
+from . import response_cache
 from sqlalchemy.orm import Session
-from typing import Optional, Tuple, List, Dict
+from typing import Sequence, List
 import re
-from .crud import conversation_state as conv_state_crud
-from .crud.message import update_message_response
-from .crud.product import get_products_by_user_id
+from . import conversation_memory
+from .crud.message import set_message_response
+from .reply_templates import render_degraded_reply
+from .crud import conversation_change as changes_crud
+from . import catalog_cache
 from .models.message import Message
 from . import messaging
+from .config import METRICS_TENANT_LABELS
 
+logger = logging.getLogger(__name__)
 
-def _score_product_match(user_text: str, name: str, sku: Optional[str]) -> float:
-    """Very lightweight matching score based on simple heuristics (0..1).
-    - Exact SKU mention → 1.0
-    - Name token overlap and substring matches → up to 0.8
-    - Otherwise small partial match → up to 0.4
-    Avoid external deps and keep deterministic.
-    """
-    if not user_text:
-        return 0.0
-    txt = user_text.lower()
-    n = (name or "").lower()
-    s = (sku or "").lower()
-
-    # SKU may be business-internal; still treat presence as a strong hint if present in text
-    if s and s in txt:
-        return 0.95
-
-    score = 0.0
-    if n:
-        if n in txt:
-            score = max(score, 0.8)
-        else:
-            # token overlap
-            name_tokens = [t for t in n.replace("-", " ").split() if len(t) > 2]
-            hits = sum(1 for t in name_tokens if t in txt)
-            if name_tokens:
-                score = max(score, min(0.8, 0.3 + 0.1 * hits))
-
-    # weak partial on sku prefix/suffix
-    if s:
-        for k in [s[:3], s[-3:]]:
-            if len(k) >= 2 and k in txt:
-                score = max(score, 0.5)
-
-    return score
-
-
-def _find_best_product(user_text: str, products) -> Tuple[Optional[object], float]:
-    best, best_score = None, 0.0
-    for p in products:
-        sc = _score_product_match(user_text, getattr(p, "name", None), getattr(p, "sku", None))
-        if sc > best_score:
-            best, best_score = p, sc
-    return best, best_score
-
-
-# Simple in-process conversational memory: customer_id -> last selected product_id
-_conversation_memory: Dict[int, int] = {}
+# One series per stage (intent, load_catalog, match, conversation_state, fast_path,
+# response_cache, llm, db_write, publish, total); see process_message.
+STAGE_LATENCY = metrics.histogram(
+    "message_stage_seconds", "Time spent in each message processing stage",
+    ("stage", "tenant", "provider", "confidence"),
+)
 
 
 _PRONOUN_ONLY_RE = re.compile(r"\b(it|that|this|the one|same|above|the product)\b", re.I)
 _FOLLOW_UP_RE = re.compile(r"\b(price|cost|stock|quantity|available|in stock|how much|what about|details)\b", re.I)
 
+def _confidence_bucket(chosen, score: float) -> str:
+    if chosen is None:
+        return "none"
+    if score >= 0.9:
+        return "high"
+    return "medium" if score >= 0.7 else "low"
+
 def _is_followup_about_same_product(user_text: str) -> bool:
     if not user_text:
         return False
@@ -71,7 +46,25 @@ def _is_followup_about_same_product(user_text: str) -> bool:
     # If the message contains a follow-up keyword and pronoun-like references
     return bool(_FOLLOW_UP_RE.search(txt)) and bool(_PRONOUN_ONLY_RE.search(txt))
 
-def process_message(channel, message: Message, db: Session, user_id: int):
+def _deliver(channel, db: Session, message: Message, coalesced: Sequence[Message], reply: str, user_id: int, provider: str, spans: metrics.Spans) -> None:
+    """Store the reply on every message of the burst in one commit, then publish it once."""
+    with spans.span("db_write"):
+        for answered in (*coalesced, message):
+            set_message_response(answered, reply)
+        changes_crud.record_answered(db, (*coalesced, message), user_id)
+        db.commit()
+
+    # Use the passed-in channel to publish the response
+    with spans.span("publish"):
+        messaging.publish_ai_response(
+            channel, message.id, reply, coalesced_message_ids=[m.id for m in coalesced], user_id=user_id,
+        )
+    logger.info(
+        f"Replied to message {message.id} via {provider} in "
+        + ", ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in spans.durations.items())
+    )
+
+def process_message(channel, message: Message, db: Session, user_id: int, coalesced: Sequence[Message] = ()):
     """
     Processes a single message and publishes the AI response.
 
@@ -80,38 +73,59 @@ def process_message(channel, message: Message, db: Session, user_id: int):
     - message: DB Message row (contains customer/message ids and text).
     - db: SQLAlchemy session.
     - user_id: The owner/tenant id associated with this conversation.
+    - coalesced: Earlier messages of the same burst from this customer; they are
+      answered together with ``message`` by one reply, published once.
 
     Note: We intentionally rely on the user_id coming with the event payload
     to avoid any mismatch due to cross-service customer id collisions.
     """
+    spans = metrics.Spans(STAGE_LATENCY)
+    # "intent" / "fast_path" / "cache" when no LLM was called; otherwise the provider that answered
+    provider = "none"
+    chosen, score = None, 0.0
+    source = "match"
     try:
+        # A coalesced burst ("hi" / "do you have" / "red shoes") is read as one message.
+        user_text = "\n".join(m.user_message for m in [*coalesced, message] if m.user_message)
+
+        # Greetings, thanks, acknowledgements and stickers get a canned reply before any product work.
+        with spans.span("intent"):
+            canned = intents.canned_reply(user_text, user_id)
+        if canned is not None:
+            provider = "intent"
+            _deliver(channel, db, message, coalesced, canned, user_id, provider, spans)
+            return
+
         # Always scope products by the user_id provided with the message event
         # rather than traversing message.customer to avoid tenant leakage.
-        products = get_products_by_user_id(db, user_id)
+        # Served from the per-tenant catalog cache; the DB is only hit on a miss.
+        with spans.span("load_catalog"):
+            catalog = catalog_cache.get_catalog(db, user_id)
 
         # Agentic retrieval step: try to identify the specific product referenced.
-        best, score = _find_best_product(message.user_message or "", products)
+        # The catalog's matcher (PRODUCT_MATCHER) only scores products sharing a token with the message.
+        with spans.span("match"):
+            best, score = catalog.best_match(user_text)
 
         # Conversation memory assist: if the user likely refers to the same product as before,
         # prefer the last one we selected for this customer.
-        chosen = None
-        if _is_followup_about_same_product(message.user_message or ""):
-            last_id = _conversation_memory.get(message.customer_id)
-            if last_id is None:
-                # Read from DB state when cache is cold
-                state = conv_state_crud.get_state(db, customer_id=message.customer_id)
-                last_id = state.last_product_id if state else None
-                if last_id is not None:
-                    _conversation_memory[message.customer_id] = last_id
+        if _is_followup_about_same_product(user_text):
+            # Bounded in-process memory first; DB state only when it is cold.
+            with spans.span("conversation_state"):
+                last_id = conversation_memory.get_last_product(db, message.customer_id)
             if last_id is not None:
-                chosen = next((p for p in products if getattr(p, "id", None) == last_id), None)
+                chosen = catalog.get(last_id)
                 score = max(score, 0.85) if chosen else score
+                source = "memory" if chosen else source
         if not chosen and best and score >= 0.7:
             chosen = best
+        branch = "product" if chosen else ("clarify" if len(catalog) else "no_products")
 
         def fmt(v):
             return "N/A" if v is None else v
 
+        reply = None
+        cache_key = None
         if chosen:
             # High confidence or conversation-followup: present exact facts for that product only (no SKU exposure).
             facts = (
@@ -123,7 +137,7 @@ def process_message(channel, message: Message, db: Session, user_id: int):
             prompt = (
                 "You are a precise e-commerce assistant.\n"
                 + facts + "\n"
-                f"Customer message: {message.user_message}\n\n"
+                f"Customer message: {user_text}\n\n"
                 "If the customer asks about stock, ONLY state the available quantity. Do NOT mention total stock quantities."
                 " If the customer asks price, state the exact price."
                 " If something is missing (N/A), say you don't have that information."
@@ -133,13 +147,26 @@ def process_message(channel, message: Message, db: Session, user_id: int):
             try:
                 pid = getattr(chosen, "id", None)
                 if pid is not None:
-                    _conversation_memory[message.customer_id] = pid
-                    conv_state_crud.set_last_product(db, message.customer_id, pid)
+                    # Persisted by the write-behind flusher, not per message.
+                    conversation_memory.set_last_product(message.customer_id, pid)
             except Exception:
                 pass
-        elif products:
+            # Plain price/stock question about a confidently chosen product: answer from facts.
+            with spans.span("fast_path"):
+                reply = fast_path.try_answer(message, chosen, score, user_id, user_text=user_text)
+            if reply is not None:
+                provider = "fast_path"
+            else:
+                # Same question about the same product facts: reuse the earlier LLM answer.
+                with spans.span("response_cache"):
+                    cache_key = response_cache.key_for(user_id, chosen, user_text)
+                    reply = response_cache.get(cache_key)
+                if reply is not None:
+                    provider = "cache"
+        elif len(catalog):
             # Low confidence: offer top options with exact facts and ask to clarify.
-            top: List[object] = sorted(products, key=lambda p: _score_product_match(message.user_message or "", getattr(p, "name", None), getattr(p, "sku", None)), reverse=True)[:3]
+            with spans.span("match"):
+                top: List[object] = catalog.top_k(user_text, 3)
             # Do not expose SKU in customer-facing text
             listing = "\n".join([
                 f"- {fmt(p.name)}: price={fmt(p.price)}, available={fmt(p.available_qty)}"
@@ -149,7 +176,7 @@ def process_message(channel, message: Message, db: Session, user_id: int):
                 "You are a helpful e-commerce assistant.\n"
                 "We couldn't confidently identify a single product. Here are possible matches with facts.\n"
                 + listing + "\n\n"
-                f"Customer message: {message.user_message}\n\n"
+                f"Customer message: {user_text}\n\n"
                 "Ask the customer to confirm which product (by name) they mean. When discussing stock, ONLY mention available quantity—never total stock."
             )
         else:
@@ -157,22 +184,45 @@ def process_message(channel, message: Message, db: Session, user_id: int):
                 "You are a helpful e-commerce assistant.\n"
                 "No products found for this user. Politely ask the user to add products first."
             )
-        # Prefer Groq; fallback to Gemini if unavailable or errors
-        print("[AI] Trying Groq for message", message.id)
-        reply = groq_generate_response(prompt)
-        if isinstance(reply, str) and reply.startswith("[Groq unavailable"):
-            print("[AI] Groq unavailable; falling back to Gemini for message", message.id)
-            reply = gemini_client.generate_response(prompt)
-
-        update_message_response(db, message.id, reply)
-        
-        # Use the passed-in channel to publish the response
-        messaging.publish_ai_response(channel, message.id, reply)
-        
-        print(f"Reply for message {message.id}: {reply}")
+        if reply is None and not load_shedder.allow_llm(messaging.new_message_backlog()):
+            # The LLM is over its latency SLO or new_message events are backing up: answer
+            # from templates until both recover.
+            reply = render_degraded_reply(chosen, user_text, fast_path.tenant_locale(user_id))
+            provider = "shed"
+        if reply is None:
+            # Per-tenant quota and a weighted-fair share of LLM slots; see llm_scheduler.
+            with spans.span("llm_queue"):
+                admitted = llm_scheduler.admit(user_id)
+            if admitted:
+                try:
+                    # Groq first, Gemini on failure/timeout (or as a hedge); see llm_gateway.
+                    with spans.span("llm"):
+                        reply, provider = llm_gateway.generate_with_provider(prompt)
+                finally:
+                    llm_scheduler.release()
+                load_shedder.observe(spans.durations["llm"])
+                if llm_gateway.is_unavailable(reply):
+                    # Every provider failed: never send the placeholder; the message stays
+                    # unanswered and the recovery sweeper retries it.
+                    logger.warning(f"No LLM provider answered message {message.id}; leaving it unanswered")
+                    return
+                response_cache.put(cache_key, reply)
+            else:
+                # Over quota or no slot in time: answer from templates instead of waiting.
+                reply = render_degraded_reply(chosen, user_text, fast_path.tenant_locale(user_id))
+                provider = "degraded"
+
+        _deliver(channel, db, message, coalesced, reply, user_id, provider, spans)
+        traffic_recorder.record(
+            catalog, user_text, getattr(chosen, "id", None), score, source, branch, provider, spans.durations,
+        )
     except Exception as e:
-        # Log the exception and handle it appropriately
-        # Consider whether to nack the message or take other corrective action
-        print(f"Error processing message {message.id}: {e}")
-        # Depending on the desired behavior, you might want to re-raise the exception
-        # raise
+        # Not re-raised: the message stays unanswered and the recovery sweeper retries it.
+        provider = "error"
+        logger.error(f"Error processing message {message.id}: {e}", exc_info=True)
+    finally:
+        spans.finish(
+            tenant=user_id if METRICS_TENANT_LABELS else "all",
+            provider=provider,
+            confidence=_confidence_bucket(chosen, score),
+        )
@@ -0,0 +1,233 @@
+"""Minimal in-process metrics: labelled counters, gauges and histograms.
+
+Kept dependency-free on purpose. Histograms use fixed buckets and can estimate
+quantiles, which the LLM gateway uses to derive its hedging delay. Everything
+registered here is exported by ``GET /metrics`` in the Prometheus text format
+(see ``render_prometheus``).
+"""
+from __future__ import annotations
+
+import bisect
+import time
+from contextlib import contextmanager
+from threading import Lock
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+LabelKey = Tuple[str, ...]
+
+# Seconds; covers sub-millisecond in-process stages up to slow LLM calls.
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0,
+)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+
+    def _key(self, labels: Dict[str, object]) -> LabelKey:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, description, labelnames=()):
+        super().__init__(name, description, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[Tuple[LabelKey, float]]:
+        with self._lock:
+            return list(self._values.items())
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class _Series:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, description, labelnames=(), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, _Series] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # One slot per bucket plus the +Inf overflow slot.
+                series = self._series[key] = _Series(len(self.buckets) + 1)
+            series.counts[idx] += 1
+            series.total += value
+            series.count += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series.count if series else 0
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Estimate the q-quantile by linear interpolation inside its bucket."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            if series is None or series.count == 0:
+                return None
+            counts = list(series.counts)
+            total = series.count
+        rank = q * total
+        seen = 0
+        for i, c in enumerate(counts):
+            if c and seen + c >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * ((rank - seen) / c)
+            seen += c
+        return self.buckets[-1]
+
+    def samples(self) -> List[Tuple[LabelKey, List[int], float, int]]:
+        """(labels, per-bucket counts incl. +Inf, sum, count) for every series."""
+        with self._lock:
+            return [(k, list(s.counts), s.total, s.count) for k, s in self._series.items()]
+
+    def summary(self, **labels) -> Dict[str, Optional[float]]:
+        return {
+            "count": self.count(**labels),
+            "p50": self.quantile(0.5, **labels),
+            "p95": self.quantile(0.95, **labels),
+            "p99": self.quantile(0.99, **labels),
+        }
+
+
+_registry: Dict[str, _Metric] = {}
+_registry_lock = Lock()
+
+
+def _register(cls, name: str, description: str, labelnames: Sequence[str], **kwargs):
+    with _registry_lock:
+        existing = _registry.get(name)
+        if existing is not None:
+            if not isinstance(existing, cls):
+                raise ValueError(f"Metric {name} already registered as {existing.kind}")
+            return existing
+        metric = cls(name, description, labelnames, **kwargs)
+        _registry[name] = metric
+        return metric
+
+
+def counter(name: str, description: str, labelnames: Sequence[str] = ()) -> Counter:
+    return _register(Counter, name, description, labelnames)
+
+
+def gauge(name: str, description: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return _register(Gauge, name, description, labelnames)
+
+
+def histogram(name: str, description: str, labelnames: Sequence[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram, name, description, labelnames, buckets=buckets)
+
+
+def registry() -> List[_Metric]:
+    with _registry_lock:
+        return list(_registry.values())
+
+
+class Spans:
+    """Stage timings of one unit of work, observed together once its labels are known.
+
+    Labels such as the LLM provider are only known at the end, so stages are timed
+    into a dict and ``finish`` records each one (plus ``total``) on ``histogram``
+    under a ``stage`` label and the given labels.
+    """
+
+    def __init__(self, histogram: Histogram, clock: Callable[[], float] = time.perf_counter):
+        self._histogram = histogram
+        self._clock = clock
+        self._start = clock()
+        self.durations: Dict[str, float] = {}
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.durations[stage] = self.durations.get(stage, 0.0) + self._clock() - start
+
+    def finish(self, **labels) -> float:
+        total = self._clock() - self._start
+        for stage, seconds in self.durations.items():
+            self._histogram.observe(seconds, stage=stage, **labels)
+        self._histogram.observe(total, stage="total", **labels)
+        return total
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_prometheus() -> str:
+    """Every registered metric in the Prometheus text exposition format (0.0.4)."""
+    lines: List[str] = []
+    for metric in sorted(registry(), key=lambda m: m.name):
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        if isinstance(metric, Histogram):
+            for key, counts, total, count in metric.samples():
+                cumulative = 0
+                for bound, c in zip((*metric.buckets, float("inf")), counts):
+                    cumulative += c
+                    le = "+Inf" if bound == float("inf") else _number(bound)
+                    labels = _labels(metric.labelnames, key, 'le="' + le + '"')
+                    lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+                lines.append(f"{metric.name}_sum{_labels(metric.labelnames, key)} {_number(total)}")
+                lines.append(f"{metric.name}_count{_labels(metric.labelnames, key)} {count}")
+        else:
+            for key, value in metric.samples():
+                lines.append(f"{metric.name}{_labels(metric.labelnames, key)} {_number(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, ForeignKey, Index
+from ..db.base import Base
+
+
+class ConversationChange(Base):
+    """Append-only feed of answered messages; ``seq`` is the change feed cursor."""
+    __tablename__ = "conversation_changes"
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    message_id = Column(Integer, ForeignKey("messages.id"), nullable=False)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
+    user_id = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("ix_conversation_changes_user_id_seq", "user_id", "seq"),
+    )
@@ -6,7 +6,7 @@ class Customer(Base):
     __tablename__ = "customers"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     # Persisted WhatsApp number for cross-service enrichment (nullable for backwards compat)
     whatsapp_no = Column(String, nullable=True)
 
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index
+from sqlalchemy import text
 from sqlalchemy.orm import relationship
 from ..db.base import Base
 
@@ -10,5 +11,20 @@ class Message(Base):
     user_message = Column(String, nullable=True)
     response_message = Column(String, nullable=True)
     is_send_response = Column(Boolean, default=False)
+    # Recovery sweeper bookkeeping (naive UTC); NULL created_at = stored before these columns existed
+    created_at = Column(DateTime, nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
 
     customer = relationship("Customer", back_populates="messages")
+
+    __table_args__ = (
+        # Per-conversation message lookups and pagination
+        Index("ix_messages_customer_id_id", "customer_id", "id"),
+        # Only unanswered messages, for the recovery sweeper
+        Index(
+            "ix_messages_unanswered_id", "id",
+            postgresql_where=text("is_send_response = false"),
+            sqlite_where=text("is_send_response = 0"),
+        ),
+    )
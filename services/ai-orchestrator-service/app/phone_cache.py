@@ -1,11 +1,13 @@
 from __future__ import annotations
 
-from threading import RLock
 from typing import Dict, Optional
 
+from .bounded_cache import BoundedCache
+from .config import PHONE_CACHE_MAX_ENTRIES, PHONE_CACHE_TTL_SECONDS
 
-_cache: Dict[int, str] = {}
-_lock = RLock()
+
+# Only a fallback for customers whose whatsapp_no is not persisted yet, so bounded.
+_cache: BoundedCache[str] = BoundedCache("phone_numbers", PHONE_CACHE_MAX_ENTRIES, PHONE_CACHE_TTL_SECONDS)
 
 
 def set_whatsapp_no(customer_id: int, whatsapp_no: Optional[str]) -> None:
@@ -15,21 +17,22 @@ def set_whatsapp_no(customer_id: int, whatsapp_no: Optional[str]) -> None:
     """
     if not whatsapp_no:
         return
-    with _lock:
-        _cache[customer_id] = whatsapp_no
+    _cache.set(customer_id, whatsapp_no)
 
 
 def get_whatsapp_no(customer_id: int) -> Optional[str]:
     """Return the whatsapp number if known for this customer_id."""
-    with _lock:
-        return _cache.get(customer_id)
+    return _cache.get(customer_id)
 
 
 def bulk_set(mapping: Dict[int, str]) -> None:
     """Optionally set many mappings at once."""
     if not mapping:
         return
-    with _lock:
-        for cid, num in mapping.items():
-            if num:
-                _cache[cid] = num
+    for cid, num in mapping.items():
+        if num:
+            _cache.set(cid, num)
+
+
+def stats() -> dict:
+    return _cache.stats()
@@ -0,0 +1,106 @@
+"""Localized, fact-only reply templates.
+
+Used wherever a reply can be built from the product facts we already hold without
+asking an LLM to rephrase them. Like the LLM prompts, templates never expose SKUs
+or total stock, only the available quantity.
+"""
+from __future__ import annotations
+
+import re
+from typing import Dict, Optional
+
+DEFAULT_LOCALE = "en"
+
+TEMPLATES: Dict[str, Dict[str, str]] = {
+    "en": {
+        "price": "{name} is priced at {price}.",
+        "stock": "{name}: {qty} available right now.",
+        "stock_out": "Sorry, {name} is currently out of stock.",
+        "price_stock": "{name} is priced at {price}, with {qty} available right now.",
+        "price_stock_out": "{name} is priced at {price}, but it is currently out of stock.",
+        "busy": "Thanks for your message! We're handling a lot of messages right now and can't answer this one in detail. Ask about a product by name to get its price and availability.",
+    },
+    "si": {
+        "price": "{name} හි මිල {price} යි.",
+        "stock": "{name}: දැනට {qty}ක් ලබා ගත හැක.",
+        "stock_out": "සමාවන්න, {name} දැනට තොගයේ නැත.",
+        "price_stock": "{name} හි මිල {price} යි. දැනට {qty}ක් ලබා ගත හැක.",
+        "price_stock_out": "{name} හි මිල {price} යි, නමුත් දැනට තොගයේ නැත.",
+        "busy": "ඔබේ පණිවිඩයට ස්තූතියි! දැනට අපට පණිවිඩ විශාල ප්‍රමාණයක් ලැබෙන බැවින් මෙයට සවිස්තරව පිළිතුරු දිය නොහැක. මිල සහ තොගය දැනගැනීමට භාණ්ඩයේ නම සඳහන් කර විමසන්න.",
+    },
+    "ta": {
+        "price": "{name} விலை {price}.",
+        "stock": "{name}: தற்போது {qty} கிடைக்கின்றன.",
+        "stock_out": "மன்னிக்கவும், {name} தற்போது கையிருப்பில் இல்லை.",
+        "price_stock": "{name} விலை {price}. தற்போது {qty} கிடைக்கின்றன.",
+        "price_stock_out": "{name} விலை {price}, ஆனால் தற்போது கையிருப்பில் இல்லை.",
+        "busy": "உங்கள் செய்திக்கு நன்றி! தற்போது அதிகமான செய்திகள் வருவதால் இதற்கு விரிவாக பதிலளிக்க முடியவில்லை. விலை மற்றும் கையிருப்பை அறிய பொருளின் பெயரைக் குறிப்பிட்டுக் கேளுங்கள்.",
+    },
+}
+
+_PRICE_RE = re.compile(r"\b(price|prices|cost|costs|how much|rate)\b", re.I)
+_STOCK_RE = re.compile(r"\b(stock|in stock|quantity|available|availability|left)\b", re.I)
+# Anything beyond a bare price/availability question still goes to the LLM.
+_COMPLEX_RE = re.compile(
+    r"\b(details?|describe|description|compare|difference|vs|versus|deliver|delivery|shipping|discount|offer|"
+    r"warranty|size|sizes|colou?r|recommend|suggest|return|refund|order|buy|what about|why|when|where)\b",
+    re.I,
+)
+_MAX_PLAIN_WORDS = 14
+
+
+def detect_fact_intent(user_text: str) -> Optional[str]:
+    """'price', 'stock' or 'price_stock' for a plain question about those facts, else None."""
+    if not user_text:
+        return None
+    if len(user_text.split()) > _MAX_PLAIN_WORDS or _COMPLEX_RE.search(user_text):
+        return None
+    wants_price = bool(_PRICE_RE.search(user_text))
+    wants_stock = bool(_STOCK_RE.search(user_text))
+    if wants_price and wants_stock:
+        return "price_stock"
+    if wants_price:
+        return "price"
+    if wants_stock:
+        return "stock"
+    return None
+
+
+def format_price(price: float) -> str:
+    if float(price).is_integer():
+        return f"{int(price):,}"
+    return f"{price:,.2f}"
+
+
+def render_fact_reply(intent: str, product, locale: str = DEFAULT_LOCALE) -> Optional[str]:
+    """Fill the template for ``intent``; None when a needed fact is missing."""
+    templates = TEMPLATES.get(locale) or TEMPLATES[DEFAULT_LOCALE]
+    name = getattr(product, "name", None)
+    price = getattr(product, "price", None)
+    qty = getattr(product, "available_qty", None)
+    if not name:
+        return None
+    if intent in ("price", "price_stock") and price is None:
+        return None
+    if intent in ("stock", "price_stock") and qty is None:
+        return None
+    key = intent
+    if intent in ("stock", "price_stock") and qty <= 0:
+        key = f"{intent}_out"
+    return templates[key].format(
+        name=name,
+        price=format_price(price) if price is not None else "",
+        qty=qty if qty is not None else "",
+    )
+
+
+def render_degraded_reply(product, user_text: str, locale: str = DEFAULT_LOCALE) -> str:
+    """Reply without an LLM: the product's facts when we have a product, else a note asking for one by name.
+
+    The message is marked answered, so the note must not promise a later reply.
+    """
+    if product is not None:
+        reply = render_fact_reply(detect_fact_intent(user_text) or "price_stock", product, locale)
+        if reply is not None:
+            return reply
+    return (TEMPLATES.get(locale) or TEMPLATES[DEFAULT_LOCALE])["busy"]
@@ -0,0 +1,176 @@
+"""Cache of LLM replies for questions about a chosen product.
+
+Customers keep asking near-identical questions ("price of X?") about the same
+product, and the prompt for a chosen product depends only on its facts and the
+message. Replies are cached under
+
+    tenant : product id : product version : facts digest : message fingerprint
+
+The product version is bumped by product_updated/product_deleted events, which
+invalidates every cached reply for that product at once. The facts digest (name,
+price, available quantity) additionally keeps a replica that missed the event from
+serving a reply built on old facts.
+
+The default backend is an in-process ``BoundedCache`` (LRU + TTL). Setting ``RESPONSE_CACHE_REDIS_URL``
+switches to any Redis-compatible server (shared across replicas; eviction is left
+to the server's maxmemory policy, entries still carry the TTL).
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import string
+from threading import Lock
+from typing import Dict, Optional
+
+from . import metrics
+from .bounded_cache import CACHE_EVICTIONS, BoundedCache
+from .config import (
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_REDIS_URL,
+    RESPONSE_CACHE_TTL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+CACHE_LOOKUPS = metrics.counter("response_cache_lookups_total", "LLM response cache lookups", ("result",))
+CACHE_INVALIDATIONS = metrics.counter(
+    "response_cache_invalidations_total", "Product version bumps that invalidated cached replies",
+)
+
+_PUNCT_TABLE = str.maketrans({c: " " for c in string.punctuation})
+
+
+def fingerprint(user_text: str) -> str:
+    """Case-, punctuation- and whitespace-insensitive digest of a message."""
+    normalized = " ".join((user_text or "").casefold().translate(_PUNCT_TABLE).split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def _facts_digest(product) -> str:
+    facts = f"{getattr(product, 'name', None)}|{getattr(product, 'price', None)}|{getattr(product, 'available_qty', None)}"
+    return hashlib.sha1(facts.encode("utf-8")).hexdigest()[:12]
+
+
+class InProcessBackend:
+    name = "memory"
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._entries: BoundedCache[str] = BoundedCache("llm_responses", max_entries, ttl_seconds)
+        self._versions: Dict[int, int] = {}
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        return self._entries.get(key)
+
+    def set(self, key: str, value: str) -> None:
+        self._entries.set(key, value)
+
+    def version(self, product_id: int) -> int:
+        with self._lock:
+            return self._versions.get(product_id, 0)
+
+    def bump(self, product_id: int) -> None:
+        with self._lock:
+            self._versions[product_id] = self._versions.get(product_id, 0) + 1
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    name = "redis"
+
+    def __init__(self, url: str, ttl_seconds: float):
+        import redis  # optional dependency, only needed with RESPONSE_CACHE_REDIS_URL
+
+        self._client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.5)
+        self.ttl_seconds = int(ttl_seconds)
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._client.get(f"llmreply:{key}")
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key: str, value: str) -> None:
+        self._client.set(f"llmreply:{key}", value.encode("utf-8"), ex=self.ttl_seconds)
+
+    def version(self, product_id: int) -> int:
+        value = self._client.get(f"llmreply:version:{product_id}")
+        return int(value) if value is not None else 0
+
+    def bump(self, product_id: int) -> None:
+        self._client.incr(f"llmreply:version:{product_id}")
+
+    def size(self) -> int:
+        return -1  # not tracked; ask the server
+
+
+def _make_backend():
+    if RESPONSE_CACHE_REDIS_URL:
+        try:
+            return RedisBackend(RESPONSE_CACHE_REDIS_URL, RESPONSE_CACHE_TTL_SECONDS)
+        except Exception as e:
+            logger.warning(f"Redis response cache unavailable ({e}); using the in-process cache")
+    return InProcessBackend(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS)
+
+
+_backend = _make_backend() if RESPONSE_CACHE_ENABLED else None
+
+
+def key_for(user_id: int, product, user_text: str) -> Optional[str]:
+    """Cache key for a reply about ``product``, or None when caching is off."""
+    if _backend is None or product is None or getattr(product, "id", None) is None:
+        return None
+    try:
+        version = _backend.version(product.id)
+    except Exception as e:
+        logger.warning(f"Response cache version lookup failed: {e}")
+        return None
+    return f"{user_id}:{product.id}:{version}:{_facts_digest(product)}:{fingerprint(user_text)}"
+
+
+def get(key: Optional[str]) -> Optional[str]:
+    if key is None or _backend is None:
+        return None
+    try:
+        value = _backend.get(key)
+    except Exception as e:
+        logger.warning(f"Response cache read failed: {e}")
+        value = None
+    CACHE_LOOKUPS.inc(result="hit" if value is not None else "miss")
+    return value
+
+
+def put(key: Optional[str], reply: str) -> None:
+    if key is None or _backend is None or not reply:
+        return
+    try:
+        _backend.set(key, reply)
+    except Exception as e:
+        logger.warning(f"Response cache write failed: {e}")
+
+
+def bump_product_version(product_id: int) -> None:
+    """Invalidate every cached reply about ``product_id`` (its price or stock may have changed)."""
+    if _backend is None or product_id is None:
+        return
+    try:
+        _backend.bump(product_id)
+        CACHE_INVALIDATIONS.inc()
+    except Exception as e:
+        logger.warning(f"Response cache invalidation failed for product {product_id}: {e}")
+
+
+def stats() -> Dict[str, object]:
+    hits = CACHE_LOOKUPS.value(result="hit")
+    misses = CACHE_LOOKUPS.value(result="miss")
+    return {
+        "backend": _backend.name if _backend is not None else "disabled",
+        "entries": _backend.size() if _backend is not None else 0,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        "evictions": CACHE_EVICTIONS.value(cache="llm_responses", reason="lru"),
+        "invalidations": CACHE_INVALIDATIONS.value(),
+    }
@@ -0,0 +1,187 @@
+"""Recovery sweeper for messages that never got a reply.
+
+If ``process_message`` fails, or the pod dies mid-LLM call, the message keeps
+``is_send_response == False`` and nothing retries it. The sweeper periodically
+claims such messages once they are older than ``SWEEPER_STALE_SECONDS`` (see
+``crud.message.claim_stale_unprocessed``), reprocesses them on a bounded thread
+pool and publishes the replies as usual. Each message is retried at most
+``SWEEPER_MAX_ATTEMPTS`` times. Backlog size and age are exported as gauges.
+
+Runs as a background thread in the service (``SWEEPER_INTERVAL_SECONDS`` > 0) or
+standalone::
+
+    python -m app.sweeper            # loop
+    python -m app.sweeper --once     # one sweep, then exit
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import pika
+
+from . import conversation_memory, message_processor, metrics
+from .config import (
+    SWEEPER_BATCH_SIZE,
+    SWEEPER_CONCURRENCY,
+    SWEEPER_INTERVAL_SECONDS,
+    SWEEPER_LEASE_SECONDS,
+    SWEEPER_MAX_ATTEMPTS,
+    SWEEPER_STALE_SECONDS,
+)
+from .crud import message as message_crud
+from .db.session import SessionLocal
+from .models.message import Message
+
+logger = logging.getLogger(__name__)
+
+BACKLOG_SIZE = metrics.gauge("unanswered_messages", "Messages without a reply")
+BACKLOG_AGE = metrics.gauge("unanswered_oldest_age_seconds", "Age of the oldest message without a reply")
+SWEEP_RESULTS = metrics.counter("sweeper_messages_total", "Messages reprocessed by the sweeper", ("outcome",))
+
+
+class LockedChannel:
+    """Serializes publishes from the sweeper's worker threads onto one pika channel."""
+
+    def __init__(self, channel):
+        self._channel = channel
+        self._lock = threading.Lock()
+
+    def exchange_declare(self, *args, **kwargs):
+        with self._lock:
+            return self._channel.exchange_declare(*args, **kwargs)
+
+    def basic_publish(self, *args, **kwargs):
+        with self._lock:
+            return self._channel.basic_publish(*args, **kwargs)
+
+
+def _open_channel():
+    from .messaging import RABBITMQ_URL
+
+    connection = pika.BlockingConnection(pika.URLParameters(RABBITMQ_URL))
+    return connection, LockedChannel(connection.channel())
+
+
+def update_backlog_metrics() -> Dict[str, float]:
+    db = SessionLocal()
+    try:
+        count, oldest = message_crud.unprocessed_backlog(db)
+    finally:
+        db.close()
+    age = (message_crud.utcnow() - oldest).total_seconds() if oldest else 0.0
+    BACKLOG_SIZE.set(count)
+    BACKLOG_AGE.set(age)
+    return {"unanswered": count, "oldest_age_seconds": age}
+
+
+def _reprocess(channel, message_id: int) -> bool:
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        message = db.get(Message, message_id)
+        if message is None or message.is_send_response:
+            SWEEP_RESULTS.inc(outcome="skipped")
+            return False
+        user_id = message.customer.user_id if message.customer else None
+        if user_id is None:
+            logger.warning(f"Sweeper: message {message_id} has no owning user; skipping")
+            SWEEP_RESULTS.inc(outcome="skipped")
+            return False
+        message_processor.process_message(channel, message, db, user_id=user_id)
+        ok = bool(message.is_send_response)
+        SWEEP_RESULTS.inc(outcome="answered" if ok else "failed")
+        return ok
+    except Exception as e:
+        logger.error(f"Sweeper: reprocessing message {message_id} failed: {e}", exc_info=True)
+        SWEEP_RESULTS.inc(outcome="failed")
+        return False
+    finally:
+        db.close()
+
+
+def sweep_once(
+    channel=None,
+    batch_size: int = SWEEPER_BATCH_SIZE,
+    concurrency: int = SWEEPER_CONCURRENCY,
+    max_batches: Optional[int] = None,
+) -> int:
+    """Claim and reprocess stale messages batch by batch; returns how many got a reply."""
+    answered = 0
+    connection = None
+    batches = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="sweeper") as pool:
+            while max_batches is None or batches < max_batches:
+                db = SessionLocal()
+                try:
+                    ids: List[int] = message_crud.claim_stale_unprocessed(
+                        db, SWEEPER_STALE_SECONDS, SWEEPER_LEASE_SECONDS, SWEEPER_MAX_ATTEMPTS, batch_size,
+                    )
+                finally:
+                    db.close()
+                if not ids:
+                    break
+                batches += 1
+                if channel is None:
+                    connection, channel = _open_channel()
+                logger.info(f"Sweeper: reprocessing {len(ids)} unanswered messages")
+                answered += sum(pool.map(lambda mid: _reprocess(channel, mid), ids))
+    finally:
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        update_backlog_metrics()
+    return answered
+
+
+def run_forever(
+    interval: float = SWEEPER_INTERVAL_SECONDS,
+    batch_size: int = SWEEPER_BATCH_SIZE,
+    concurrency: int = SWEEPER_CONCURRENCY,
+    stop: Optional[threading.Event] = None,
+) -> None:
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            sweep_once(batch_size=batch_size, concurrency=concurrency)
+        except Exception as e:
+            logger.error(f"Sweeper run failed: {e}", exc_info=True)
+        stop.wait(interval)
+
+
+def start_background() -> Optional[threading.Thread]:
+    """Start the in-service sweeper thread unless it is disabled."""
+    if SWEEPER_INTERVAL_SECONDS <= 0:
+        return None
+    thread = threading.Thread(target=run_forever, name="sweeper", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Reprocess messages that never got an AI reply.")
+    parser.add_argument("--once", action="store_true", help="run a single sweep and exit")
+    parser.add_argument("--batch-size", type=int, default=SWEEPER_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=SWEEPER_CONCURRENCY)
+    parser.add_argument("--interval", type=float, default=SWEEPER_INTERVAL_SECONDS or 60)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    # process_message writes conversation state behind; flush it before the process exits.
+    conversation_memory.start_flusher()
+    try:
+        if args.once:
+            answered = sweep_once(batch_size=args.batch_size, concurrency=args.concurrency)
+            logger.info(f"Sweeper: answered {answered} messages; backlog {update_backlog_metrics()}")
+            return
+        run_forever(args.interval, args.batch_size, args.concurrency)
+    finally:
+        conversation_memory.stop_flusher()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Opt-in recorder of matching decisions, for offline replay (see app/traffic_replay.py).
+
+With ``TRAFFIC_RECORD_DIR`` set, ``process_message`` hands every sampled message
+to ``record`` and a background thread appends it to a gzip-compressed NDJSON
+file in that directory (one file per process). Two record types are written:
+
+- ``{"type": "catalog", "snapshot": ..., "products": [...]}``: the tenant's
+  catalog (id, name, SKU, description) the first time a catalog state is seen.
+  Price and stock updates do not make a new state. ``record`` only copies the
+  references to the catalog's immutable product entries; the writer thread
+  builds the record. The most recent snapshot ids are remembered in a bounded cache.
+- ``{"type": "message", "snapshot": ..., "text": ..., "chosen": ..., "score": ...,
+  "source": ..., "branch": ..., "provider": ..., "latency_ms": {...}}``
+
+Texts are anonymized before they are queued: phone numbers, e-mail addresses,
+URLs and long digit runs are replaced by placeholders. Customer ids are never
+written and tenants only appear as opaque snapshot ids. Recording never blocks
+the pipeline: when the queue is full, or the file reached ``TRAFFIC_RECORD_MAX_MB``,
+records are dropped and counted.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+from . import metrics
+from .bounded_cache import BoundedCache
+from .config import PRODUCT_MATCHER, TRAFFIC_RECORD_DIR, TRAFFIC_RECORD_MAX_MB, TRAFFIC_RECORD_SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+RECORDS = metrics.counter("traffic_records_total", "Traffic corpus records", ("outcome",))
+
+_QUEUE_SIZE = 10000
+# Snapshot ids already written; one forgotten and seen again is simply written again.
+_MAX_SNAPSHOTS = 4096
+
+_PATTERNS = [
+    (re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"), "<email>"),
+    (re.compile(r"\b(?:https?://|www\.)\S+", re.I), "<url>"),
+    (re.compile(r"\+?\d[\d\s().-]{7,}\d"), "<phone>"),
+    (re.compile(r"\d{5,}"), "<number>"),
+]
+
+
+def anonymize(text: str) -> str:
+    for pattern, placeholder in _PATTERNS:
+        text = pattern.sub(placeholder, text)
+    return text
+
+
+def snapshot_id(catalog) -> str:
+    """Opaque id of the catalog's current matching state (tenant, load and revision)."""
+    raw = f"{catalog.user_id}:{catalog.loaded_at}:{catalog.revision}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+class _Writer(threading.Thread):
+    def __init__(self, path: str, max_bytes: int):
+        super().__init__(name="traffic-recorder", daemon=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.queue: "queue.Queue[Optional[dict]]" = queue.Queue(maxsize=_QUEUE_SIZE)
+        self.full = False
+
+    def run(self) -> None:
+        with gzip.open(self.path, "at", encoding="utf-8") as f:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    return
+                if self.full:
+                    RECORDS.inc(outcome="dropped_size")
+                    continue
+                if item["type"] == "catalog":
+                    item = dict(item, products=[
+                        {"id": p.id, "name": p.name, "sku": p.sku, "description": p.description}
+                        for p in item["products"]
+                    ])
+                f.write(json.dumps(item, separators=(",", ":")) + "\n")
+                RECORDS.inc(outcome="written")
+                if self.queue.empty():
+                    f.flush()
+                    if os.path.getsize(self.path) >= self.max_bytes:
+                        logger.warning(f"Traffic corpus {self.path} reached its size limit; recording stopped")
+                        self.full = True
+
+
+_writer: Optional[_Writer] = None
+_snapshots: BoundedCache[bool] = BoundedCache("traffic_snapshots", _MAX_SNAPSHOTS)
+_lock = threading.Lock()
+
+
+def start(directory: Optional[str] = TRAFFIC_RECORD_DIR) -> Optional[str]:
+    """Open a new corpus file in ``directory``; returns its path (None when recording is off)."""
+    global _writer
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"traffic-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}.ndjson.gz")
+    with _lock:
+        if _writer is not None:
+            return _writer.path
+        _snapshots.clear()
+        _writer = _Writer(path, int(TRAFFIC_RECORD_MAX_MB * 1024 * 1024))
+        _writer.start()
+    logger.info(f"Recording traffic to {path}")
+    return path
+
+
+def stop() -> None:
+    """Flush queued records and close the file."""
+    global _writer
+    with _lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.queue.put(None)
+        writer.join(timeout=10)
+
+
+def _enqueue(writer: _Writer, item: dict) -> None:
+    try:
+        writer.queue.put_nowait(item)
+    except queue.Full:
+        RECORDS.inc(outcome="dropped_queue")
+
+
+def record(
+    catalog,
+    text: str,
+    chosen_id: Optional[int],
+    score: float,
+    source: str,
+    branch: str,
+    provider: str,
+    durations: Dict[str, float],
+) -> None:
+    """Queue one message's matching decision; a no-op unless recording is on."""
+    writer = _writer
+    if writer is None or random.random() >= TRAFFIC_RECORD_SAMPLE_RATE:
+        return
+    with catalog.lock:
+        snapshot = snapshot_id(catalog)
+        with _lock:
+            new_snapshot = snapshot not in _snapshots
+            if new_snapshot:
+                _snapshots.set(snapshot, True)
+        # Product entries are immutable, so copying the references is a consistent snapshot.
+        products = list(catalog.products.values()) if new_snapshot else None
+    if products is not None:
+        _enqueue(writer, {"type": "catalog", "snapshot": snapshot, "products": products})
+    _enqueue(writer, {
+        "type": "message",
+        "ts": round(time.time(), 3),
+        "snapshot": snapshot,
+        "text": anonymize(text),
+        "matcher": PRODUCT_MATCHER,
+        "chosen": chosen_id,
+        "score": round(score, 4),
+        "source": source,
+        "branch": branch,
+        "provider": provider,
+        "latency_ms": {stage: round(seconds * 1000.0, 3) for stage, seconds in durations.items()},
+    })
@@ -0,0 +1,181 @@
+"""Replay a recorded traffic corpus against product matchers, offline.
+
+Reads the gzip NDJSON files written by app/traffic_recorder.py, rebuilds each
+recorded catalog snapshot and runs every message through each matcher the same
+way ``process_message`` does (exact mentions first, then the matcher; a product is
+chosen at ``--threshold``). Reported side by side per matcher:
+
+- agreement: same chosen product (or none) as recorded in production
+- accuracy: same as ``expected_product_id``, for records someone labelled
+- branch agreement: same prompt branch (product facts / clarify / no products)
+- latency percentiles of ``best_match`` and the time to build the indexes
+
+Messages answered from conversation memory did not go through the matcher and
+are skipped. Matchers are ``PRODUCT_MATCHER`` names or ``package.module:Class``
+for an implementation under test::
+
+    python -m app.traffic_replay corpus/*.ndjson.gz --matchers heuristic bm25 fuzzy
+    python -m app.traffic_replay corpus/*.ndjson.gz --matchers heuristic mylab.matchers:NewIndex --json out.json
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import importlib
+import json
+import logging
+import sys
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .catalog_cache import CachedProduct, TenantCatalog
+from .matching import MATCHERS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 0.7
+
+
+def read_corpus(paths: List[str]) -> Tuple[Dict[str, List[CachedProduct]], List[dict]]:
+    """Catalog snapshots by id and message records, from every file (a truncated tail is tolerated)."""
+    snapshots: Dict[str, List[CachedProduct]] = {}
+    messages: List[dict] = []
+    for path in paths:
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        item = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # partial last line of a file still being written
+                    if item.get("type") == "catalog":
+                        snapshots[item["snapshot"]] = [
+                            CachedProduct(id=p["id"], owner_id=None, name=p.get("name"), sku=p.get("sku"),
+                                          price=None, description=p.get("description"))
+                            for p in item["products"]
+                        ]
+                    elif item.get("type") == "message":
+                        messages.append(item)
+        except (EOFError, zlib.error, OSError) as e:
+            logger.warning(f"{path}: stopped reading at a damaged or unfinished block ({e})")
+    return snapshots, messages
+
+
+def resolve_matcher(name: str) -> Callable:
+    """A matcher class from ``MATCHERS`` or a ``package.module:Class`` path."""
+    if name in MATCHERS:
+        return MATCHERS[name]
+    module, _, attr = name.replace(":", ".").rpartition(".")
+    if not module:
+        raise SystemExit(f"Unknown matcher '{name}'; use one of {sorted(MATCHERS)} or package.module:Class")
+    return getattr(importlib.import_module(module), attr)
+
+
+def _percentile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    return round(samples[int(q * (len(samples) - 1))], 3)
+
+
+def _branch(product, score: float, size: int, threshold: float) -> str:
+    if product is not None and score >= threshold:
+        return "product"
+    return "clarify" if size else "no_products"
+
+
+def replay(
+    matcher_cls: Callable,
+    snapshots: Dict[str, List[CachedProduct]],
+    messages: List[dict],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> Dict[str, object]:
+    catalogs: Dict[str, TenantCatalog] = {}
+    build_seconds = 0.0
+    latencies: List[float] = []
+    agree = branch_agree = labelled = correct = chosen = skipped = 0
+    for record in messages:
+        products = snapshots.get(record["snapshot"])
+        if products is None or record.get("source") == "memory":
+            skipped += 1
+            continue
+        catalog = catalogs.get(record["snapshot"])
+        if catalog is None:
+            start = time.perf_counter()
+            catalog = catalogs[record["snapshot"]] = TenantCatalog(0, products, matcher=matcher_cls)
+            catalog.best_match("")  # build the mention automaton and the matcher now, not on the first message
+            build_seconds += time.perf_counter() - start
+        start = time.perf_counter()
+        product, score = catalog.best_match(record["text"])
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        predicted = product.id if product is not None and score >= threshold else None
+        chosen += predicted is not None
+        agree += predicted == record.get("chosen")
+        branch_agree += _branch(product, score, len(catalog), threshold) == record.get("branch")
+        if "expected_product_id" in record:
+            labelled += 1
+            correct += predicted == record["expected_product_id"]
+    evaluated = len(latencies)
+    latencies.sort()
+
+    def share(n: int, total: int) -> Optional[float]:
+        return round(n / total, 4) if total else None
+
+    return {
+        "evaluated": evaluated,
+        "skipped": skipped,
+        "agreement": share(agree, evaluated),
+        "accuracy": share(correct, labelled),
+        "labelled": labelled,
+        "branch_agreement": share(branch_agree, evaluated),
+        "chosen_rate": share(chosen, evaluated),
+        "p50_ms": _percentile(latencies, 0.50),
+        "p95_ms": _percentile(latencies, 0.95),
+        "p99_ms": _percentile(latencies, 0.99),
+        "build_ms": round(build_seconds * 1000.0, 1),
+    }
+
+
+def recorded_baseline(messages: List[dict]) -> Dict[str, object]:
+    """Production ``match`` stage latency as recorded, for reference next to the replays."""
+    samples = sorted(m["latency_ms"]["match"] for m in messages if "match" in m.get("latency_ms", {}))
+    return {"evaluated": len(samples), "p50_ms": _percentile(samples, 0.50),
+            "p95_ms": _percentile(samples, 0.95), "p99_ms": _percentile(samples, 0.99)}
+
+
+_COLUMNS = ["evaluated", "agreement", "accuracy", "branch_agreement", "chosen_rate", "p50_ms", "p95_ms", "p99_ms", "build_ms"]
+_SHARES = {"agreement", "accuracy", "branch_agreement", "chosen_rate"}
+
+
+def _cell(result: Dict[str, object], column: str) -> str:
+    value = result.get(column)
+    if value is None:
+        return "-"
+    return f"{value:.1%}" if column in _SHARES else str(value)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Replay a recorded traffic corpus against product matchers.")
+    parser.add_argument("paths", nargs="+", help="traffic-*.ndjson.gz files")
+    parser.add_argument("--matchers", nargs="+", default=sorted(MATCHERS))
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="score at which a product is chosen")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    snapshots, messages = read_corpus(args.paths)
+    print(f"{len(messages)} messages over {len(snapshots)} catalog snapshots")
+    results = {"recorded": recorded_baseline(messages)}
+    for name in args.matchers:
+        results[name] = replay(resolve_matcher(name), snapshots, messages, args.threshold)
+
+    print(f"{'matcher':<28}" + "".join(f"{c:>17}" for c in _COLUMNS))
+    for name, result in results.items():
+        print(f"{name:<28}" + "".join(f"{_cell(result, c):>17}" for c in _COLUMNS))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
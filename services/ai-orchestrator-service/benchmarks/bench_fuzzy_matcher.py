@@ -0,0 +1,93 @@
+"""Latency of the n-gram fuzzy matcher at catalog scale.
+
+Builds synthetic catalogs and times ``FuzzyIndex.best_match``/``top_k`` over a set of
+misspelled customer messages, next to the heuristic ``TokenIndex`` for reference.
+
+    python benchmarks/bench_fuzzy_matcher.py --sizes 10000 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.matching import TokenIndex  # noqa: E402
+from app.matching.fuzzy import FuzzyIndex  # noqa: E402
+
+BRANDS = ["adidas", "nike", "puma", "samsung", "apple", "sony", "xiaomi", "levis", "zara", "casio"]
+KINDS = ["sneakers", "running shoes", "t-shirt", "hoodie", "headphones", "smart watch", "phone case", "backpack", "jeans", "charger"]
+COLORS = ["red", "blue", "black", "white", "green", "grey", "navy", "pink"]
+
+
+def make_catalog(n, rnd):
+    return [
+        SimpleNamespace(
+            id=i,
+            name=f"{rnd.choice(BRANDS)} {rnd.choice(COLORS)} {rnd.choice(KINDS)} {i}",
+            sku=f"SKU-{i:06d}",
+        )
+        for i in range(n)
+    ]
+
+
+def misspell(word, rnd):
+    if len(word) < 4:
+        return word
+    i = rnd.randrange(1, len(word) - 1)
+    return rnd.choice([word[:i] + word[i + 1:], word[:i] + word[i] + word[i:], word[:i] + word[i + 1] + word[i] + word[i + 2:]])
+
+
+def make_messages(catalog, count, rnd):
+    out = []
+    for _ in range(count):
+        p = rnd.choice(catalog)
+        words = [misspell(w, rnd) for w in p.name.split()]
+        out.append(rnd.choice(["how much is {}?", "do you have {} in stock", "price of {} pls"]).format(" ".join(words)))
+    return out
+
+
+def timed(fn, messages):
+    samples = []
+    for m in messages:
+        start = time.perf_counter()
+        fn(m)
+        samples.append((time.perf_counter() - start) * 1000.0)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(0.95 * (len(samples) - 1))], 3),
+        "max_ms": round(samples[-1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        rnd = random.Random(args.seed)
+        catalog = make_catalog(size, rnd)
+        messages = make_messages(catalog, args.messages, rnd)
+
+        start = time.perf_counter()
+        fuzzy = FuzzyIndex(catalog)
+        fuzzy_build = time.perf_counter() - start
+        start = time.perf_counter()
+        token = TokenIndex(catalog)
+        token_build = time.perf_counter() - start
+
+        print(f"catalog={size} messages={len(messages)}")
+        print(f"  fuzzy build {fuzzy_build * 1000:.0f} ms  best_match {timed(fuzzy.best_match, messages)}")
+        print(f"  fuzzy top_k(3) {timed(lambda m: fuzzy.top_k(m, 3), messages)}")
+        print(f"  token build {token_build * 1000:.0f} ms  best_match {timed(token.best_match, messages)}")
+
+
+if __name__ == "__main__":
+    main()
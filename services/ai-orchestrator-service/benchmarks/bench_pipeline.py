@@ -0,0 +1,327 @@
+"""Throughput and per-stage latency of the reply pipeline with a stub LLM.
+
+Builds one synthetic tenant per catalog size, replays a corpus of WhatsApp-style
+customer messages through ``messaging._handle_new_message`` (inbound store,
+matching, fast path, response cache, LLM gateway, reply write, publish) and
+reports p50/p95/p99 per stage from ``message_stage_seconds`` plus messages/sec.
+Groq and Gemini are replaced by stub providers with configurable latency and
+failure rate, so breakers, fallback and hedging still run for real.
+
+    python benchmarks/bench_pipeline.py --sizes 100 10000 100000 --output bench.json
+    python benchmarks/bench_pipeline.py --database-url postgresql://localhost/bench --concurrency 8
+    python benchmarks/bench_pipeline.py --baseline bench.json   # flag regressions against an earlier run
+
+By default a throwaway SQLite file is used. Against Postgres the benchmark only
+adds rows, with ids above the existing ones.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_fuzzy_matcher import BRANDS, COLORS, KINDS, misspell  # noqa: E402
+
+QUANTILES = (("p50_ms", 0.50), ("p95_ms", 0.95), ("p99_ms", 0.99))
+
+PRODUCT_QUESTIONS = [
+    "how much is {name}?", "price of {name} pls", "{name} price?", "is {name} available",
+    "do you have {name} in stock", "how many {name} left",
+]
+GENERAL_QUESTIONS = [
+    "is {name} good for daily use?", "can i get {name} delivered to kandy tomorrow",
+    "does {name} come with warranty", "hi, i saw {name} on your page. still there?",
+]
+FOLLOW_UPS = ["how much is it?", "is that one in stock?", "what about the price of this", "same one, available?"]
+VAGUE = ["do you have {kind}?", "any {color} {kind}", "{brand} items?", "need a {kind} for my son"]
+SMALL_TALK = ["hi", "hello", "thank you!", "ok", "👍", "good morning", "when do you open?"]
+
+
+class StubChannel:
+    def __init__(self):
+        self.published = 0
+        self._lock = threading.Lock()
+
+    def exchange_declare(self, **kwargs):
+        pass
+
+    def basic_publish(self, **kwargs):
+        with self._lock:
+            self.published += 1
+
+
+def stub_provider(name, latency_ms, jitter_ms, failure_rate, rnd):
+    async def call(prompt, timeout):
+        await asyncio.sleep(max(0.0, rnd.gauss(latency_ms, jitter_ms)) / 1000.0)
+        if rnd.random() < failure_rate:
+            raise RuntimeError(f"{name} stub failure")
+        return f"[{name}] Thanks for your message! Here is what we have."
+    return call
+
+
+def make_messages(products, count, customers, rnd):
+    """(customer index, text) pairs; follow-ups only after the customer asked about a product."""
+    out, asked = [], set()
+    for _ in range(count):
+        customer = rnd.randrange(customers)
+        p = rnd.choice(products)
+        roll = rnd.random()
+        if roll < 0.30:
+            text = rnd.choice(PRODUCT_QUESTIONS).format(name=p["name"])
+            asked.add(customer)
+        elif roll < 0.45:
+            text = rnd.choice(GENERAL_QUESTIONS).format(name=p["name"])
+            asked.add(customer)
+        elif roll < 0.55:
+            name = " ".join(misspell(w, rnd) for w in p["name"].split())
+            text = rnd.choice(PRODUCT_QUESTIONS).format(name=name)
+        elif roll < 0.70 and customer in asked:
+            text = rnd.choice(FOLLOW_UPS)
+        elif roll < 0.85:
+            text = rnd.choice(VAGUE).format(kind=rnd.choice(KINDS), color=rnd.choice(COLORS), brand=rnd.choice(BRANDS))
+        else:
+            text = rnd.choice(SMALL_TALK)
+        out.append((customer, text))
+    return out
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {"count": 0}
+    out = {"count": len(samples)}
+    for label, q in QUANTILES:
+        out[label] = round(samples[int(q * (len(samples) - 1))] * 1000.0, 3)
+    return out
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_size(size, args, rnd, ids):
+    from sqlalchemy import insert
+
+    from app import catalog_cache, messaging, message_processor
+    from app.db.session import SessionLocal
+    from app.models.product import Product
+    from app.models.user import User
+
+    user_id = ids["user"] = ids["user"] + 1
+    products = [
+        {
+            "id": ids["product"] + i, "owner_id": user_id, "sku": f"BENCH-{user_id}-{i:06d}",
+            "name": f"{rnd.choice(BRANDS)} {rnd.choice(COLORS)} {rnd.choice(KINDS)} {i}",
+            "price": round(rnd.uniform(500, 25000), 2), "available_qty": rnd.randrange(0, 50), "stock_qty": 50,
+            "description": "Synthetic benchmark product",
+        }
+        for i in range(1, size + 1)
+    ]
+    ids["product"] += size
+    db = SessionLocal()
+    try:
+        db.execute(insert(User), [{"id": user_id, "name": f"bench-{size}"}])
+        for start in range(0, len(products), 5000):
+            db.execute(insert(Product), products[start:start + 5000])
+        db.commit()
+    finally:
+        db.close()
+    catalog_cache.invalidate()
+
+    messages = make_messages(products, args.warmup + args.messages, args.customers, rnd)
+    customer_base = ids["customer"]
+    ids["customer"] += args.customers
+    channel = StubChannel()
+    stages = defaultdict(list)
+    providers = defaultdict(int)
+    recorder_lock = threading.Lock()
+    ids_lock = threading.Lock()
+    recording = threading.Event()
+
+    class Recorder(type(message_processor.STAGE_LATENCY)):
+        def observe(self, value, **labels):
+            if not recording.is_set():
+                return
+            with recorder_lock:
+                stages[labels["stage"]].append(value)
+                if labels["stage"] == "total":
+                    providers[labels["provider"]] += 1
+
+    message_processor.STAGE_LATENCY = Recorder("bench_stage_seconds", "", ("stage", "tenant", "provider", "confidence"))
+
+    def handle(item):
+        customer, text = item
+        with ids_lock:
+            ids["message"] += 1
+            message_id = ids["message"]
+        event = {"event_type": "new_message", "message_data": {
+            "id": message_id, "customer_id": customer_base + customer + 1, "user_id": user_id,
+            "user_message": text, "whatsapp_no": f"+9477{customer:07d}",
+        }}
+        start = time.perf_counter()
+        messaging._handle_new_message(channel, event)
+        if recording.is_set():
+            with recorder_lock:
+                stages["end_to_end"].append(time.perf_counter() - start)
+
+    def replay(batch):
+        # One shard per worker, keyed by customer, so each customer's messages stay in order.
+        shards = defaultdict(list)
+        for item in batch:
+            shards[item[0] % args.concurrency].append(item)
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(lambda shard: [handle(item) for item in shard], shards.values()))
+
+    replay(messages[:args.warmup])
+    recording.set()
+    start = time.perf_counter()
+    replay(messages[args.warmup:])
+    elapsed = time.perf_counter() - start
+
+    return {
+        "products": size,
+        "messages": args.messages,
+        "elapsed_s": round(elapsed, 3),
+        "msgs_per_sec": round(args.messages / elapsed, 2) if elapsed else None,
+        "replies_published": channel.published,
+        "providers": dict(providers),
+        "stages": {stage: percentiles(samples) for stage, samples in sorted(stages.items())},
+    }
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """Print deltas against an earlier run; returns the number of regressions beyond ``tolerance``.
+
+    Stage slowdowns under ``min_delta_ms`` are not flagged: sub-millisecond stages are mostly noise.
+    """
+    regressions = 0
+    previous = {str(r["products"]): r for r in baseline.get("results", [])}
+    for result in results:
+        old = previous.get(str(result["products"]))
+        if old is None:
+            continue
+        checks = [("msgs/sec", old["msgs_per_sec"], result["msgs_per_sec"], True)]
+        for stage, summary in result["stages"].items():
+            if stage in old["stages"] and "p95_ms" in summary and "p95_ms" in old["stages"][stage]:
+                checks.append((f"{stage} p95", old["stages"][stage]["p95_ms"], summary["p95_ms"], False))
+        for label, before, after, higher_is_better in checks:
+            if not before:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            significant = higher_is_better or after - before >= min_delta_ms
+            flag = "  REGRESSION" if worse > tolerance and significant else ""
+            regressions += bool(flag)
+            print(f"  {result['products']:>7} products  {label:<24} {before:>10} -> {after:<10} ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 100_000])
+    parser.add_argument("--messages", type=int, default=500, help="measured messages per tenant")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured messages first (cold catalog load)")
+    parser.add_argument("--customers", type=int, default=50, help="distinct customers per tenant")
+    parser.add_argument("--concurrency", type=int, default=1, help="worker threads, sharded by customer")
+    parser.add_argument("--llm-latency-ms", type=float, default=400.0, help="mean stub Groq latency")
+    parser.add_argument("--llm-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--groq-failure-rate", type=float, default=0.0, help="share of Groq calls that fail (Gemini answers)")
+    parser.add_argument("--gemini-latency-ms", type=float, default=900.0)
+    parser.add_argument("--database-url", default=None, help="default: a temporary SQLite file")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="relative slowdown reported as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="smallest stage p95 slowdown reported")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tmpdir = None
+    if args.database_url is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        args.database_url = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+    # app.db.session builds its engine from the environment at import time.
+    os.environ["DATABASE_URL"] = args.database_url
+    # Stub Groq failures would otherwise log a fallback warning each.
+    logging.basicConfig(level=logging.ERROR)
+
+    from sqlalchemy import func
+
+    from app import conversation_memory, llm_gateway
+    from app.db.base import Base
+    from app.db.session import SessionLocal, engine
+    from app.models import conversation_change, conversation_state, customer, message, product, user  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    ids = {}
+    db = SessionLocal()
+    try:
+        for key, model in (("user", user.User), ("product", product.Product), ("customer", customer.Customer), ("message", message.Message)):
+            ids[key] = db.query(func.max(model.id)).scalar() or 0
+    finally:
+        db.close()
+
+    rnd = random.Random(args.seed)
+    # Separate generator so the corpus does not depend on how many LLM calls were made.
+    llm_rnd = random.Random(args.seed + 1)
+    llm_gateway.PROVIDERS[:] = [
+        llm_gateway.Provider("groq", stub_provider("groq", args.llm_latency_ms, args.llm_jitter_ms, args.groq_failure_rate, llm_rnd), 10.0),
+        llm_gateway.Provider("gemini", stub_provider("gemini", args.gemini_latency_ms, args.llm_jitter_ms, 0.0, llm_rnd), 15.0),
+    ]
+    conversation_memory.start_flusher()
+
+    results = []
+    try:
+        for size in args.sizes:
+            result = run_size(size, args, rnd, ids)
+            results.append(result)
+            print(f"products={size} messages={args.messages} concurrency={args.concurrency}: "
+                  f"{result['msgs_per_sec']} msgs/sec, providers {result['providers']}")
+            for stage, summary in result["stages"].items():
+                print(f"  {stage:<20} {summary}")
+    finally:
+        conversation_memory.stop_flusher()
+        if tmpdir is not None:
+            engine.dispose()
+            tmpdir.cleanup()
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "database": engine.dialect.name,
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "database_url")},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"compared with {args.baseline} (revision {baseline.get('revision')}):")
+        changed = {k: (v, report["config"].get(k)) for k, v in baseline.get("config", {}).items() if report["config"].get(k) != v}
+        if changed:
+            print(f"  note: configuration differs from the baseline: {changed}")
+        if compare(results, baseline, args.tolerance, args.min_delta_ms):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+# app.db.session builds its engine at import time; tests never touch a real database.
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app.db.base import Base  # noqa: E402
+from app.models import conversation_change, conversation_state, customer, message, product, user  # noqa: E402,F401
+
+
+@pytest.fixture
+def db_engine():
+    """Private in-memory database with every table; one connection shared across threads."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(db_engine):
+    """Configured like ``SessionLocal``; monkeypatch it in for code that opens its own sessions."""
+    return sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+
+
+@pytest.fixture
+def db_session(session_factory):
+    db = session_factory()
+    yield db
+    db.close()
@@ -0,0 +1,52 @@
+import time
+
+from sqlalchemy import event
+
+from app import backfill, jobs
+from app.models.customer import Customer
+from app.models.user import User
+
+
+def test_backfill_job_updates_changed_numbers_one_statement_per_page(monkeypatch, session_factory, db_engine):
+    with session_factory() as db:
+        db.add(User(id=7, name="shop"))
+        db.add_all([Customer(id=cid, user_id=7, whatsapp_no=no) for cid, no in [(1, None), (2, "+942"), (3, "+old")]])
+        db.commit()
+    monkeypatch.setattr(backfill, "SessionLocal", session_factory)
+    updates = []
+    event.listen(db_engine, "before_cursor_execute", lambda conn, cursor, sql, *a: sql.startswith("UPDATE") and updates.append(sql))
+    pages = [
+        [{"id": 1, "whatsapp_no": "+941"}, {"id": 2, "whatsapp_no": "+942"}],
+        [{"id": 3, "whatsapp_no": "+943"}, {"id": 4, "whatsapp_no": "+944"}, {"id": 5, "whatsapp_no": None}],
+    ]
+
+    job = jobs.start("backfill_whatsapp", lambda job: backfill.backfill_whatsapp(7, job, pages=pages))
+    deadline = time.time() + 5
+    while job.status in ("pending", "running") and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert jobs.get(job.id) is job and job.status == "succeeded"
+    assert job.progress == {"pages": 2, "scanned": 5, "updated": 2}
+    assert len(updates) == 2
+    with session_factory() as db:
+        assert {c.id: c.whatsapp_no for c in db.query(Customer)} == {1: "+941", 2: "+942", 3: "+943"}
+
+
+def test_backfill_endpoint_waits_for_the_job_when_asked(monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    def fake_backfill(user_id, job):
+        job.progress.update(pages=1, scanned=3, updated=2)
+
+    monkeypatch.setattr(backfill, "backfill_whatsapp", fake_backfill)
+    client = TestClient(app)
+
+    r = client.post("/api/v1/ai/backfill-whatsapp/7?wait=5")
+    assert r.status_code == 200
+    assert r.json()["status"] == "succeeded" and r.json()["updated"] == 2
+
+    monkeypatch.setattr(backfill, "backfill_whatsapp", lambda user_id, job: time.sleep(0.2))
+    r = client.post("/api/v1/ai/backfill-whatsapp/8")
+    assert r.status_code == 202
+    assert jobs.get(r.json()["id"]).wait(5)
@@ -0,0 +1,103 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app import catalog_cache
+
+
+def _row(id, owner_id, name, price=100.0, available_qty=5, description=None):
+    return SimpleNamespace(
+        id=id, owner_id=owner_id, name=name, sku=f"SKU{id}", price=price, description=description,
+        image=None, stock_qty=available_qty, available_qty=available_qty,
+    )
+
+
+@pytest.fixture
+def tables(monkeypatch):
+    """Per-tenant product rows served in place of the database; loads are counted."""
+    rows = {}
+    loads = []
+
+    def fake_load(db, user_id):
+        loads.append(user_id)
+        return list(rows.get(user_id, []))
+
+    monkeypatch.setattr(catalog_cache, "get_products_by_user_id", fake_load)
+    catalog_cache.invalidate()
+    yield rows, loads
+    catalog_cache.invalidate()
+
+
+def test_lru_tenant_is_evicted_over_the_byte_budget(tables, monkeypatch):
+    rows, loads = tables
+    for user_id in (1, 2, 3):
+        rows[user_id] = [_row(user_id * 10 + i, user_id, f"product {i}", description="x" * 2000) for i in range(3)]
+    one_catalog = catalog_cache.TenantCatalog(1, [catalog_cache.CachedProduct.from_row(r) for r in rows[1]]).size_bytes
+    monkeypatch.setattr(catalog_cache, "CATALOG_CACHE_MAX_BYTES", 2 * one_catalog + 100)
+
+    catalog_cache.get_catalog(None, 1)
+    catalog_cache.get_catalog(None, 2)
+    catalog_cache.get_catalog(None, 1)  # 1 is now the most recently used
+    evictions = catalog_cache.stats()["evictions"]
+    catalog_cache.get_catalog(None, 3)
+
+    assert catalog_cache.stats()["evictions"] == evictions + 1
+    assert list(catalog_cache._catalogs) == [1, 3]
+    assert catalog_cache.stats()["bytes"] <= catalog_cache.CATALOG_CACHE_MAX_BYTES
+    catalog_cache.get_catalog(None, 2)
+    assert loads == [1, 2, 3, 2]
+
+
+def test_product_events_update_the_resident_catalog(tables):
+    rows, loads = tables
+    rows[1] = [_row(1, 1, "Red Shoe"), _row(2, 1, "Blue Hat")]
+    catalog = catalog_cache.get_catalog(None, 1)
+
+    catalog_cache.upsert_product(_row(1, 1, "Red Shoe", price=1200.0))
+    catalog_cache.upsert_product(_row(3, 1, "Green Scarf"))
+    catalog_cache.remove_product(2)
+    catalog_cache.upsert_product(_row(9, 2, "Other tenant"))  # not resident: left to the next load
+
+    assert catalog_cache.get_catalog(None, 1) is catalog
+    assert catalog.get(1).price == 1200.0
+    assert sorted(p.name for p in catalog.list()) == ["Green Scarf", "Red Shoe"]
+    assert catalog.best_match("green scarf please")[0].id == 3
+    assert 2 not in catalog_cache._catalogs
+    assert loads == [1]
+
+
+def test_load_that_raced_an_event_is_served_once_but_not_cached(tables, monkeypatch):
+    rows, loads = tables
+    rows[1] = [_row(1, 1, "Red Shoe", price=1500.0)]
+    real_load = catalog_cache.get_products_by_user_id
+
+    def load_then_update(db, user_id):
+        stale = real_load(db, user_id)
+        # The product changes while the rows are still on their way from the database.
+        rows[1] = [_row(1, 1, "Red Shoe", price=900.0)]
+        catalog_cache.upsert_product(rows[1][0])
+        return stale
+
+    monkeypatch.setattr(catalog_cache, "get_products_by_user_id", load_then_update)
+    assert catalog_cache.get_catalog(None, 1).get(1).price == 1500.0
+    assert 1 not in catalog_cache._catalogs
+
+    monkeypatch.setattr(catalog_cache, "get_products_by_user_id", real_load)
+    assert catalog_cache.get_catalog(None, 1).get(1).price == 900.0
+    assert 1 in catalog_cache._catalogs
+
+
+def test_global_invalidate_rejects_an_in_flight_load(tables, monkeypatch):
+    rows, loads = tables
+    rows[1] = [_row(1, 1, "Red Shoe", price=1500.0)]
+    real_load = catalog_cache.get_products_by_user_id
+
+    def load_then_invalidate(db, user_id):
+        stale = real_load(db, user_id)
+        # A failed event batch drops every catalog while this tenant is still loading.
+        catalog_cache.invalidate()
+        return stale
+
+    monkeypatch.setattr(catalog_cache, "get_products_by_user_id", load_then_invalidate)
+    catalog_cache.get_catalog(None, 1)
+    assert 1 not in catalog_cache._catalogs
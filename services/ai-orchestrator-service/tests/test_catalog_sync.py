@@ -0,0 +1,108 @@
+from sqlalchemy import event
+
+from app import catalog_sync, messaging
+from app.models.product import Product
+from app.models.user import User
+
+
+def product_event(event_type, pid, owner=1, sku=None, price=10.0, qty=1):
+    return {"event_type": event_type, "product": {
+        "id": pid, "owner_id": owner, "name": f"P{pid}", "sku": sku or f"SKU-{pid}", "price": price,
+        "available_qty": qty, "stock_qty": qty,
+    }}
+
+
+class AckChannel:
+    def __init__(self):
+        self.acked, self.nacked = [], []
+
+    def basic_ack(self, delivery_tag):
+        self.acked.append(delivery_tag)
+
+    def basic_nack(self, delivery_tag, requeue=False):
+        self.nacked.append(delivery_tag)
+
+
+def test_batch_is_folded_per_product_and_applied_in_one_transaction(monkeypatch, session_factory, db_engine):
+    with session_factory() as db:
+        db.add(User(id=1, name="shop"))
+        db.add(Product(id=4, owner_id=1, name="P4", sku="ORIGINAL", price=1.0, available_qty=1, stock_qty=1))
+        db.add(Product(id=5, owner_id=1, name="P5", sku="SKU-5", price=1.0, available_qty=1, stock_qty=1))
+        db.commit()
+    monkeypatch.setattr(messaging, "SessionLocal", session_factory)
+    events = [
+        product_event("product_created", 1),
+        product_event("product_updated", 1, price=12.5, qty=0),
+        product_event("product_created", 2),
+        {"event_type": "product_deleted", "product_id": 2},
+        product_event("product_created", 3, owner=9),
+        {"event_type": "user_created", "user": {"id": 9, "username": "new-shop"}},
+        product_event("product_updated", 4, sku="CHANGED", price=99.0),
+        {"event_type": "product_deleted", "product_id": 5},
+        product_event("product_created", 5, sku="SKU-5B", price=7.0),
+    ]
+    statements = []
+    event.listen(db_engine, "before_cursor_execute", lambda conn, cursor, sql, *a: statements.append(sql.split()[0]))
+    commits = []
+    event.listen(db_engine, "commit", lambda conn: commits.append(1))
+    channel = AckChannel()
+
+    messaging._apply_catalog_batch(channel, list(enumerate(events, start=1)))
+
+    assert channel.acked == list(range(1, 10)) and channel.nacked == []
+    assert len(commits) == 1
+    # users, placeholders, delete, insert, upsert, then one read to refresh the caches
+    assert len(statements) <= 6
+    with session_factory() as db:
+        rows = {p.id: (p.sku, p.price, p.available_qty) for p in db.query(Product)}
+        users = {u.id: u.name for u in db.query(User)}
+    assert rows == {
+        1: ("SKU-1", 12.5, 0),
+        3: ("SKU-3", 10.0, 1),
+        4: ("ORIGINAL", 99.0, 1),
+        5: ("SKU-5B", 7.0, 1),
+    }
+    assert users == {1: "shop", 9: "new-shop"}
+    assert catalog_sync.BATCH_RESULTS.value(outcome="ok") >= 1
+
+
+def test_user_update_without_username_never_overwrites_a_stored_name(monkeypatch, session_factory):
+    with session_factory() as db:
+        db.add(User(id=1, name="shop"))
+        db.commit()
+    monkeypatch.setattr(messaging, "SessionLocal", session_factory)
+    events = [
+        {"event_type": "user_updated", "user": {"id": 1}},
+        {"event_type": "user_updated", "user": {"id": 2, "username": ""}},
+        {"event_type": "user_updated", "user": {"id": 3, "username": "renamed"}},
+        {"event_type": "user_updated", "user": {"id": 3}},
+    ]
+
+    messaging._apply_catalog_batch(AckChannel(), list(enumerate(events, start=1)))
+
+    with session_factory() as db:
+        assert {u.id: u.name for u in db.query(User)} == {1: "shop", 2: "unknown", 3: "renamed"}
+
+
+def test_events_failing_one_by_one_are_nacked(monkeypatch, session_factory):
+    with session_factory() as db:
+        db.add(User(id=1, name="shop"))
+        db.commit()
+    monkeypatch.setattr(messaging, "SessionLocal", session_factory)
+
+    def bulk_failure(db, events):
+        raise RuntimeError("bulk apply failed")
+
+    monkeypatch.setattr(catalog_sync, "apply_events", bulk_failure)
+    events = [
+        product_event("product_created", 1),
+        {"event_type": "product_created", "product": {"id": 2, "owner_id": 1}},  # no name/sku/price
+        product_event("product_updated", 1, price=3.0),
+    ]
+    channel = AckChannel()
+
+    messaging._apply_catalog_batch(channel, list(enumerate(events, start=1)))
+
+    assert channel.acked == [1, 3] and channel.nacked == [2]
+    with session_factory() as db:
+        assert {p.id: p.price for p in db.query(Product)} == {1: 3.0}
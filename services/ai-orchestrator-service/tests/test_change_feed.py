@@ -0,0 +1,44 @@
+import asyncio
+import threading
+
+from app import change_feed
+from app.crud.conversation_change import record_answered
+from app.models.customer import Customer
+from app.models.message import Message
+
+
+def test_stream_pushes_reply_as_soon_as_it_is_notified(monkeypatch, session_factory):
+    monkeypatch.setattr(change_feed, "SessionLocal", session_factory)
+    monkeypatch.setattr(change_feed, "CHANGE_FEED_POLL_SECONDS", 30)
+    with session_factory() as db:
+        db.add(Customer(id=1, user_id=5, whatsapp_no="+94771"))
+        db.commit()
+
+    def answer_from_worker():
+        with session_factory() as db:
+            msg = Message(id=10, customer_id=1, user_message="hi", response_message="hello", is_send_response=True)
+            db.add(msg)
+            record_answered(db, [msg], user_id=5)
+            db.commit()
+        change_feed.notify(5)
+
+    async def consume():
+        frames = []
+        disconnected = asyncio.Event()
+
+        async def is_disconnected():
+            return disconnected.is_set()
+
+        gen = change_feed.stream(5, None, is_disconnected)
+        frames.append(await gen.__anext__())  # retry hint; cursor is now positioned
+        threading.Timer(0.05, answer_from_worker).start()
+        # Well before the 30s re-poll, so this frame came from notify()
+        frames.append(await asyncio.wait_for(gen.__anext__(), timeout=5))
+        disconnected.set()
+        await gen.aclose()
+        return frames
+
+    frames = asyncio.run(consume())
+    assert frames[1].startswith("id: 1\nevent: message_answered\n")
+    assert '"response_message": "hello"' in frames[1]
+    assert change_feed.FEED_SUBSCRIBERS.value() == 0
@@ -0,0 +1,57 @@
+from app.coalescer import MessageCoalescer
+
+
+class FakeTimers:
+    """Stands in for connection.call_later / remove_timeout with a manual clock."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.timers = {}
+        self._next = 0
+
+    def call_later(self, delay, fn):
+        self._next += 1
+        self.timers[self._next] = (self.now + delay, fn)
+        return self._next
+
+    def remove_timeout(self, timer_id):
+        self.timers.pop(timer_id, None)
+
+    def advance(self, seconds):
+        self.now += seconds
+        for timer_id, (due, fn) in sorted(self.timers.items(), key=lambda t: t[1][0]):
+            if due <= self.now and self.timers.pop(timer_id, None):
+                fn()
+
+
+def make(timers, flushed, **kwargs):
+    return MessageCoalescer(
+        0.5, lambda key, items: flushed.append((key, items)),
+        timers.call_later, timers.remove_timeout, clock=lambda: timers.now, **kwargs,
+    )
+
+
+def test_burst_is_flushed_once_after_quiet_window():
+    timers, flushed = FakeTimers(), []
+    coalescer = make(timers, flushed)
+    for text in ("hi", "do you have", "red shoes"):
+        coalescer.add(7, text)
+        timers.advance(0.3)
+    coalescer.add(8, "price?")
+    assert flushed == []
+    timers.advance(0.5)
+    assert flushed == [(7, ["hi", "do you have", "red shoes"]), (8, ["price?"])]
+    assert coalescer.pending() == 0
+
+
+def test_max_wait_and_max_items_bound_a_burst():
+    timers, flushed = FakeTimers(), []
+    coalescer = make(timers, flushed, max_wait=1.0, max_items=5)
+    for text in ("a", "b", "c", "d"):
+        coalescer.add(1, text)
+        timers.advance(0.3)
+    # never quiet for the 0.5s window, but held no longer than max_wait
+    assert flushed == [(1, ["a", "b", "c", "d"])]
+    for text in "vwxyz":
+        coalescer.add(2, text)
+    assert flushed[-1] == (2, list("vwxyz"))
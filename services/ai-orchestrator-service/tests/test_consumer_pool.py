@@ -0,0 +1,86 @@
+import queue
+import threading
+import time
+
+from app.consumer_pool import FairWorkerPool, ThreadSafeChannel
+
+
+class FakeConnection:
+    """Runs threadsafe callbacks on a dedicated 'connection' thread, like pika does."""
+
+    def __init__(self):
+        self.callbacks = queue.Queue()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def _loop(self):
+        while True:
+            cb = self.callbacks.get()
+            if cb is None:
+                return
+            cb()
+
+    def add_callback_threadsafe(self, cb):
+        self.callbacks.put(cb)
+
+    def close(self):
+        self.callbacks.put(None)
+        self.thread.join()
+
+
+class FakeChannel:
+    def __init__(self):
+        self.calls = []
+
+    def basic_publish(self, **kwargs):
+        self.calls.append(("publish", threading.current_thread().name, kwargs["body"]))
+
+    def basic_ack(self, delivery_tag):
+        self.calls.append(("ack", threading.current_thread().name, delivery_tag))
+
+
+def test_pool_keeps_per_customer_order_and_marshals_channel_calls():
+    connection, channel = FakeConnection(), FakeChannel()
+    proxy = ThreadSafeChannel(connection, channel)
+    pool = FairWorkerPool(4)
+    handled = []
+
+    def work(customer_id, seq, tag):
+        time.sleep(0.001 * (seq % 3))
+        handled.append((customer_id, seq))
+        proxy.basic_publish(exchange="x", routing_key="", body=f"{customer_id}:{seq}")
+        proxy.basic_ack(tag)
+
+    tag = 0
+    for seq in range(10):
+        for customer_id in (1, 2, 3, 7):
+            tag += 1
+            pool.submit(customer_id % 2, customer_id, work, customer_id, seq, tag)
+    pool.shutdown(wait=True)
+    connection.close()
+
+    for customer_id in (1, 2, 3, 7):
+        assert [s for c, s in handled if c == customer_id] == list(range(10))
+    assert len(channel.calls) == 80
+    assert {thread for _, thread, _ in channel.calls} == {connection.thread.name}
+    assert pool.pending() == 0
+
+
+def test_campaign_backlog_does_not_delay_other_tenants():
+    pool = FairWorkerPool(1, weights={"big": 2})
+    gate = threading.Event()
+    order = []
+    pool.submit("warmup", None, gate.wait, 5)
+    for n in range(20):
+        pool.submit("campaign", f"c{n}", order.append, "campaign")
+    for n in range(4):
+        pool.submit("big", f"b{n}", order.append, "big")
+    pool.submit("quiet", "q", order.append, "quiet")
+    gate.set()
+    pool.shutdown(wait=True)
+
+    # served in the first round, not after the 20 campaign messages received before it
+    assert order.index("quiet") <= 3
+    # weight 2: "big" gets two turns for each campaign turn while both are backlogged
+    assert order[:7].count("big") == 4
+    assert len(order) == 25 and pool.pending() == 0
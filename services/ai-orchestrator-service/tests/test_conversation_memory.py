@@ -0,0 +1,40 @@
+import time
+
+from app import conversation_memory
+from app.bounded_cache import BoundedCache
+from app.models.conversation_state import ConversationState
+
+
+def test_bounded_cache_evicts_lru_and_expired_entries():
+    cache = BoundedCache("test_lru", max_entries=2, ttl_seconds=0.05)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    cache.get(1)
+    cache.set(3, "c")
+    assert 2 not in cache and cache.get(1) == "a" and len(cache) == 2
+    time.sleep(0.06)
+    assert cache.get(3) is None
+    assert cache.stats()["lru_evictions"] == 1 and cache.stats()["ttl_evictions"] >= 1
+
+
+def test_last_product_writes_are_batched_into_one_flush(monkeypatch, session_factory, db_session):
+    monkeypatch.setattr(conversation_memory, "SessionLocal", session_factory)
+    monkeypatch.setattr(conversation_memory, "_pending", {})
+
+    conversation_memory.set_last_product(101, 7)
+    conversation_memory.set_last_product(102, 8)
+    conversation_memory.set_last_product(101, 9)
+    db = db_session
+    assert db.query(ConversationState).count() == 0
+    # readable before it is persisted, even once the in-process memory forgot it
+    conversation_memory._memory.clear()
+    assert conversation_memory.get_last_product(db, 101) == 9
+
+    assert conversation_memory.flush() == 2
+    rows = {s.customer_id: s.last_product_id for s in db.query(ConversationState)}
+    assert rows == {101: 9, 102: 8}
+    conversation_memory.set_last_product(102, 10)
+    conversation_memory.flush()
+    db.expire_all()
+    assert db.get(ConversationState, 102).last_product_id == 10
+    assert conversation_memory.flush() == 0
@@ -0,0 +1,39 @@
+import pytest
+
+from app.crud.message import get_conversations, get_conversations_page
+from app.models.customer import Customer
+from app.models.message import Message
+
+
+@pytest.fixture
+def db(db_session):
+    db = db_session
+    for cid in range(1, 8):
+        db.add(Customer(id=cid, user_id=1 if cid != 4 else 2, whatsapp_no=f"+9477{cid}"))
+        for n in range(4):
+            mid = cid * 100 + n
+            # customer 5 has no answered messages; message 0 of every customer is unanswered
+            answered = cid != 5 and n > 0
+            db.add(Message(id=mid, customer_id=cid, user_message=f"q{mid}", response_message=f"a{mid}" if answered else None))
+    db.commit()
+    return db
+
+
+def test_keyset_pages_cover_answered_conversations_once(db):
+    seen, cursor = [], None
+    while True:
+        page, cursor = get_conversations_page(db, user_id=1, limit=2, cursor=cursor, messages_limit=2)
+        seen += page
+        if cursor is None:
+            break
+    assert [c["whatsapp_no"] for c in seen] == ["+94771", "+94772", "+94773", "+94776", "+94777"]
+    first = seen[0]
+    assert first["first_message"] == "q100"
+    # latest two answered messages, oldest first
+    assert [m["id"] for m in first["messages"]] == [102, 103]
+
+
+def test_unpaginated_listing_matches_old_shape(db):
+    conversations = get_conversations(db)
+    assert len(conversations) == 6
+    assert [m["response_message"] for m in conversations[0]["messages"]] == ["a101", "a102", "a103"]
@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+from app import fast_path
+from app.reply_templates import detect_fact_intent, render_fact_reply
+
+SHOE = SimpleNamespace(id=1, name="Red Shoe", price=1500.0, available_qty=3)
+
+
+def test_detects_only_plain_fact_questions():
+    assert detect_fact_intent("price of the red shoe?") == "price"
+    assert detect_fact_intent("is it in stock") == "stock"
+    assert detect_fact_intent("how much, and is it available?") == "price_stock"
+    assert detect_fact_intent("red shoe") is None
+    assert detect_fact_intent("what about delivery cost to Kandy") is None
+
+
+def test_renders_facts_and_refuses_missing_ones():
+    assert render_fact_reply("price_stock", SHOE) == "Red Shoe is priced at 1,500, with 3 available right now."
+    assert render_fact_reply("stock", SimpleNamespace(name="X", price=1.0, available_qty=0)) == "Sorry, X is currently out of stock."
+    assert render_fact_reply("price", SimpleNamespace(name="X", price=None, available_qty=1)) is None
+
+
+def test_tenant_rate_controls_bypass(monkeypatch):
+    message = SimpleNamespace(id=42, user_message="price?")
+    assert fast_path.try_answer(message, SHOE, 0.9, user_id=1) is None  # off by default
+    monkeypatch.setattr(fast_path, "FAST_PATH_RATE", 1.0)
+    monkeypatch.setattr(fast_path, "FAST_PATH_TENANT_RATES", {7: 0.0})
+    assert fast_path.try_answer(message, SHOE, 0.9, user_id=1) == "Red Shoe is priced at 1,500."
+    assert fast_path.try_answer(message, SHOE, 0.9, user_id=7) is None
+    assert fast_path.try_answer(message, SHOE, 0.6, user_id=1) is None
+
+
+def test_counters_drop_the_tenant_label_when_metrics_are_not_per_tenant(monkeypatch):
+    monkeypatch.setattr(fast_path, "FAST_PATH_RATE", 1.0)
+    monkeypatch.setattr(fast_path, "METRICS_TENANT_LABELS", False)
+    before = fast_path.FAST_PATH_REPLIES.value(tenant="all", intent="price")
+    fast_path.try_answer(SimpleNamespace(id=43, user_message="price?"), SHOE, 0.9, user_id=5)
+    assert fast_path.FAST_PATH_REPLIES.value(tenant="all", intent="price") == before + 1
+    assert fast_path.FAST_PATH_REPLIES.value(tenant=5, intent="price") == 0
@@ -0,0 +1,66 @@
+import asyncio
+
+from app import llm_gateway
+from app.llm_gateway import Provider
+
+
+def _provider(name, delay, fail=False):
+    async def call(prompt, timeout):
+        await asyncio.sleep(delay)
+        if fail:
+            raise RuntimeError(f"{name} down")
+        return f"{name}: {prompt}"
+
+    return Provider(name, call, timeout=1.0)
+
+
+def test_falls_back_when_primary_fails(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "PROVIDERS", [_provider("groq", 0, fail=True), _provider("gemini", 0)])
+    monkeypatch.setattr(llm_gateway, "LLM_HEDGE_ENABLED", False)
+    result = llm_gateway.generate_result("hi")
+    assert (result.provider, result.text) == ("gemini", "gemini: hi")
+
+
+def test_hedge_takes_the_first_answer(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "PROVIDERS", [_provider("groq", 0.5), _provider("gemini", 0.01)])
+    monkeypatch.setattr(llm_gateway, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(llm_gateway, "LLM_HEDGE_DELAY_MS", 20.0)
+    assert llm_gateway.generate_result("hi").provider == "gemini"
+
+
+def test_deadline_and_total_failure(monkeypatch):
+    slow = Provider("groq", _provider("groq", 5).call, timeout=0.05)
+    monkeypatch.setattr(llm_gateway, "PROVIDERS", [slow, _provider("gemini", 0, fail=True)])
+    monkeypatch.setattr(llm_gateway, "LLM_HEDGE_ENABLED", False)
+    assert llm_gateway.generate("hi").startswith("[LLM unavailable:")
+
+
+def test_open_breaker_skips_failing_provider(monkeypatch):
+    calls = []
+
+    async def failing(prompt, timeout):
+        calls.append(prompt)
+        raise RuntimeError("groq down")
+
+    monkeypatch.setattr(llm_gateway, "PROVIDERS", [Provider("groq-cb", failing, 1.0), _provider("gemini-cb", 0)])
+    monkeypatch.setattr(llm_gateway, "LLM_HEDGE_ENABLED", False)
+    cb = llm_gateway.breaker("groq-cb")
+    monkeypatch.setattr(cb, "open_seconds", 60.0)
+
+    for i in range(10):
+        assert llm_gateway.generate_result(f"m{i}").provider == "gemini-cb"
+    assert cb.state == "open"
+    assert len(calls) == cb.min_calls  # later messages never reached the failing provider
+    assert llm_gateway.breaker_states()["groq-cb"]["rejected"] == 10 - cb.min_calls
+
+
+def test_half_open_probe_closes_breaker(monkeypatch):
+    from app.circuit_breaker import CircuitBreaker
+
+    cb = CircuitBreaker("probe", window=4, min_calls=2, open_seconds=0.0)
+    cb.record(False, 0.1)
+    cb.record(False, 0.1)
+    assert cb.state == "half_open"  # open_seconds elapsed immediately
+    assert cb.allow() and not cb.allow()  # exactly one probe
+    cb.record(True, 0.1)
+    assert cb.state == "closed"
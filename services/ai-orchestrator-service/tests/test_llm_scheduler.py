@@ -0,0 +1,58 @@
+import threading
+import time
+
+from app import llm_scheduler
+from app.catalog_cache import CachedProduct
+from app.llm_scheduler import FairScheduler, TokenBucket
+from app.reply_templates import render_degraded_reply
+
+
+def test_token_bucket_refills_at_its_rate():
+    now = [0.0]
+    bucket = TokenBucket(rate=0.5, burst=2, clock=lambda: now[0])
+    assert [bucket.try_take() for _ in range(3)] == [True, True, False]
+    now[0] = 2.0
+    assert bucket.try_take() and not bucket.try_take()
+
+
+def test_backlogged_tenant_does_not_delay_a_quiet_one():
+    scheduler = FairScheduler(slots=1)
+    assert scheduler.acquire(tenant=0)
+    order = []
+
+    def call(tenant):
+        assert scheduler.acquire(tenant, timeout=5)
+        order.append(tenant)
+        scheduler.release()
+
+    threads = []
+    for tenant in ["campaign"] * 5 + ["quiet"]:
+        threads.append(threading.Thread(target=call, args=(tenant,)))
+        threads[-1].start()
+        time.sleep(0.02)  # enqueue in this order
+    scheduler.release()
+    for t in threads:
+        t.join(5)
+
+    assert order.index("quiet") <= 1
+    assert scheduler.snapshot()["in_use"] == 0
+
+
+def test_waiting_too_long_or_over_quota_degrades(monkeypatch):
+    scheduler = FairScheduler(slots=1)
+    assert scheduler.acquire(1)
+    assert scheduler.acquire(2, timeout=0.01) is False
+    assert scheduler.snapshot()["waiting"] == {}
+    # the timed-out call is not charged: tenant 2's next call is tagged as if it never happened
+    assert scheduler._clock.tag(2) == scheduler._clock.tag(3)
+
+    monkeypatch.setattr(llm_scheduler, "_buckets", {7: TokenBucket(rate=0.0, burst=1)})
+    monkeypatch.setattr(llm_scheduler, "LLM_TENANT_RATES", {7: 1.0})
+    assert llm_scheduler.admit(7) is True
+    llm_scheduler.release()
+    assert llm_scheduler.admit(7) is False
+    assert llm_scheduler.ADMISSIONS.value(tenant=7, outcome="over_quota") == 1
+
+    shoe = CachedProduct(id=1, owner_id=7, name="Red Shoe", sku="RS", price=1500.0, available_qty=3)
+    assert render_degraded_reply(shoe, "tell me about it") == "Red Shoe is priced at 1,500, with 3 available right now."
+    assert render_degraded_reply(None, "anything new?").endswith("Ask about a product by name to get its price and availability.")
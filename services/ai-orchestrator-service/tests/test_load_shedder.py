@@ -0,0 +1,105 @@
+from app import load_shedder
+from app.load_shedder import LoadShedder
+
+
+def _shedder(now):
+    return LoadShedder(
+        latency_slo=2.0, recover_latency=1.0, queue_high=10, queue_low=2,
+        window=30.0, min_samples=3, probe_interval=5.0, clock=lambda: now[0],
+    )
+
+
+def test_slow_llm_switches_to_templates_and_back_with_hysteresis():
+    now = [0.0]
+    shedder = _shedder(now)
+    before = load_shedder.TRANSITIONS.value(mode="shedding")
+    for _ in range(3):
+        shedder.observe(3.0)
+    assert shedder.allow_llm(queue_depth=0) is True  # the switching call is the first probe
+    assert shedder.shedding
+    assert load_shedder.TRANSITIONS.value(mode="shedding") == before + 1
+    assert shedder.allow_llm(queue_depth=0) is False
+    now[0] = 5.0
+    assert shedder.allow_llm(queue_depth=0) is True  # probe
+
+    # Between the recovery latency and the SLO: still shedding.
+    now[0] = 31.0
+    for _ in range(3):
+        shedder.observe(1.5)
+    shedder.allow_llm(queue_depth=0)
+    assert shedder.shedding
+
+    # Fast again, but the queue has not drained yet.
+    now[0] = 62.0
+    for _ in range(3):
+        shedder.observe(0.4)
+    shedder.allow_llm(queue_depth=5)
+    assert shedder.shedding
+    assert shedder.allow_llm(queue_depth=2) is True
+    assert not shedder.shedding
+    assert shedder.snapshot()["mode"] == "normal"
+
+
+def test_deep_queue_sheds_without_latency_samples():
+    now = [0.0]
+    shedder = _shedder(now)
+    shedder.allow_llm(queue_depth=9)
+    assert not shedder.shedding
+    shedder.allow_llm(queue_depth=10)
+    assert shedder.shedding
+    assert shedder.snapshot()["p95_ms"] is None
+
+
+def test_backlog_alone_trips_and_recovers():
+    now = [0.0]
+    shedder = _shedder(now)
+    assert shedder.allow_llm(queue_depth=12) is True  # the switching call is the first probe
+    assert shedder.shedding
+    assert shedder.allow_llm(queue_depth=6) is False
+    assert shedder.shedding
+    # Drained; no latency samples, but latency never tripped the controller.
+    assert shedder.allow_llm(queue_depth=2) is True
+    assert not shedder.shedding
+
+
+def test_latency_trip_waits_for_fresh_samples_to_recover():
+    now = [0.0]
+    shedder = _shedder(now)
+    for _ in range(3):
+        shedder.observe(3.0)
+    shedder.allow_llm(queue_depth=0)
+    assert shedder.shedding
+    now[0] = 40.0  # the slow samples aged out of the window
+    shedder.allow_llm(queue_depth=0)
+    assert shedder.shedding
+
+
+def test_backlog_counts_broker_ready_and_pool_pending(monkeypatch):
+    from app import messaging
+
+    class _Pool:
+        def pending(self):
+            return 7
+
+    monkeypatch.setattr(messaging, "_broker_backlog", 5)
+    monkeypatch.setattr(messaging, "_pool", None)
+    assert messaging.new_message_backlog() == 5
+    monkeypatch.setattr(messaging, "_pool", _Pool())
+    assert messaging.new_message_backlog() == 12
+
+
+def test_broker_sample_updates_the_backlog_and_reschedules(monkeypatch):
+    from types import SimpleNamespace
+    from app import messaging
+
+    scheduled = []
+    connection = SimpleNamespace(call_later=lambda delay, fn: scheduled.append(fn))
+    channel = SimpleNamespace(
+        queue_declare=lambda queue, passive: SimpleNamespace(method=SimpleNamespace(message_count=42)),
+    )
+    monkeypatch.setattr(messaging, "_broker_backlog", 0)
+    monkeypatch.setattr(messaging, "_pool", None)
+    messaging._sample_broker_backlog(connection, channel)
+    assert messaging.new_message_backlog() == 42
+    assert messaging.NEW_MESSAGE_QUEUE_DEPTH.value() == 42
+    assert len(scheduled) == 1
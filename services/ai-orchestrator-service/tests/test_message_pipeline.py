@@ -0,0 +1,144 @@
+import json
+
+from sqlalchemy import event
+
+from app import catalog_cache, conversation_memory, idempotency, llm_gateway, messaging, response_cache
+from app.bounded_cache import BoundedCache
+from app.crud.conversation_change import get_changes
+from app.models.message import Message
+from app.models.product import Product
+from app.models.user import User
+from app.response_cache import InProcessBackend
+
+
+class FakeChannel:
+    def __init__(self):
+        self.published = []
+
+    def exchange_declare(self, **kwargs):
+        pass
+
+    def basic_publish(self, **kwargs):
+        self.published.append(json.loads(kwargs["body"]))
+
+
+def new_message(message_id, text, customer_id=501, user_id=77):
+    return {"event_type": "new_message", "message_data": {
+        "id": message_id, "customer_id": customer_id, "user_id": user_id,
+        "user_message": text, "whatsapp_no": "+94770000000",
+    }}
+
+
+def test_one_commit_in_one_commit_out_and_pinned_round_trips(monkeypatch, session_factory, db_engine):
+    with session_factory() as db:
+        db.add(User(id=77, name="shop"))
+        db.add(Product(id=1, name="Red Shoe", sku="RS-1", price=1500.0, available_qty=3, stock_qty=5, owner_id=77))
+        db.commit()
+
+    monkeypatch.setattr(messaging, "SessionLocal", session_factory)
+    monkeypatch.setattr(llm_gateway, "generate_with_provider", lambda prompt: ("stub reply", "stub"))
+    monkeypatch.setattr(response_cache, "_backend", InProcessBackend(max_entries=10, ttl_seconds=60))
+    monkeypatch.setattr(conversation_memory, "_pending", {})
+    catalog_cache.invalidate()
+
+    statements, commits = [], []
+    event.listen(db_engine, "before_cursor_execute", lambda conn, cursor, sql, *a: statements.append(sql.split()[0]))
+    event.listen(db_engine, "commit", lambda conn: commits.append(1))
+    channel = FakeChannel()
+
+    # New customer, cold catalog: customer lookup, products load, two inserts,
+    # then the reply update and its change feed row.
+    messaging._handle_new_message(channel, new_message(9001, "tell me about the red shoe"))
+    assert sorted(statements) == ["INSERT", "INSERT", "INSERT", "SELECT", "SELECT", "UPDATE"]
+    assert len(commits) == 2
+
+    # Known customer, warm catalog: one read, one insert, one update; the message is never re-read.
+    statements.clear(), commits.clear()
+    messaging._handle_new_message(channel, new_message(9002, "do you have blue hats"))
+    assert sorted(statements) == ["INSERT", "INSERT", "SELECT", "UPDATE"]
+    assert len(commits) == 2
+
+    assert [p["message_id"] for p in channel.published] == [9001, 9002]
+    with session_factory() as db:
+        stored = {m.id: (m.response_message, m.is_send_response) for m in db.query(Message)}
+        assert stored == {9001: ("stub reply", True), 9002: ("stub reply", True)}
+        changes, cursor = get_changes(db, since=0, user_id=77)
+        assert [c["message"]["id"] for c in changes] == [9001, 9002]
+        assert get_changes(db, since=cursor, user_id=77) == ([], cursor)
+        assert get_changes(db, since=0, user_id=78) == ([], 0)
+
+
+def test_redelivered_message_republishes_stored_reply(monkeypatch, session_factory):
+    with session_factory() as db:
+        db.add(User(id=77, name="shop"))
+        db.commit()
+    prompts = []
+    monkeypatch.setattr(messaging, "SessionLocal", session_factory)
+    monkeypatch.setattr(llm_gateway, "generate_with_provider", lambda prompt: (prompts.append(prompt) or "stub reply", "stub"))
+    monkeypatch.setattr(idempotency, "_stored_ids", BoundedCache("test_ids", 100))
+    catalog_cache.invalidate()
+    channel = FakeChannel()
+
+    messaging._handle_new_message(channel, new_message(9101, "hello, do you sell shoes?"))
+    messaging._handle_new_message(channel, new_message(9102, "anyone there?"))
+    # same pod redelivery: known id, no insert attempted
+    messaging._handle_new_message(channel, new_message(9101, "hello, do you sell shoes?"))
+    # after a restart the in-memory ids are gone; the primary key catches it
+    idempotency._stored_ids.clear()
+    messaging._handle_new_message(channel, new_message(9102, "anyone there?"))
+
+    assert len(prompts) == 2
+    assert [(p["message_id"], p["ai_response"]) for p in channel.published] == [
+        (9101, "stub reply"), (9102, "stub reply"), (9101, "stub reply"), (9102, "stub reply"),
+    ]
+    assert idempotency.DUPLICATES.value(detected_by="cache") >= 1
+    assert idempotency.DUPLICATES.value(detected_by="constraint") >= 1
+
+
+def test_stage_spans_are_exported_per_tenant_provider_and_confidence(monkeypatch, session_factory):
+    from fastapi.testclient import TestClient
+
+    from app import main, message_processor
+
+    with session_factory() as db:
+        db.add(User(id=78, name="shop"))
+        db.add(Product(id=2, name="Blue Hat", sku="BH-1", price=900.0, available_qty=2, stock_qty=2, owner_id=78))
+        db.commit()
+    monkeypatch.setattr(messaging, "SessionLocal", session_factory)
+    monkeypatch.setattr(llm_gateway, "generate_with_provider", lambda prompt: ("stub reply", "groq"))
+    catalog_cache.invalidate()
+
+    messaging._handle_new_message(FakeChannel(), new_message(9201, "tell me about the blue hat", user_id=78))
+
+    labels = {"tenant": 78, "provider": "groq", "confidence": "medium"}
+    for stage in ("load_catalog", "match", "llm", "db_write", "publish", "total"):
+        assert message_processor.STAGE_LATENCY.count(stage=stage, **labels) == 1
+    body = TestClient(main.app).get("/metrics").text
+    assert "# TYPE message_stage_seconds histogram" in body
+    assert 'message_stage_seconds_count{stage="llm",tenant="78",provider="groq",confidence="medium"} 1' in body
+    assert 'le="+Inf"' in body
+
+
+def test_trivial_messages_get_canned_replies_without_catalog_or_llm(monkeypatch, session_factory):
+    from app import intents
+
+    with session_factory() as db:
+        db.add(User(id=79, name="shop"))
+        db.commit()
+    monkeypatch.setattr(messaging, "SessionLocal", session_factory)
+    monkeypatch.setattr(llm_gateway, "generate_with_provider", lambda prompt: (_ for _ in ()).throw(AssertionError("LLM called")))
+    monkeypatch.setattr(catalog_cache, "get_catalog", lambda db, user_id: (_ for _ in ()).throw(AssertionError("catalog loaded")))
+    monkeypatch.setattr(intents, "INTENTS_ENABLED", True)
+    monkeypatch.setattr(intents, "_tenant_replies", {79: {"thanks": "Thanks from the shop!", "ack": None}})
+    channel = FakeChannel()
+
+    messaging._handle_new_message(channel, new_message(9301, "Hi there! 👋", user_id=79))
+    messaging._handle_new_message(channel, new_message(9302, "thank you so much 🙏", user_id=79))
+    messaging._handle_new_message(channel, new_message(9303, "[Unsupported message type: sticker]", user_id=79))
+
+    assert [p["ai_response"] for p in channel.published] == [
+        intents.REPLIES["en"]["greeting"], "Thanks from the shop!", intents.REPLIES["en"]["unsupported"],
+    ]
+    assert intents.classify("hi, do you have red shoes?") is None
+    assert intents.classify("ok\n👍") == "ack" and intents.reply_for("ack", 79) is None
+    assert intents.INTENT_BYPASSES.value(tenant=79, intent="greeting") == 1
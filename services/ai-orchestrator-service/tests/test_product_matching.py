@@ -0,0 +1,171 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from app.matching import BM25Index, MentionDetector, TokenIndex, score_product_match
+
+
+def _linear_best(text, products):
+    best, best_score = None, 0.0
+    for p in products:
+        sc = score_product_match(text, p.name, p.sku)
+        if sc > best_score:
+            best, best_score = p, sc
+    return best, best_score
+
+
+def _linear_top(text, products, k):
+    return sorted(products, key=lambda p: score_product_match(text, p.name, p.sku), reverse=True)[:k]
+
+
+def _catalog(n, seed=7):
+    rnd = random.Random(seed)
+    words = ["red", "blue", "shoe", "shoes", "nike", "air", "max", "tv", "phone", "case", "x", "pro", "mini", "usb-c", "cable"]
+    products = []
+    for i in range(n):
+        name = " ".join(rnd.sample(words, rnd.randint(1, 3)))
+        sku = rnd.choice([f"SK{i:04d}", f"A{i}", "", f"z {i}", "Q"])
+        products.append(SimpleNamespace(id=i, name=name, sku=sku or None))
+    return products
+
+
+MESSAGES = [
+    "",
+    "hi",
+    "price of red shoes?",
+    "do you have the Nike Air Max in blue",
+    "sk0012 in stock?",
+    "how much is usb cable",
+    "tv",
+    "q",
+    "need a phone case pro mini",
+    "z 3 please",
+]
+
+
+def test_index_matches_linear_scan():
+    products = _catalog(200)
+    index = TokenIndex(products)
+    for text in MESSAGES:
+        best, score = index.best_match(text)
+        exp_best, exp_score = _linear_best(text, products)
+        assert (best, score) == (exp_best, exp_score), text
+        assert index.top_k(text, 3) == _linear_top(text, products, 3), text
+
+
+def test_index_tracks_incremental_updates():
+    products = _catalog(50)
+    index = TokenIndex(products)
+    current = {p.id: p for p in products}
+
+    renamed = SimpleNamespace(id=3, name="Galaxy Buds", sku="GB-01")
+    index.add(renamed)
+    current[3] = renamed
+    index.remove(10)
+    del current[10]
+    added = SimpleNamespace(id=99, name="Galaxy Tab", sku="GT-99")
+    index.add(added)
+    current[99] = added
+
+    for text in MESSAGES + ["galaxy buds price", "gt-99", "galaxy"]:
+        assert index.best_match(text) == _linear_best(text, list(current.values())), text
+        assert index.top_k(text, 3) == _linear_top(text, list(current.values()), 3), text
+
+
+def test_bm25_prefers_rare_tokens_and_exact_skus():
+    products = [
+        SimpleNamespace(id=1, name="Running Shoe", sku="RS-1", description="Light shoe for road running"),
+        SimpleNamespace(id=2, name="Trail Shoe", sku="TS-2", description="Waterproof shoe with grip"),
+        SimpleNamespace(id=3, name="Canvas Shoe", sku="CS-3", description="Casual everyday shoe"),
+    ]
+    index = BM25Index(products)
+
+    best, confidence = index.best_match("do you have waterproof shoes?")
+    assert best.id == 2
+    assert confidence < 0.7  # description-only hit is not a confident pick
+
+    best, confidence = index.best_match("price of the trail shoes")
+    assert best.id == 2 and confidence >= 0.7
+
+    assert index.best_match("is ts-2 in stock?") == (products[1], 0.95)
+    assert [p.id for p in index.top_k("canvas", 3)] == [3, 1, 2]
+
+
+def test_bm25_incremental_updates_match_rebuild():
+    products = _catalog(60)
+    index = BM25Index(products)
+    index.remove(5)
+    index.add(SimpleNamespace(id=7, name="Galaxy Buds", sku="GB-01"))
+    current = [p for p in products if p.id not in (5, 7)] + [SimpleNamespace(id=7, name="Galaxy Buds", sku="GB-01")]
+    rebuilt = BM25Index(current)
+    for text in MESSAGES + ["galaxy buds"]:
+        assert index._scores(text) == pytest.approx(rebuilt._scores(text))
+        assert index.best_match(text)[1] == pytest.approx(rebuilt.best_match(text)[1])
+
+
+def test_fuzzy_matches_misspelled_names():
+    pytest.importorskip("numpy")
+    from app.matching.fuzzy import FuzzyIndex
+
+    products = [
+        SimpleNamespace(id=1, name="Adidas Sneakers", sku="AD-1"),
+        SimpleNamespace(id=2, name="Nike Air Max", sku="NK-2"),
+        SimpleNamespace(id=3, name="Red Cotton T-Shirt", sku="TS-3"),
+    ]
+    index = FuzzyIndex(products)
+
+    best, confidence = index.best_match("price of addidas sneakrs?")
+    assert best.id == 1 and confidence >= 0.7
+    assert index.best_match("nk-2 available?") == (products[1], 0.95)
+    assert index.best_match("hello")[0] is None
+
+    index.remove(1)
+    index.add(SimpleNamespace(id=4, name="Adidas Superstar", sku="AD-4"))
+    assert index.best_match("adidas superstr")[0].id == 4
+    assert [p.id for p in index.top_k("nike air", 3)] == [2, 3, 4]
+
+
+def _linear_mentions(text, products):
+    txt, found = text.lower(), {}
+    for p in products:
+        sku, name = (p.sku or "").lower(), (p.name or "").lower()
+        if sku and sku in txt:
+            found[p.id] = 0.95
+        elif name and name in txt:
+            found[p.id] = 0.8
+    return found
+
+
+def test_mention_detector_finds_every_exact_name_and_sku():
+    products = _catalog(200)
+    detector = MentionDetector(products)
+    for text in MESSAGES:
+        assert detector.find_mentions(text) == _linear_mentions(text, products), text
+
+    detector.remove(12)
+    detector.add(SimpleNamespace(id=500, name="Nike Air", sku="NA-500"))
+    current = [p for p in products if p.id != 12] + [SimpleNamespace(id=500, name="Nike Air", sku="NA-500")]
+    for text in MESSAGES + ["is na-500 the same as nike air?"]:
+        assert detector.find_mentions(text) == _linear_mentions(text, current), text
+
+
+def test_incremental_mention_links_match_a_fresh_build():
+    rnd = random.Random(11)
+
+    def word():
+        return "".join(rnd.choice("ab ") for _ in range(rnd.randint(1, 6))).strip() or "a"
+
+    detector = MentionDetector()
+    current = {}
+    for step in range(400):
+        pid = rnd.randrange(60)
+        if rnd.random() < 0.2:
+            detector.remove(pid)
+            current.pop(pid, None)
+        else:
+            product = SimpleNamespace(id=pid, name=word(), sku=word() if rnd.random() < 0.5 else None)
+            detector.add(product)
+            current[pid] = product
+        text = " ".join(word() for _ in range(4))
+        assert detector.find_mentions(text) == _linear_mentions(text, current.values()), (step, text)
@@ -0,0 +1,35 @@
+from types import SimpleNamespace
+
+from app import response_cache
+from app.response_cache import InProcessBackend
+
+SHOE = SimpleNamespace(id=1, name="Red Shoe", price=1500.0, available_qty=3)
+
+
+def test_fingerprint_ignores_case_punctuation_and_spacing():
+    assert response_cache.fingerprint("Tell me about  the Red Shoe!") == response_cache.fingerprint("tell me about the red shoe")
+    assert response_cache.fingerprint("red shoe") != response_cache.fingerprint("blue shoe")
+
+
+def test_product_update_invalidates_cached_reply(monkeypatch):
+    monkeypatch.setattr(response_cache, "_backend", InProcessBackend(max_entries=10, ttl_seconds=60))
+    key = response_cache.key_for(5, SHOE, "Tell me about the red shoe")
+    response_cache.put(key, "It's a lovely red shoe.")
+    assert response_cache.get(response_cache.key_for(5, SHOE, "tell me about the red shoe?")) == "It's a lovely red shoe."
+    # other tenants and changed facts never see it
+    assert response_cache.get(response_cache.key_for(6, SHOE, "tell me about the red shoe")) is None
+    cheaper = SimpleNamespace(id=1, name="Red Shoe", price=1200.0, available_qty=3)
+    assert response_cache.get(response_cache.key_for(5, cheaper, "tell me about the red shoe")) is None
+
+    response_cache.bump_product_version(1)
+    assert response_cache.get(response_cache.key_for(5, SHOE, "tell me about the red shoe")) is None
+
+
+def test_in_process_backend_is_lru_bounded():
+    backend = InProcessBackend(max_entries=2, ttl_seconds=60)
+    backend.set("a", "1")
+    backend.set("b", "2")
+    backend.get("a")
+    backend.set("c", "3")
+    assert backend.get("b") is None
+    assert backend.get("a") == "1" and backend.get("c") == "3"
@@ -0,0 +1,89 @@
+import json
+from datetime import timedelta
+
+from app import catalog_cache, llm_gateway, sweeper
+from app.crud.message import utcnow
+from app.models.customer import Customer
+from app.models.message import Message
+from app.models.user import User
+
+
+class FakeChannel:
+    def __init__(self):
+        self.published = []
+
+    def exchange_declare(self, **kwargs):
+        pass
+
+    def basic_publish(self, **kwargs):
+        self.published.append(json.loads(kwargs["body"])["message_id"])
+
+
+def test_sweeper_answers_only_stale_unanswered_messages(monkeypatch, session_factory):
+    old = utcnow() - timedelta(hours=1)
+    with session_factory() as db:
+        db.add(User(id=3, name="shop"))
+        db.add(Customer(id=30, user_id=3))
+        db.add_all([
+            Message(id=1, customer_id=30, user_message="stuck", created_at=old),
+            Message(id=2, customer_id=30, user_message="legacy row", created_at=None),
+            Message(id=3, customer_id=30, user_message="in flight", created_at=utcnow()),
+            Message(id=4, customer_id=30, user_message="done", response_message="ok", is_send_response=True, created_at=old),
+            Message(id=5, customer_id=30, user_message="gave up", created_at=old, attempts=3),
+        ])
+        db.commit()
+    monkeypatch.setattr(sweeper, "SessionLocal", session_factory)
+    monkeypatch.setattr(llm_gateway, "generate_with_provider", lambda prompt: ("late reply", "stub"))
+    catalog_cache.invalidate()
+    channel = FakeChannel()
+
+    assert sweeper.sweep_once(channel=channel, batch_size=1, concurrency=2) == 1
+    # the legacy row predates created_at: its age is unknown, so it is never replied to
+    assert channel.published == [1]
+    with session_factory() as db:
+        rows = {m.id: (m.is_send_response, m.attempts) for m in db.query(Message)}
+    assert rows == {1: (True, 1), 2: (False, 0), 3: (False, 0), 4: (True, 0), 5: (False, 3)}
+    assert sweeper.BACKLOG_SIZE.value() == 3
+    # nothing left to claim
+    assert sweeper.sweep_once(channel=channel) == 0
+
+
+def test_llm_outage_leaves_the_message_for_the_sweeper(monkeypatch, session_factory):
+    old = utcnow() - timedelta(hours=1)
+    with session_factory() as db:
+        db.add(User(id=4, name="shop"))
+        db.add(Customer(id=40, user_id=4))
+        db.add(Message(id=11, customer_id=40, user_message="anything new this week?", created_at=old))
+        db.commit()
+    monkeypatch.setattr(sweeper, "SessionLocal", session_factory)
+    monkeypatch.setattr(llm_gateway, "generate_with_provider", lambda prompt: ("[LLM unavailable: timeout]", "unavailable"))
+    catalog_cache.invalidate()
+    channel = FakeChannel()
+
+    assert sweeper.sweep_once(channel=channel) == 0
+    assert channel.published == []
+    with session_factory() as db:
+        stored = db.get(Message, 11)
+        assert (stored.is_send_response, stored.response_message, stored.attempts) == (False, None, 1)
+
+    # claimed again once the lease expires, and answered when a provider is back
+    monkeypatch.setattr(sweeper, "SWEEPER_LEASE_SECONDS", 0)
+    monkeypatch.setattr(llm_gateway, "generate_with_provider", lambda prompt: ("late reply", "groq"))
+    assert sweeper.sweep_once(channel=channel) == 1
+    assert channel.published == [11]
+
+
+def test_cli_flushes_conversation_state_on_exit(monkeypatch, session_factory):
+    from app import conversation_memory
+    from app.models.conversation_state import ConversationState
+
+    monkeypatch.setattr(conversation_memory, "SessionLocal", session_factory)
+    monkeypatch.setattr(conversation_memory, "_pending", {})
+    monkeypatch.setattr(sweeper, "update_backlog_metrics", lambda: {})
+    # Stands in for process_message remembering the product it answered about.
+    monkeypatch.setattr(sweeper, "sweep_once", lambda **kwargs: conversation_memory.set_last_product(50, 5) or 1)
+
+    sweeper.main(["--once"])
+
+    with session_factory() as db:
+        assert db.get(ConversationState, 50).last_product_id == 5
@@ -0,0 +1,55 @@
+from app import traffic_recorder, traffic_replay
+from app.catalog_cache import CachedProduct, TenantCatalog
+from app.matching import TokenIndex
+
+
+def product(pid, name, sku):
+    return CachedProduct(id=pid, owner_id=5, name=name, sku=sku, price=100.0, available_qty=1)
+
+
+def test_recorded_corpus_replays_with_the_same_decisions(tmp_path):
+    catalog = TenantCatalog(5, [product(1, "Red Running Shoe", "RS-1"), product(2, "Blue Cotton Hat", "BH-2")])
+    path = traffic_recorder.start(str(tmp_path))
+    try:
+        for text in ("how much is the red running shoe? call me on +94 77 123 4567", "blue cotton hat in stock?", "hello"):
+            best, score = catalog.best_match(text)
+            chosen = best.id if best and score >= 0.7 else None
+            traffic_recorder.record(
+                catalog, text, chosen, score, "match", "product" if chosen else "clarify", "groq", {"match": 0.0004},
+            )
+        traffic_recorder.record(catalog, "how much is it?", 1, 0.85, "memory", "product", "fast_path", {})
+    finally:
+        traffic_recorder.stop()
+
+    snapshots, messages = traffic_replay.read_corpus([path])
+    assert len(snapshots) == 1 and len(messages) == 4
+    assert "<phone>" in messages[0]["text"] and "4567" not in messages[0]["text"]
+    assert [m["chosen"] for m in messages] == [1, 2, None, 1]
+
+    messages[0]["expected_product_id"] = 1
+    result = traffic_replay.replay(TokenIndex, snapshots, messages)
+    assert result["evaluated"] == 3 and result["skipped"] == 1
+    assert result["agreement"] == 1.0 and result["branch_agreement"] == 1.0
+    assert result["accuracy"] == 1.0 and result["labelled"] == 1
+    assert traffic_replay.resolve_matcher("app.matching:BM25Index") is traffic_replay.MATCHERS["bm25"]
+
+
+def test_stock_updates_share_a_snapshot_and_seen_snapshots_are_bounded(tmp_path, monkeypatch):
+    catalog = TenantCatalog(6, [product(1, "Red Running Shoe", "RS-1")])
+    monkeypatch.setattr(traffic_recorder, "_snapshots", traffic_recorder.BoundedCache("test_snapshots", 2))
+    path = traffic_recorder.start(str(tmp_path))
+    try:
+        traffic_recorder.record(catalog, "red running shoe", 1, 0.8, "match", "product", "groq", {})
+        catalog.upsert(CachedProduct(id=1, owner_id=6, name="Red Running Shoe", sku="RS-1", price=90.0, available_qty=0))
+        traffic_recorder.record(catalog, "red running shoe", 1, 0.8, "match", "product", "groq", {})
+        for n in range(3):
+            catalog.upsert(product(10 + n, f"Hat {n}", f"H-{n}"))
+            traffic_recorder.record(catalog, "hat", None, 0.0, "match", "clarify", "groq", {})
+    finally:
+        traffic_recorder.stop()
+
+    snapshots, messages = traffic_replay.read_corpus([path])
+    assert len(messages) == 5
+    assert messages[0]["snapshot"] == messages[1]["snapshot"]
+    assert len(snapshots) == 4 and [p.id for p in snapshots[messages[-1]["snapshot"]]] == [1, 10, 11, 12]
+    assert len(traffic_recorder._snapshots) == 2
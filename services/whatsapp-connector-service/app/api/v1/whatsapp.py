@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.crud import customer as customer_crud
@@ -135,6 +135,11 @@ def get_user_customers_count(user_id: int, db: Session = Depends(get_db)):
     return {"count": total}
 
 @router.get("/users/{user_id}/customers", response_model=list[CustomerSchema])
-def list_user_customers(user_id: int, db: Session = Depends(get_db)):
+def list_user_customers(
+    user_id: int,
+    after_id: int | None = Query(default=None, description="Return customers with a larger id (keyset paging)"),
+    limit: int | None = Query(default=None, ge=1, le=5000, description="Page size, ordered by id (default: all)"),
+    db: Session = Depends(get_db),
+):
     """Return the list of customers for a specific user."""
-    return customer_crud.list_customers_by_user(db, user_id=user_id)
+    return customer_crud.list_customers_by_user(db, user_id=user_id, after_id=after_id, limit=limit)
@@ -38,5 +38,11 @@ def get_connected_numbers_for_user(db: Session, user_id: int) -> list[str]:
 def count_customers_by_user(db: Session, user_id: int) -> int:
     return db.query(Customer).filter(Customer.user_id == user_id).count()
 
-def list_customers_by_user(db: Session, user_id: int) -> list[Customer]:
-    return db.query(Customer).filter(Customer.user_id == user_id).all()
+def list_customers_by_user(db: Session, user_id: int, after_id: int | None = None, limit: int | None = None) -> list[Customer]:
+    """Customers of a user; with ``limit`` a keyset page ordered by id, starting after ``after_id``."""
+    query = db.query(Customer).filter(Customer.user_id == user_id)
+    if after_id is not None:
+        query = query.filter(Customer.id > after_id)
+    if limit is not None:
+        query = query.order_by(Customer.id).limit(limit)
+    return query.all()
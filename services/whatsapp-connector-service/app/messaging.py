@@ -67,13 +67,18 @@ def _handle_ai_response_ready(data: dict):
     try:
         db_message: Optional[DBMessage] = message_crud.update_message_response(db, message_id, ai_response)
         logger.info(f"Updated message {message_id} with AI response.")
+        # Earlier messages of a burst the orchestrator answered with this one reply
+        coalesced_ids = data.get("coalesced_message_ids") or []
+        for coalesced_id in coalesced_ids:
+            message_crud.update_message_response(db, coalesced_id, ai_response)
 
         # Attempt to send the response back to the customer's WhatsApp number
         if db_message and db_message.customer and db_message.customer.whatsapp_no:
             to_number = db_message.customer.whatsapp_no
             try:
                 send_text_message(to_number, ai_response)
-                message_crud.mark_message_sent_to_customer(db, message_id)
+                for sent_id in [message_id, *coalesced_ids]:
+                    message_crud.mark_message_sent_to_customer(db, sent_id)
                 logger.info("Sent WhatsApp reply for message %s to %s", message_id, to_number)
             except Exception as send_err:
                 logger.error("Failed to send WhatsApp reply for message %s: %s", message_id, send_err, exc_info=True)